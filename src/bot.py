@@ -7,36 +7,17 @@
 import os
 import sys
 import math
-import threading
-from praw.exceptions import RedditAPIException
-from projectbot.Constants import Const
-from projectbot.Internals import BotInternals
-from projectbot.Utilities import ResponseFormatter, output_stats, get_help, check_file_exists, is_recongized_difficulty, prompt_for_confirmation, time
-from projectbot.Configuration import Configuration
-from projectbot.RedditActions import RedditInterface
-
-app : BotInternals = None
+import signal
+import argparse
+import contextlib
+from projectbot.Constants import Const, Asset
+from projectbot.Utilities import ResponseFormatter, output_stats, get_help, check_file_exists, prompt_for_confirmation, time
+from projectbot.Logger import log, LEVEL_NAMES, INFO
+
+# The modules of the actions are imported in them, so the quick actions start fast
+app : 'BotInternals' = None
 formatter : ResponseFormatter = None
-
-class ThreadPostChecker(threading.Thread):
-    ''' This thread will check the posts on all queried subreddits '''
-    def __init__(self, name):
-        threading.Thread.__init__(self)
-        self.name = name
-
-    def run(self):
-        threading.Thread.run(self)
-        stream_subreddits()
-
-class ThreadCommentChecker(threading.Thread):
-    ''' This thread will check the comments on all queried subreddits '''
-    def __init__(self, name):
-        threading.Thread.__init__(self)
-        self.name = name
-
-    def run(self):
-        threading.Thread.run(self)
-        stream_subreddits_comments()
+recorder = None
 
 def process_comment(content):
     '''
@@ -50,26 +31,7 @@ def process_comment(content):
             difficulty (string): The difficulty requested
     '''
 
-    # Acceptable phrases to trigger the bot
-    phrases = []
-    phrases.append('u/' + app.config['username'])
-    phrases.append('!projectbot')
-
-    # Put to lowercase and remove extras
-    content = content.lower().replace('*', '').replace('_', ' ')
-
-    difficulty = 'all'
-    for phrase in phrases:
-        if phrase in content:
-            # Get the difficulty assuming it is the end of the phrase and the next word
-            index = content.index(phrase) + len(phrase)
-            if index < len(content):
-                difficulty = content[index:].split()[0]
-            if not is_recongized_difficulty(difficulty):
-                difficulty = 'all'
-            return True, difficulty
-
-    return False, ''
+    return app.trigger_scanner.scan(content)
 
 def process_title(title):
     '''
@@ -85,60 +47,24 @@ def process_title(title):
             error (string): Reason for rejection
     '''
 
-    errors = []
-
-    # Put to lowercase and remove extras
-    title = title.lower().replace("?", "").replace("!", "").replace(".", "").replace(",", "").replace("/", " ").replace("[", "").replace("]", "").replace("]", "").replace(":", "")
-    words = list(dict.fromkeys(title.split()).keys())
-
-    count = 0
-    total_words = len(words)
-
-    # Confirm Word length is met
-    if total_words < Const.MIN_NUM_WORDS_IN_TITLE:
-        errors.append(f'Minimum number of words {Const.MIN_NUM_WORDS_IN_TITLE} not met with {total_words} words')
-
-    # Process each work
-    for word in words:
-        if word in app.active_rejection_words:
-            errors.append(f'Rejecting ({word}): {title}')
-        if word in app.idea_query_words:
-            count += 1
-
-    # Calculate ratio
-    ratio = float(count / total_words)
-    if ratio < Const.ACCEPTABLE_RATIO:
-        errors.append(f'Minimum ratio is not met')
-
-    # Append label to error message to get total number errors
-    if len(errors) > 0:
-        errors.insert(0, f'{len(errors)} Errors')
-
-    return ratio, count, total_words, '\n'.join(errors)
+    return app.classifier.explain(title)
 
 def comment_already_has_bot_response(comment):
     ''' Determine if comment already contains the bot''s response'''
-
-    username = app.config['username']
-
-    # This is potentially intensive if calling for every comment
-    # Inititally the replies list is empty unless this is called
-    comment.refresh()
-
-    for inner_comment in comment.replies:
-        if inner_comment.author == username:
-            return True
-    return False
+    return app.response_index.contains(comment.fullname)
 
 def submission_contains_bot_response(submission):
     ''' Determine if the submission contains the bot post already '''
+    return app.response_index.contains(submission.fullname)
 
-    username = app.config['username']
+def record_bot_response(thing):
+    ''' Add a successful reply to the response index '''
+    app.response_index.add(thing.fullname)
 
-    for comment in submission.comments:
-        if comment.author == username:
-            return True
-    return False
+def release_bot_claim(thing):
+    ''' Let another worker reply to an item whose reply was never sent '''
+    if app.response_index.shared:
+        app.response_index.release(thing.fullname)
 
 def comment_is_made_by_bot(comment):
     ''' Determine if the comment is the bot itself '''
@@ -149,178 +75,456 @@ def comment_is_made_by_bot(comment):
 
     return False
 
-def submission_has_project_request(submission):
-    ''' Determine if the given submission is requesting help for a new project '''
-
-    has_project_request = False
-
-    # Confirm bot has not commented on post before
-    contains_bot_already = submission_contains_bot_response(submission)
-    if contains_bot_already:
-        return has_project_request
+def submission_title_requests_project(submission):
+    ''' Determine if the title of the given submission is requesting help for a new project '''
 
     # Process the post's title to check if it pass criteria for project request
     ratio, count, total_words, error = process_title(submission.title)
-    print('Id:', submission.id)
-    output_stats(submission.title, count, total_words, ratio, error)
     if error == '':
-        # print(f'Accepting:', submission.title)
-        has_project_request = True
-    else:
-        # print(f'Rejecting:', error)
-        has_project_request = False
-
-    return has_project_request
+        log.info('submission_accepted', id=submission.id, title=submission.title, count=count, total_words=total_words, ratio=ratio)
+        return True
 
-def comment_has_project_request(comment):
-    ''' Determine if the given comment is requesting help for a new project '''
+    # Nearly every post is rejected, only a sample of them is logged
+    log.sampled('submission_rejected', id=submission.id, title=submission.title, count=count, total_words=total_words, ratio=ratio, error=error)
+    return False
 
-    has_project_request = False
+def comment_requests_project(comment):
+    ''' Determine if the body of the given comment is requesting help for a new project '''
 
     # Confirm we are aren't processing a comment from the bot
     is_from_bot = comment_is_made_by_bot(comment)
     if is_from_bot:
-        return has_project_request, ''
+        return False, ''
 
     has_project_request, difficulty = process_comment(comment.body)
     if has_project_request:
-        # Confirm bot hasn't already responded to this comment already
-        # This is after the process_comment() because it can be intensive
-        # on every comment
-        bot_already_responded = comment_already_has_bot_response(comment)
-        if bot_already_responded:
-            # Override the request
-            has_project_request = False
-            return has_project_request, ''
-    
+        log.info('comment_accepted', id=comment.id, permalink=comment.permalink, difficulty=difficulty)
     return has_project_request, difficulty
 
-def respond_with_basic_response(submission):
-    ''' Reply with the basic response to give resources to a user'''
-    print('Responding with basic response')
-    response = formatter.format_basic_response()
-    try:
-        if app.config.SIMULATE:
+def send_response(send, kind, thing, response, idea=None):
+    ''' Hand the response to the reply scheduler, or only show it in simulation mode '''
+    reply = 'basic' if idea is None else 'idea'
+
+    def on_success(thing):
+        record_bot_response(thing)
+        app.activity.record_reply(kind, thing, reply, idea)
+
+    if app.config.SIMULATE:
+        if app.config.SIMULATE_WAIT_TO_CONFIRM:
+            # Shown right away since the prompt waits on it
             print('Would be output:\n', response)
-            if app.config.SIMULATE_WAIT_TO_CONFIRM:
-                option = prompt_for_confirmation()
-                if option == 'p':
-                    app.reddit.send_submission_response(submission, response)
+            option = prompt_for_confirmation()
+            if option == 'p':
+                app.reply_scheduler.submit(send, thing, response, on_success=on_success, on_drop=release_bot_claim)
         else:
-            app.reddit.send_submission_response(submission, response)
-        return True
-    except RedditAPIException as e:
-        print(e)
-        return False
+            log.info('simulated_reply', parent=thing.fullname, response=response)
+            app.activity.record_reply(kind, thing, reply, idea, simulated=True)
+    else:
+        app.reply_scheduler.submit(send, thing, response, on_success=on_success, on_drop=release_bot_claim)
+    return True
+
+def respond_with_basic_response(submission):
+    ''' Reply with the basic response to give resources to a user'''
+    log.info('reply', kind='basic', parent=submission.fullname)
+    response = formatter.format_basic_response(submission.subreddit)
+    return send_response(app.reddit.send_submission_response, 'submission', submission, response)
 
 def get_idea_and_respond_comment(comment, difficulty='all'):
     ''' Randomly get an idea and reply to the submission with it '''
-    idea = app.get_random_idea(app.ideas, difficulty)
+    # Avoid giving the same idea twice in a thread or to the same user
+    keys = [comment.link_id, f'u/{comment.author}']
+    idea = app.sample_idea(difficulty, keys)
     success = reply_comment_with_idea(comment, idea)
     return success
 
-def get_idea_and_respond_submission(submission, diffculty='all'):
-    ''' Randomly get an idea and reply to the submission with it '''
-    idea = app.get_random_idea(app.ideas, diffculty)
-    success = reply_submission_with_idea(submission, idea)
-    return success
-
 def reply_comment_with_idea(comment, idea):
     ''' Reply with the idea to given reddit comment '''
     if idea == None:
-        print('[CRIT]: Attempting to reply comment with a nulled idea')
-        return False
-
-    print(f'Responding to comment({comment.permalink}) with idea:', idea[0])
-    response = formatter.format_idea_response(idea)
-    try:
-        if app.config.SIMULATE:
-            print('Would be output:\n', response)
-            if app.config.SIMULATE_WAIT_TO_CONFIRM:
-                option = prompt_for_confirmation()
-                if option == 'p':
-                    app.reddit.send_comment_response(comment, response)
-        else:
-            app.reddit.send_comment_response(comment, response)
-        return True
-    except RedditAPIException as e:
-        print(e)
+        log.error('reply_without_idea', parent=comment.fullname)
         return False
 
-def reply_submission_with_idea(submission, idea):
-    ''' Reply with the idea to given reddit submission (post) '''
-    print('Responding to post with idea:', idea[0])
-    response = formatter.format_idea_response(idea)
-    try:
-        if app.config.SIMULATE:
-            print('Would be output:\n', response)
-            if app.config.SIMULATE_WAIT_TO_CONFIRM:
-                option = prompt_for_confirmation()
-                if option == 'p':
-                    app.reddit.send_submission_response(submission, response)
-        else:
-            app.reddit.send_submission_response(submission, response)
-        return True
-    except RedditAPIException as e:
-        print(e)
-        return False
+    log.info('reply', kind='idea', parent=comment.fullname, permalink=comment.permalink, idea=idea.name)
+    response = formatter.format_idea_response(idea, comment.subreddit)
+    return send_response(app.reddit.send_comment_response, 'comment', comment, response, idea.name)
 
 def stream_subreddits():
-    ''' Blocking method to continuously check all 'subreddits_to_scan' for new posts '''
+    ''' Blocking stream of new posts on all 'subreddits_to_scan' '''
     query = '+'.join(app.subreddits_to_scan)
     print('Starting Submission Stream - Post Query:', query)
     subreddits = app.reddit.query_subreddit(query)
-    for submission in subreddits.stream.submissions():
-        project_requested = submission_has_project_request(submission)
-        if project_requested:
-            success = respond_with_basic_response(submission)
-            if not success:
-                print('Failed to respond to post, trying again in', Const.RATE_LIMIT_SLEEP_TIME, 'seconds')
-                time.sleep(Const.RATE_LIMIT_SLEEP_TIME + 5)
-                respond_with_basic_response(submission)
+    return subreddits.stream.submissions()
 
 def stream_subreddits_comments():
-    ''' Blocking method to continuously check all 'subreddits_to_scan' for new comments '''
+    ''' Blocking stream of new comments on all 'subreddits_to_scan' '''
     query = '+'.join(app.subreddits_to_scan)
     print('Starting Comment Stream - Comment Query:', query)
     subreddits = app.reddit.query_subreddit(query)
-    for comment in subreddits.stream.comments():
-        project_requested, difficulty = comment_has_project_request(comment)
-        if project_requested:
-            success = get_idea_and_respond_comment(comment, difficulty)
-            if not success:
-                print('Failed to respond to comment, trying again in', Const.RATE_LIMIT_SLEEP_TIME, 'seconds')
-                time.sleep(Const.RATE_LIMIT_SLEEP_TIME + 5)
-                get_idea_and_respond_comment(comment, difficulty)
-
-def run():
-    ''' Run the main purpose application '''
+    return subreddits.stream.comments()
+
+def poll_subreddits():
+    ''' Blocking stream of (kind, thing) for the new posts and comments of each subreddit, polled adaptively '''
+    from projectbot.Poller import SubredditPoller
+
+    poller = SubredditPoller(app.reddit, app.subreddits_to_scan,
+                            requests_per_second=float(app.config.get('poll_requests_per_second', Const.POLL_REQUESTS_PER_SECOND)),
+                            min_interval=app.config.get_int('poll_min_interval', Const.POLL_MIN_INTERVAL),
+                            max_interval=app.config.get_int('poll_max_interval', Const.POLL_MAX_INTERVAL))
+    print('Starting Adaptive Polling -', len(app.subreddits_to_scan), 'subreddits')
+    return poller.items()
+
+def get_sources():
+    ''' Get the streams of items to scan as (kind, iterable), a kind of None streams (kind, thing) '''
+    if app.config.get('polling', 'stream').lower() == 'adaptive':
+        return [(None, poll_subreddits())]
+    return [('submission', stream_subreddits()), ('comment', stream_subreddits_comments())]
+
+def classify_item(kind, thing):
+    ''' Pipeline classify stage, returns if the item is asking for a project and the difficulty '''
+    from projectbot.Metrics import CLASSIFY_SECONDS, DECISIONS
+
+    started = time.perf_counter()
+    if kind == 'submission':
+        accepted, difficulty = submission_title_requests_project(thing), 'all'
+    else:
+        accepted, difficulty = comment_requests_project(thing)
+    CLASSIFY_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    DECISIONS.labels(kind, 'accepted' if accepted else 'rejected').inc()
+    app.activity.record_decision(kind, thing, accepted, difficulty)
+
+    if recorder is not None:
+        recorder.record_decision(kind, thing, accepted, difficulty)
+    return accepted, difficulty
+
+def item_already_has_bot_response(kind, thing):
+    ''' Pipeline dedup stage, returns if the bot already responded to the item '''
+    from projectbot.Metrics import DEDUP_SECONDS, DUPLICATES
+
+    started = time.perf_counter()
+    if kind == 'submission':
+        duplicate = submission_contains_bot_response(thing)
+    else:
+        duplicate = comment_already_has_bot_response(thing)
+    if not duplicate and app.response_index.shared:
+        # Another worker process may be about to reply to the same item
+        duplicate = not app.response_index.claim(thing.fullname)
+    DEDUP_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    if duplicate:
+        DUPLICATES.labels(kind).inc()
+    return duplicate
+
+def reply_to_item(kind, thing, difficulty):
+    ''' Pipeline reply stage, schedules the response for the item '''
+    if kind == 'submission':
+        return respond_with_basic_response(thing)
+    return get_idea_and_respond_comment(thing, difficulty)
+
+def create_pipeline():
+    ''' Create the ingestion pipeline with the worker counts from the config '''
+    # Imported here so the quick actions do not load asyncio
+    from projectbot.Pipeline import IngestionPipeline
+
+    reply_workers = app.config.get_int('pipeline_reply_workers', Const.PIPELINE_REPLY_WORKERS)
+    if app.config.SIMULATE_WAIT_TO_CONFIRM:
+        # Only one prompt can be answered at a time
+        reply_workers = 1
+
+    return IngestionPipeline(classify_item, item_already_has_bot_response, reply_to_item,
+                            queue_size=app.config.get_int('pipeline_queue_size', Const.PIPELINE_QUEUE_SIZE),
+                            classify_workers=app.config.get_int('pipeline_classify_workers', Const.PIPELINE_CLASSIFY_WORKERS),
+                            dedup_workers=app.config.get_int('pipeline_dedup_workers', Const.PIPELINE_DEDUP_WORKERS),
+                            reply_workers=reply_workers)
+
+def start_metrics():
+    ''' Serve the metrics for Prometheus if a port is configured '''
+    from projectbot.Metrics import REPLIES_PENDING, start_metrics_server
+
+    port = app.config.get_int('metrics_port', 0)
+    if port <= 0:
+        return
+    host = app.config.get('metrics_host', Const.METRICS_HOST)
+    REPLIES_PENDING.set_function(app.reply_scheduler.pending)
+    start_metrics_server(port, host)
+    print(f'Serving metrics on http://{host}:{port}/metrics')
+
+def configure_logging():
+    ''' Set the log verbosity from the config, SIGUSR1/SIGUSR2 make it more/less verbose while running '''
+    log.set_level(app.config.get('log_level', Const.LOG_LEVEL))
+    log.set_sample_rate(app.config.get('log_sample_rate', Const.LOG_SAMPLE_RATE))
+
+    def change_level(step):
+        levels = sorted(LEVEL_NAMES)
+        position = levels.index(log.level) if log.level in levels else levels.index(INFO)
+        log.set_level(levels[min(len(levels) - 1, max(0, position + step))])
+        log.warning('log_level_changed', level=log.get_level_name())
+
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: change_level(-1))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: change_level(1))
+
+def run(capture : 'CaptureWriter' = None, drain_timeout=0):
+    '''
+        Run the main purpose application, optionally recording everything the streams see
+
+        Parameters:
+            capture (CaptureWriter): Records the streams when given
+            drain_timeout (float): Seconds spent sending the queued replies once the streams end, 0 drops them
+    '''
+    global recorder
+    from projectbot.Metrics import instrument_stream
+
+    configure_logging()
     app.initialize()
+    start_metrics()
+    app.start_corpus_refresh()
+    app.seed_response_index()
+    app.reply_scheduler.start()
+
+    sources = [(kind, instrument_stream(kind, iterable)) for kind, iterable in get_sources()]
+    if capture is not None:
+        print('Capturing to:', capture.directory)
+        recorder = capture
+        sources = [(kind, capture.record_stream(kind, iterable)) for kind, iterable in sources]
+
+    pipeline = create_pipeline()
+    for kind, iterable in sources:
+        pipeline.add_source(kind, iterable)
+
+    # Blocks until the streams end
+    try:
+        pipeline.run()
+    finally:
+        # Unsent replies release their claims
+        app.reply_scheduler.stop(drain=drain_timeout > 0, timeout=drain_timeout or None)
+        if capture is not None:
+            capture.close()
+        app.activity.stop()
+        log.flush()
+
+def run_shard(worker_id, subreddits, bucket, simulate):
+    '''
+        Worker process entry, runs the bot on its share of the subreddits
 
-    threads = []
-    thread_post_checker = ThreadPostChecker('Post Checker')
-    threads.append(thread_post_checker)
+        Parameters:
+            worker_id (string): Name of the worker
+            subreddits (list<string>): The subreddits this worker scans
+            bucket (SharedTokenBucket): The reply budget shared by every worker
+            simulate (boolean): Do not post to reddit
+    '''
+    global app, formatter
+    from projectbot.Internals import BotInternals
 
-    thread_comment_checker = ThreadCommentChecker('Comment Stream Checker')
-    threads.append(thread_comment_checker)
+    app = BotInternals()
+    formatter = ResponseFormatter(app.config['repo_url'])
+    app.add_corpus_listener(formatter.invalidate)
+    if simulate:
+        app.turn_ON_simulation_mode()
 
-    # Start all threads
-    for thread in threads:
-        thread.daemon = True
-        thread.start()
+    app.subreddits_to_scan = subreddits
+    app.reply_scheduler.bucket = bucket
+    app.response_index.shared = True
+
+    def stop_shard(signum, frame):
+        # Ends the pipeline, run() then sends the replies already queued
+        log.info('shard_stopping', worker=worker_id)
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, stop_shard)
+
+    log.info('shard_running', worker=worker_id, subreddits=subreddits)
+    run(drain_timeout=app.config.get_int('shard_drain_timeout', Const.SHARD_DRAIN_TIMEOUT))
+
+def run_sharded(workers):
+    ''' Split the subreddits over worker processes, restarting and rebalancing them as they die '''
+    from projectbot.ReplyScheduler import SharedTokenBucket
+    from projectbot.Sharding import ShardSupervisor
+
+    bucket = SharedTokenBucket(Const.REPLY_BUCKET_CAPACITY, Const.REPLY_BUCKET_RATE)
+    supervisor = ShardSupervisor(app.subreddits_to_scan, workers, run_shard, args=(bucket, app.config.SIMULATE),
+                                check_interval=app.config.get_int('shard_check_interval', Const.SHARD_CHECK_INTERVAL),
+                                restart_delay=app.config.get_int('shard_restart_delay', Const.SHARD_RESTART_DELAY),
+                                stop_timeout=app.config.get_int('shard_stop_timeout', Const.SHARD_STOP_TIMEOUT))
+    print(f'Scanning {len(app.subreddits_to_scan)} subreddits with {workers} worker processes')
+    supervisor.run()
+
+def replay(path, speed=0.0):
+    '''
+        Push a capture through the decision pipeline against a fake reddit
 
-    # Join all threads
-    for thread in threads:
-        thread.join()
+        Parameters:
+            path (string): Capture file or folder of capture files
+            speed (float): Multiple of real time, 0 replays as fast as possible
+    '''
+    global recorder
+    from projectbot.Capture import ReplayRecorder, read_events, load_fake_reddit, get_recorded_decisions
+    from projectbot.FakeReddit import FakeRedditInterface
+    from projectbot.ReplyScheduler import ReplyScheduler, TokenBucket
+    from projectbot.ResponseIndex import ResponseIndex
+    from projectbot.Activity import ActivityStore
 
-def test_phrase(phrase):
-    ''' Test a specific phrase to see how the main application would interpret it '''
     app.initialize()
+    events = list(read_events(path))
+    fake = FakeRedditInterface(app.config['username'])
+    replayed = ReplayRecorder(load_fake_reddit(fake, events), get_recorded_decisions(events))
+    print('Replaying:', len(fake.submissions), 'submissions and', len(fake.comments), 'comments')
+
+    # Nothing replayed may reach reddit or the real response index, and replies are not rate limited
+    app.reddit = fake
+    app.response_index = ResponseIndex(':memory:')
+    app.response_index.open()
+    app.activity = ActivityStore(None)
+    app.reply_scheduler = ReplyScheduler(bucket=TokenBucket(Const.REPLAY_REPLY_BUDGET, Const.REPLAY_REPLY_BUDGET), retry_exceptions=())
+    recorder = replayed
+
+    stream = fake.query_subreddit('all').stream
+    pipeline = create_pipeline()
+    pipeline.add_source('submission', replayed.pace(stream.submissions(), speed))
+    pipeline.add_source('comment', replayed.pace(stream.comments(), speed))
+
+    app.reply_scheduler.start()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        pipeline.run()
+        app.reply_scheduler.stop(drain=True)
+        log.flush()
+
+    elapsed = pipeline.finished_at - pipeline.started_at
+    print(f'Replayed {pipeline.stats["fetched"]} items in {elapsed:.2f}s ({pipeline.get_throughput():.0f} items/s)')
+    print('Pipeline:', pipeline.stats)
+    print('Replies formatted and sent:', len(fake.sent))
+
+    diffs = replayed.get_diffs()
+    print('Decisions compared:', replayed.get_compared_count(), 'differing:', len(diffs))
+    for fullname, kind, expected, actual in diffs[:Const.REPLAY_MAX_DIFFS_SHOWN]:
+        print(f'    {kind} {fullname}: recorded {expected}, replayed {actual}')
+
+def classify_page(kind, things):
+    ''' Backfill classify stage, the decision of every item of a page as (accepted, difficulty) '''
+    if kind == 'submission':
+        # The title check of a whole page at once
+        return [(accepted, 'all') for accepted in app.classifier.classify_many([thing.title for thing in things])]
+    return [comment_requests_project(thing) for thing in things]
+
+def backfill(args):
+    ''' Page back through the subreddits, recording a decision for every item and optionally replying to recent ones '''
+    from projectbot.Capture import CaptureWriter
+    from projectbot.Backfill import Backfiller, BackfillCheckpoint
+
+    parser = argparse.ArgumentParser(prog='bot.py backfill', description='Classify the history of the subreddits')
+    parser.add_argument('--hours', type=float, default=Const.BACKFILL_MAX_AGE / 3600, help='How far back to go')
+    parser.add_argument('--max-items', type=int, default=0, help='Items per subreddit listing, 0 for no limit')
+    parser.add_argument('--reply', action='store_true', help='Reply to accepted items without a response from the bot')
+    parser.add_argument('--reply-hours', type=float, default=Const.BACKFILL_REPLY_MAX_AGE / 3600, help='Only reply to items newer than this')
+    parser.add_argument('--output', default=Asset.dir_backfill, help='Folder the items and decisions are recorded to')
+    parser.add_argument('--checkpoint', default=Asset.file_backfill_checkpoint, help='File the progress is saved to')
+    parser.add_argument('--restart', action='store_true', help='Ignore the saved progress and start over')
+    options = parser.parse_args(args)
+
+    configure_logging()
+    app.initialize()
+    checkpoint = BackfillCheckpoint(options.checkpoint)
+    if not options.restart and checkpoint.load():
+        print('Resuming backfill from:', options.checkpoint)
+
+    on_accepted = None
+    if options.reply:
+        app.seed_response_index()
+        app.reply_scheduler.start()
+        def on_accepted(kind, thing, difficulty):
+            if time.time() - thing.created_utc > options.reply_hours * 3600:
+                return
+            if not item_already_has_bot_response(kind, thing):
+                reply_to_item(kind, thing, difficulty)
+
+    writer = CaptureWriter(options.output, max_files=0)
+    backfiller = Backfiller(app.reddit, app.subreddits_to_scan, classify_page, writer, checkpoint,
+                            max_items=options.max_items, max_age=options.hours * 3600, on_accepted=on_accepted)
+    print(f'Backfilling {len(app.subreddits_to_scan)} subreddits to:', options.output)
+    started = time.perf_counter()
+    try:
+        finished = backfiller.run()
+    finally:
+        writer.close()
+        if options.reply:
+            app.reply_scheduler.stop(drain=True)
+            app.activity.stop()
+        log.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f'Backfilled {backfiller.stats["items"]} items with {backfiller.stats["requests"]} requests in {elapsed:.1f}s, {backfiller.stats["accepted"]} accepted')
+    if not finished:
+        print('Not finished, run backfill again to resume')
+
+def test_phrase(phrase, snapshot_path=Asset.file_corpus_snapshot):
+    ''' Test a specific phrase to see how the main application would interpret it '''
+    from projectbot.BulkTest import load_vocabulary
+    from projectbot.Classifier import TitleClassifier
+    classifier = TitleClassifier(*load_vocabulary(snapshot_path))
 
     # Process the phrase and report
-    ratio, count, total, error = process_title(phrase)
+    ratio, count, total, error = classifier.explain(phrase)
     output_stats(phrase, count, total, ratio, error)
 
+def test_titles(path, output_format='csv', output_path=None, workers=None, chunk_size=Const.BULK_TEST_CHUNK_SIZE, snapshot_path=Asset.file_corpus_snapshot, vectorized=False):
+    '''
+        Test a file of titles, with optional labels, and report how each one was judged
+
+        Parameters:
+            path (string): Text or CSV file of titles, '-' reads stdin
+            output_format (string): 'csv' or 'jsonl'
+            output_path (string): File the stats of each title are written to, stdout when missing
+    '''
+    from projectbot.BulkTest import BulkTester, ConfusionMatrix, ResultWriter, read_titles, load_vocabulary
+
+    tester = BulkTester(*load_vocabulary(snapshot_path), workers=workers, chunk_size=chunk_size, vectorized=vectorized)
+    matrix = ConfusionMatrix()
+
+    started = time.perf_counter()
+    reader = sys.stdin if path == '-' else open(path, newline='')
+    writer = sys.stdout if output_path is None else open(output_path, 'w', newline='')
+    try:
+        output = ResultWriter(writer, output_format)
+        for title, label, stats in tester.run(read_titles(reader, path.lower().endswith('.csv'))):
+            output.write(title, label, stats)
+            matrix.add(stats[3] == '', label)
+    finally:
+        if reader is not sys.stdin:
+            reader.close()
+        if writer is not sys.stdout:
+            writer.close()
+        else:
+            writer.flush()
+    elapsed = time.perf_counter() - started
+
+    # The summary goes to stderr so the stats can be piped
+    total = matrix.get_labelled_count() + matrix.unlabelled
+    print(f'Tested {total} titles in {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0:.0f} titles/s) with {tester.workers} workers', file=sys.stderr)
+    if matrix.get_labelled_count() > 0:
+        print(matrix.format(), file=sys.stderr)
+
+def test(args):
+    ''' Test a phrase, or a file of titles, without connecting to reddit or mongo '''
+    parser = argparse.ArgumentParser(prog='bot.py test', description='Test how the bot judges titles')
+    parser.add_argument('phrase', nargs='?', help='A single phrase to test')
+    parser.add_argument('--file', help="Text file of titles, one per line with an optional label and tab before it, a CSV with title/label columns or '-' for stdin")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--output', help='File the stats of each title are written to, defaults to stdout')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes, defaults to the number of cpus')
+    parser.add_argument('--chunk-size', type=int, default=Const.BULK_TEST_CHUNK_SIZE)
+    parser.add_argument('--snapshot', default=Asset.file_corpus_snapshot, help='Corpus snapshot the words are read from')
+    parser.add_argument('--vectorized', action='store_true', help='Score chunks of titles at once with NumPy, for large files')
+    options = parser.parse_args(args)
+
+    if options.vectorized:
+        from projectbot.VectorClassifier import is_available
+        if not is_available():
+            print('[Error]: --vectorized needs numpy, pip install numpy')
+            return
+
+    if options.file is not None:
+        test_titles(options.file, options.format, options.output, options.workers, options.chunk_size, options.snapshot, options.vectorized)
+    elif options.phrase is not None:
+        test_phrase(options.phrase, options.snapshot)
+    else:
+        parser.print_usage()
+
 def start():
     ''' Run test method for the application '''
 
@@ -331,9 +535,7 @@ def start():
         else:
             print('Too many arguments to run normal operation')
     elif action == 'test':
-        if len(sys.argv) >= 3:
-            phrase = sys.argv[2]
-            test_phrase(phrase)
+        test(sys.argv[2:])
     elif action == 'sim':
         app.turn_ON_simulation_mode()
 
@@ -344,8 +546,31 @@ def start():
                 print('Unknown simulation argument:', sys.argv[2])
 
         run()
+    elif action == 'capture':
+        # Only records unless told to also post
+        if len(sys.argv) < 3 or sys.argv[2].lower() != 'live':
+            app.turn_ON_simulation_mode()
+
+        from projectbot.Capture import CaptureWriter
+        capture = CaptureWriter(app.config.get('capture_dir', Asset.dir_captures),
+                                max_bytes=app.config.get_int('capture_max_bytes', Const.CAPTURE_MAX_BYTES),
+                                max_files=app.config.get_int('capture_max_files', Const.CAPTURE_MAX_FILES))
+        run(capture)
+    elif action == 'shard':
+        workers = int(sys.argv[2]) if len(sys.argv) >= 3 else app.config.get_int('shard_workers', os.cpu_count() or 1)
+        run_sharded(workers)
+    elif action == 'backfill':
+        backfill(sys.argv[2:])
+    elif action == 'replay':
+        if len(sys.argv) >= 3:
+            speed = float(sys.argv[3]) if len(sys.argv) >= 4 else 0.0
+            replay(sys.argv[2], speed)
+        else:
+            print('Missing the capture file to replay')
     elif action == 'ver':
-        version = app.config['version']
+        # Only the config is read, not the corpus or reddit
+        from projectbot.Configuration import Configuration
+        version = Configuration()['version']
         print(version)
     elif action == 'help':
         output = get_help()
@@ -370,7 +595,14 @@ def main():
     except KeyboardInterrupt:
         print('')
 
+def is_offline_action():
+    ''' Determine if the action runs without reddit or mongo, it reads the config itself if it needs it '''
+    return len(sys.argv) < 2 or sys.argv[1].lower() in ('test', 'help', 'ver')
+
 if __name__ == "__main__":
-    app = BotInternals()
-    formatter = ResponseFormatter(app.config['repo_url'])
+    if not is_offline_action():
+        from projectbot.Internals import BotInternals
+        app = BotInternals()
+        formatter = ResponseFormatter(app.config['repo_url'])
+        app.add_corpus_listener(formatter.invalidate)
     main()
@@ -0,0 +1,230 @@
+import time
+import sqlite3
+import threading
+from collections import deque
+from projectbot.Capture import get_name
+from projectbot.Database import CircuitBreaker
+from projectbot.Constants import Const, Asset
+from projectbot.Logger import log
+
+# The fields of every record, in the order of the record tuples
+FIELDS = ('at', 'type', 'kind', 'fullname', 'subreddit', 'author', 'accepted', 'difficulty', 'reply', 'idea', 'simulated')
+
+# Fields queried together, each index is created by both stores
+INDEXES = [
+    ('at',),
+    ('type', 'at'),
+    ('subreddit', 'at'),
+    ('fullname',),
+]
+
+def create_decision_record(kind, thing, accepted, difficulty, at=None):
+    ''' Create the record of the classify decision made on a submission or comment '''
+    return (at if at is not None else time.time(), 'decision', kind, thing.fullname,
+            get_name(thing.subreddit), get_name(thing.author), bool(accepted), difficulty, None, None, False)
+
+def create_reply_record(kind, thing, reply, idea=None, simulated=False, at=None):
+    '''
+        Create the record of a reply sent to a submission or comment
+
+        Parameters:
+            reply (string): 'basic' or 'idea'
+            idea (string): Name of the idea given
+            simulated (boolean): Only shown, not posted to reddit
+    '''
+    return (at if at is not None else time.time(), 'reply', kind, thing.fullname,
+            get_name(thing.subreddit), get_name(thing.author), None, None, reply, idea, bool(simulated))
+
+class MongoActivitySink:
+    '''
+        Inserts the records into a mongo collection through the Database
+
+        The writes have their own circuit breaker, so failed writes only send
+        batches to the fallback and never make the corpus loading skip mongo
+    '''
+    name = 'mongo'
+
+    def __init__(self, database, collection=Asset.coll_activity_mongo, breaker=None):
+        self.database = database
+        self.collection = collection
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.indexed = False
+
+    def write(self, records):
+        if not self.indexed:
+            self.breaker.call(self.database.create_indexes, self.collection, [[(field, 1) for field in index] for index in INDEXES])
+            self.indexed = True
+        self.breaker.call(self.database.insert_docs, self.collection, [dict(zip(FIELDS, record)) for record in records])
+
+    def close(self):
+        pass
+
+class SqliteActivitySink:
+    ''' Inserts the records into a sqlite file, only used from the flusher thread '''
+    name = 'sqlite'
+
+    def __init__(self, path=Asset.file_activity_db):
+        self.path = path
+        self.connection = None
+
+    def open(self):
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=Const.RESPONSE_INDEX_BUSY_TIMEOUT)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS activity (at REAL, type TEXT, kind TEXT, fullname TEXT, subreddit TEXT, '
+                                'author TEXT, accepted INTEGER, difficulty TEXT, reply TEXT, idea TEXT, simulated INTEGER)')
+        for index in INDEXES:
+            name = 'activity_' + '_'.join(index)
+            self.connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON activity ({", ".join(index)})')
+        self.connection.commit()
+
+    def write(self, records):
+        if self.connection is None:
+            self.open()
+        with self.connection:
+            self.connection.executemany(f'INSERT INTO activity VALUES ({", ".join("?" * len(FIELDS))})', records)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class ActivityStore:
+    '''
+        Write-behind store of the decisions the bot makes and the replies it sends
+
+        Like the logger, a record only appends a tuple to a buffer, so the stream
+        threads never wait on a database. A background thread writes the buffer in
+        batches every flush interval, or sooner once a batch is waiting. A batch the
+        store fails to take goes to the fallback store. When the buffer is full new
+        records are dropped and counted. stop() writes everything still buffered.
+
+        Parameters:
+            sink (MongoActivitySink/SqliteActivitySink): Where the records are written, None records nothing
+            fallback (SqliteActivitySink): Optionally where a batch goes when the sink fails
+            flush_interval (float): Seconds between writes
+            batch_size (int): Records written together
+            max_buffer (int): Records held before new ones are dropped
+    '''
+    def __init__(self, sink, fallback=None, flush_interval=Const.ACTIVITY_FLUSH_INTERVAL,
+                batch_size=Const.ACTIVITY_BATCH_SIZE, max_buffer=Const.ACTIVITY_MAX_BUFFER):
+        self.sink = sink
+        self.fallback = fallback
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.max_buffer = max_buffer
+
+        self.buffer = deque()
+        self.dropped = 0
+        self.write_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.stopped = False
+        self.thread = None
+        self.stats = {
+            'recorded': 0,
+            'written': 0,
+            'fallback': 0,
+            'failed': 0,
+            'dropped': 0,
+        }
+
+    def is_enabled(self):
+        return self.sink is not None
+
+    def record(self, record):
+        ''' Buffer a record to be written, never blocks '''
+        if self.sink is None or self.stopped:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.buffer.append(record)
+        self.stats['recorded'] += 1
+        if self.thread is None:
+            self.start()
+        elif len(self.buffer) >= self.batch_size:
+            self.wake_event.set()
+
+    def record_decision(self, kind, thing, accepted, difficulty):
+        self.record(create_decision_record(kind, thing, accepted, difficulty))
+
+    def record_reply(self, kind, thing, reply, idea=None, simulated=False):
+        self.record(create_reply_record(kind, thing, reply, idea, simulated))
+
+    def start(self):
+        ''' Start the background flusher, done on the first record '''
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='Activity Flusher', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        ''' Stop the flusher after writing everything buffered, later records are ignored '''
+        self.stopped = True
+        self.wake_event.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.thread = None
+        self.flush()
+        for store in (self.sink, self.fallback):
+            if store is not None:
+                store.close()
+
+    def run(self):
+        while not self.stopped:
+            self.wake_event.wait(self.flush_interval)
+            self.wake_event.clear()
+            self.flush()
+
+    def write_batch(self, batch):
+        try:
+            self.sink.write(batch)
+            self.stats['written'] += len(batch)
+            return
+        except Exception as e:
+            log.error('activity_write_failed', store=self.sink.name, records=len(batch), error=str(e))
+
+        if self.fallback is not None:
+            try:
+                self.fallback.write(batch)
+                self.stats['fallback'] += len(batch)
+                return
+            except Exception as e:
+                log.error('activity_write_failed', store=self.fallback.name, records=len(batch), error=str(e))
+        self.stats['failed'] += len(batch)
+
+    def flush(self):
+        ''' Write every buffered record in batches '''
+        with self.write_lock:
+            buffer = self.buffer
+            while buffer:
+                batch = []
+                while buffer and len(batch) < self.batch_size:
+                    batch.append(buffer.popleft())
+                self.write_batch(batch)
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.stats['dropped'] += dropped
+                log.warning('activity_records_dropped', count=dropped)
+
+def create_activity_store(setting, database=None, path=Asset.file_activity_db, **options):
+    '''
+        Create the activity store for a setting
+
+        Parameters:
+            setting (string): 'mongo' writes through the database with sqlite as the fallback, 'sqlite' only writes the file, 'off' records nothing
+            database (Database): Used by the mongo setting
+            path (string): The sqlite file
+
+        Returns:
+            store (ActivityStore): The store, which records nothing when off
+    '''
+    setting = setting.lower()
+    if setting == 'mongo' and database is not None:
+        return ActivityStore(MongoActivitySink(database), SqliteActivitySink(path), **options)
+    if setting in ('mongo', 'sqlite'):
+        return ActivityStore(SqliteActivitySink(path), **options)
+    if setting != 'off':
+        print('[Error]: Unknown activity store, not recording activity:', setting)
+    return ActivityStore(None, **options)
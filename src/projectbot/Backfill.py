@@ -0,0 +1,179 @@
+import os
+import time
+import json
+import tempfile
+from projectbot.Capture import create_event
+from projectbot.Constants import Const
+from projectbot.Logger import log
+
+KINDS = ('submission', 'comment')
+
+class BackfillCheckpoint:
+    '''
+        Progress of a backfill through every listing, saved after each page
+
+        A listing is the new submissions or comments of one subreddit. Each keeps
+        the fullname its next page starts after, so a stopped backfill resumes
+        from there instead of fetching everything again
+
+        Parameters:
+            path (string): JSON file the progress is saved to
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.started_at = None
+        self.listings = {}
+
+    def load(self):
+        ''' Read the saved progress, starting over when there is none or it is unreadable '''
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            self.started_at = data['started_at']
+            self.listings = data['listings']
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print('[Error]: Failed to read backfill checkpoint:', e)
+            return False
+
+    def save(self):
+        ''' Write the progress, replacing the old file atomically '''
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(prefix='.checkpoint-', dir=directory)
+        try:
+            with os.fdopen(handle, 'w') as file:
+                json.dump({'started_at': self.started_at, 'listings': self.listings}, file, indent=4, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, subreddit, kind):
+        ''' Get the progress of a listing, created when it has not been started '''
+        key = f'{subreddit.lower()}/{kind}'
+        if key not in self.listings:
+            self.listings[key] = {'after': None, 'count': 0, 'accepted': 0, 'oldest_utc': None, 'done': False}
+        return self.listings[key]
+
+class Backfiller:
+    '''
+        Pages back through the new submissions and comments of each subreddit
+
+        Pages are fetched with the largest page size and classified a page at a
+        time. Every item and decision is written to the capture writer, so a
+        backfill can be replayed and tuned against like a capture. A listing
+        stops at max_items items, at items older than max_age seconds or at its
+        end; reddit only serves about the newest 1000 items of a listing
+
+        Parameters:
+            reddit (RedditInterface): Used for query_subreddit()
+            subreddits (list<string>): The subreddits to backfill
+            classify (function): Called with a kind and a page of things, returns (accepted, difficulty) of each
+            writer (CaptureWriter): Records the items and decisions
+            checkpoint (BackfillCheckpoint): The progress, saved after each page
+            max_items (int): Items per listing, 0 has no limit
+            max_age (float): Seconds back from the start of the backfill
+            on_accepted (function): Optionally called with the kind, thing and difficulty of accepted items
+    '''
+    def __init__(self, reddit, subreddits, classify, writer, checkpoint,
+                max_items=0, max_age=Const.BACKFILL_MAX_AGE, page_size=Const.BACKFILL_PAGE_SIZE,
+                on_accepted=None, clock=time.time):
+        self.reddit = reddit
+        self.subreddits = subreddits
+        self.classify = classify
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.max_items = max_items
+        self.max_age = max_age
+        self.page_size = page_size
+        self.on_accepted = on_accepted
+        self.clock = clock
+        self.stopped = False
+        self.stats = {
+            'requests': 0,
+            'items': 0,
+            'accepted': 0,
+        }
+
+    def stop(self):
+        ''' Stop after the page being processed, its progress is still saved '''
+        self.stopped = True
+
+    def get_cutoff(self):
+        ''' Get the oldest created time backfilled, fixed when the backfill first started '''
+        if self.checkpoint.started_at is None:
+            self.checkpoint.started_at = self.clock()
+        return self.checkpoint.started_at - self.max_age
+
+    def fetch_page(self, subreddit, kind, after):
+        ''' Get one page of a listing, newest first '''
+        params = {'after': after} if after is not None else {}
+        listing = self.reddit.query_subreddit(subreddit)
+        if kind == 'submission':
+            things = listing.new(limit=self.page_size, params=params)
+        else:
+            things = listing.comments(limit=self.page_size, params=params)
+        self.stats['requests'] += 1
+        return list(things)
+
+    def process_page(self, kind, things, progress):
+        ''' Classify and record a page, returns if the listing is done '''
+        cutoff = self.get_cutoff()
+        kept = [thing for thing in things if thing.created_utc >= cutoff]
+        done = len(kept) < len(things) or len(things) < self.page_size
+        if self.max_items > 0:
+            remaining = self.max_items - progress['count']
+            if len(kept) >= remaining:
+                kept = kept[:remaining]
+                done = True
+
+        decisions = self.classify(kind, kept) if kept else []
+        for thing, (accepted, difficulty) in zip(kept, decisions):
+            self.writer.write(create_event(kind, thing))
+            self.writer.record_decision(kind, thing, accepted, difficulty)
+            if accepted:
+                progress['accepted'] += 1
+                self.stats['accepted'] += 1
+                if self.on_accepted is not None:
+                    self.on_accepted(kind, thing, difficulty)
+
+        progress['count'] += len(kept)
+        self.stats['items'] += len(kept)
+        if things:
+            progress['after'] = things[-1].fullname
+            progress['oldest_utc'] = things[-1].created_utc
+        return done
+
+    def backfill_listing(self, subreddit, kind):
+        progress = self.checkpoint.get(subreddit, kind)
+        while not progress['done'] and not self.stopped:
+            try:
+                things = self.fetch_page(subreddit, kind, progress['after'])
+            except Exception as e:
+                # The checkpoint keeps the listing where it was for the next run
+                log.error('backfill_fetch_failed', subreddit=subreddit, kind=kind, error=str(e))
+                return
+            progress['done'] = self.process_page(kind, things, progress)
+            self.checkpoint.save()
+            log.info('backfill_page', subreddit=subreddit, kind=kind, items=len(things),
+                    count=progress['count'], accepted=progress['accepted'], done=progress['done'])
+
+    def run(self):
+        '''
+            Backfill every listing which is not done yet
+
+            Returns:
+                finished (boolean): Every listing reached its end or bound
+        '''
+        self.get_cutoff()
+        for subreddit in self.subreddits:
+            for kind in KINDS:
+                if self.stopped:
+                    return False
+                self.backfill_listing(subreddit, kind)
+        self.checkpoint.save()
+        return all(self.checkpoint.get(subreddit, kind)['done'] for subreddit in self.subreddits for kind in KINDS)
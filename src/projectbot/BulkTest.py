@@ -0,0 +1,231 @@
+import os
+import csv
+import sys
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from projectbot.Classifier import TitleClassifier
+from projectbot.Snapshot import SnapshotError, read_snapshot
+from projectbot.Constants import Const, Asset
+
+OUTPUT_FIELDS = ['title', 'label', 'accepted', 'count', 'total_words', 'ratio', 'error']
+
+TRUE_LABELS = frozenset(['1', 'true', 'yes', 'y', 'accept', 'accepted'])
+FALSE_LABELS = frozenset(['0', 'false', 'no', 'n', 'reject', 'rejected'])
+
+def parse_label(text):
+    ''' Get the label as a boolean, None if it is not a label '''
+    text = text.strip().lower()
+    if text in TRUE_LABELS:
+        return True
+    if text in FALSE_LABELS:
+        return False
+    return None
+
+def read_titles(reader, is_csv=False):
+    '''
+        Read titles with optional labels
+
+        Text is one title per line, optionally with the label and a tab before it.
+        CSV needs a 'title' column and can have a 'label' column.
+
+        Returns:
+            titles (generator<tuple>): (title, label) of each title, label is None when missing
+    '''
+    if is_csv:
+        for row in csv.DictReader(reader):
+            title = row.get('title')
+            if title:
+                yield title, parse_label(row.get('label') or '')
+        return
+
+    for line in reader:
+        line = line.rstrip('\r\n')
+        if line.strip() == '':
+            continue
+        label = None
+        if '\t' in line:
+            first, rest = line.split('\t', 1)
+            label = parse_label(first)
+            if label is not None:
+                line = rest
+        yield line, label
+
+def load_vocabulary(snapshot_path=Asset.file_corpus_snapshot):
+    '''
+        Get the suggestion and rejection words without mongo, from the corpus
+        snapshot or else the local word files
+
+        Returns:
+            suggestions (list<string>): The suggestion words
+            rejections (list<string>): The rejection words
+    '''
+    if os.path.exists(snapshot_path):
+        try:
+            snapshot = read_snapshot(snapshot_path)
+            return snapshot.suggestions, snapshot.rejections
+        except (OSError, ValueError, EOFError, SnapshotError) as e:
+            print('[Error]: Failed to read corpus snapshot:', e, file=sys.stderr)
+
+    with open(Asset.file_suggestion_words, 'r') as reader:
+        suggestions = reader.read().split()
+    with open(Asset.file_rejection_words, 'r') as reader:
+        rejections = reader.read().split()
+    return suggestions, rejections
+
+# The classifier of a pool worker, built once per process
+worker_classifier = None
+
+def init_worker(suggestions, rejections):
+    global worker_classifier
+    worker_classifier = TitleClassifier(suggestions, rejections)
+
+def explain_chunk(titles):
+    ''' Pool worker, explain every title of a chunk '''
+    return [worker_classifier.explain(title) for title in titles]
+
+class ConfusionMatrix:
+    ''' Counts of the decisions against the labels '''
+    def __init__(self):
+        self.true_positive = 0
+        self.false_positive = 0
+        self.true_negative = 0
+        self.false_negative = 0
+        self.unlabelled = 0
+
+    def add(self, accepted, label):
+        if label is None:
+            self.unlabelled += 1
+        elif accepted and label:
+            self.true_positive += 1
+        elif accepted:
+            self.false_positive += 1
+        elif label:
+            self.false_negative += 1
+        else:
+            self.true_negative += 1
+
+    def get_labelled_count(self):
+        return self.true_positive + self.false_positive + self.true_negative + self.false_negative
+
+    def get_precision(self):
+        predicted = self.true_positive + self.false_positive
+        return self.true_positive / predicted if predicted > 0 else 0.0
+
+    def get_recall(self):
+        actual = self.true_positive + self.false_negative
+        return self.true_positive / actual if actual > 0 else 0.0
+
+    def get_f1(self):
+        precision = self.get_precision()
+        recall = self.get_recall()
+        return 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+
+    def get_accuracy(self):
+        labelled = self.get_labelled_count()
+        return (self.true_positive + self.true_negative) / labelled if labelled > 0 else 0.0
+
+    def format(self):
+        ''' Get the matrix and its scores as text '''
+        output = ''
+        output += f'                 Labelled Accept  Labelled Reject\n'
+        output += f'Accepted         {self.true_positive:>15}  {self.false_positive:>15}\n'
+        output += f'Rejected         {self.false_negative:>15}  {self.true_negative:>15}\n'
+        output += f'Precision: {self.get_precision():.4f}\n'
+        output += f'Recall: {self.get_recall():.4f}\n'
+        output += f'F1: {self.get_f1():.4f}\n'
+        output += f'Accuracy: {self.get_accuracy():.4f}\n'
+        output += f'Unlabelled: {self.unlabelled}'
+        return output
+
+class BulkTester:
+    '''
+        Explains titles in chunks across a process pool
+
+        Results come back in the order of the titles, and only a few chunks per
+        worker are in flight so a large file or stdin is streamed, never fully read
+
+        Parameters:
+            suggestions (list<string>): The suggestion words
+            rejections (list<string>): The rejection words
+            workers (int): Number of processes, 1 explains everything in this process
+            chunk_size (int): Number of titles sent to a worker at a time
+            vectorized (boolean): Score whole chunks in this process with NumPy instead
+    '''
+    def __init__(self, suggestions, rejections, workers=None, chunk_size=Const.BULK_TEST_CHUNK_SIZE, vectorized=False):
+        self.suggestions = list(suggestions)
+        self.rejections = list(rejections)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.vectorized = vectorized
+        if vectorized:
+            self.workers = 1
+
+    def get_chunks(self, titles):
+        chunk = []
+        for item in titles:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, titles):
+        '''
+            Explain every title
+
+            Parameters:
+                titles (iterable<tuple>): (title, label) of each title
+
+            Returns:
+                results (generator<tuple>): (title, label, (ratio, count, total_words, error)) of each title
+        '''
+        if self.vectorized:
+            from projectbot.VectorClassifier import VectorizedClassifier
+            classifier = VectorizedClassifier(self.suggestions, self.rejections)
+            for chunk in self.get_chunks(titles):
+                for (title, label), stats in zip(chunk, classifier.explain_many([title for title, _ in chunk])):
+                    yield title, label, stats
+            return
+
+        if self.workers <= 1:
+            classifier = TitleClassifier(self.suggestions, self.rejections)
+            for title, label in titles:
+                yield title, label, classifier.explain(title)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                initargs=(self.suggestions, self.rejections)) as executor:
+            in_flight = deque()
+            for chunk in self.get_chunks(titles):
+                in_flight.append((chunk, executor.submit(explain_chunk, [title for title, _ in chunk])))
+                if len(in_flight) >= self.workers * 2:
+                    yield from self.get_chunk_results(*in_flight.popleft())
+            while in_flight:
+                yield from self.get_chunk_results(*in_flight.popleft())
+
+    def get_chunk_results(self, chunk, future):
+        for (title, label), stats in zip(chunk, future.result()):
+            yield title, label, stats
+
+class ResultWriter:
+    ''' Streams the stats of each title as CSV or JSONL '''
+    def __init__(self, writer, output_format='csv'):
+        if output_format not in ('csv', 'jsonl'):
+            raise ValueError(f'Unknown output format: {output_format}')
+        self.writer = writer
+        self.output_format = output_format
+        self.csv_writer = None
+        if output_format == 'csv':
+            self.csv_writer = csv.writer(writer)
+            self.csv_writer.writerow(OUTPUT_FIELDS)
+
+    def write(self, title, label, stats):
+        ratio, count, total_words, error = stats
+        accepted = error == ''
+        if self.csv_writer is not None:
+            self.csv_writer.writerow([title, '' if label is None else int(label), int(accepted), count, total_words, f'{ratio:.4f}', error])
+        else:
+            row = dict(zip(OUTPUT_FIELDS, [title, label, accepted, count, total_words, ratio, error]))
+            self.writer.write(json.dumps(row) + '\n')
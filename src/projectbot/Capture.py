@@ -0,0 +1,276 @@
+import os
+import time
+import gzip
+import json
+import threading
+from projectbot.FakeReddit import FakeSubmission
+from projectbot.Constants import Const
+from projectbot.Logger import log
+
+CAPTURE_PREFIX = 'capture-'
+CAPTURE_SUFFIX = '.jsonl.gz'
+
+def get_name(value):
+    ''' Get the name of a praw Redditor/Subreddit, which may be missing for deleted users '''
+    if value is None:
+        return None
+    return str(value)
+
+def create_event(kind, thing, received_at=None):
+    '''
+        Create the event recorded for a submission or comment seen on a stream
+
+        Returns:
+            event (dict): Everything needed to replay the item
+    '''
+    event = {
+        'type': kind,
+        'at': received_at if received_at is not None else time.time(),
+        'id': thing.id,
+        'author': get_name(thing.author),
+        'subreddit': get_name(thing.subreddit),
+        'created_utc': thing.created_utc,
+    }
+    if kind == 'submission':
+        event['title'] = thing.title
+    else:
+        event['body'] = thing.body
+        event['link_id'] = thing.link_id
+        event['parent_id'] = thing.parent_id
+    return event
+
+def create_decision(kind, thing, accepted, difficulty, received_at=None):
+    ''' Create the event recorded for the classify decision made on an item '''
+    return {
+        'type': 'decision',
+        'at': received_at if received_at is not None else time.time(),
+        'kind': kind,
+        'fullname': thing.fullname,
+        'accepted': bool(accepted),
+        'difficulty': difficulty,
+    }
+
+class CaptureWriter:
+    '''
+        Records every item the streams see to rotating, gzip compressed JSONL files
+
+        A new file is started after max_bytes of uncompressed events and only the
+        newest max_files files are kept
+
+        Parameters:
+            directory (string): Folder the capture files are written to
+            max_bytes (int): Uncompressed size of a file before rotating
+            max_files (int): Number of files kept, 0 keeps every file
+    '''
+    def __init__(self, directory, max_bytes=Const.CAPTURE_MAX_BYTES, max_files=Const.CAPTURE_MAX_FILES,
+                flush_every=Const.CAPTURE_FLUSH_EVENTS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.flush_every = flush_every
+
+        self.lock = threading.Lock()
+        self.file = None
+        self.path = None
+        self.written = 0
+        self.unflushed = 0
+        self.sequence = 0
+        self.stats = {
+            'events': 0,
+            'files': 0,
+        }
+
+    def open_next(self):
+        ''' Close the current file and start the next one '''
+        self.close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        # Never overwrite the file of an earlier writer started in the same second
+        self.sequence += 1
+        while os.path.exists(self.get_path(stamp)):
+            self.sequence += 1
+        self.path = self.get_path(stamp)
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self.written = 0
+        self.stats['files'] += 1
+        self.remove_old_files()
+
+    def get_path(self, stamp):
+        return os.path.join(self.directory, f'{CAPTURE_PREFIX}{stamp}-{self.sequence:04d}{CAPTURE_SUFFIX}')
+
+    def remove_old_files(self):
+        if self.max_files <= 0:
+            return
+        for path in get_capture_files(self.directory)[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print('[Error]: Failed to remove old capture file:', e)
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, event):
+        ''' Append one event to the current file '''
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        with self.lock:
+            if self.file is None or self.written >= self.max_bytes:
+                self.open_next()
+            self.file.write(line)
+            self.written += len(line)
+            self.stats['events'] += 1
+            self.unflushed += 1
+            if self.unflushed >= self.flush_every:
+                self.file.flush()
+                self.unflushed = 0
+
+    def record_stream(self, kind, iterable):
+        ''' Record every item of a stream while passing it along, a kind of None streams (kind, thing) '''
+        for item in iterable:
+            item_kind, thing = item if kind is None else (kind, item)
+            try:
+                self.write(create_event(item_kind, thing))
+            except Exception as e:
+                log.error('capture_failed', kind=item_kind, error=str(e))
+            yield item
+
+    def record_decision(self, kind, thing, accepted, difficulty):
+        self.write(create_decision(kind, thing, accepted, difficulty))
+
+    def close(self):
+        with self.lock:
+            self.close_file()
+
+def get_capture_files(directory):
+    ''' Get the capture files of a folder, oldest first '''
+    names = [name for name in os.listdir(directory) if name.startswith(CAPTURE_PREFIX) and name.endswith(CAPTURE_SUFFIX)]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+def read_events(path):
+    '''
+        Read the events of a capture file, or of every capture file in a folder
+
+        Both gzip compressed and plain JSONL files can be read. A file cut short by
+        a crash is read up to the last complete event.
+    '''
+    paths = get_capture_files(path) if os.path.isdir(path) else [path]
+    for file_path in paths:
+        opener = gzip.open if file_path.endswith('.gz') else open
+        try:
+            with opener(file_path, 'rt', encoding='utf-8') as reader:
+                for line in reader:
+                    line = line.strip()
+                    if line == '':
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        print('[Error]: Skipping a partial capture event in', file_path)
+        except EOFError:
+            print('[Error]: Capture file ends early:', file_path)
+
+def load_fake_reddit(reddit, events):
+    '''
+        Add the recorded submissions and comments to a FakeRedditInterface
+
+        Comments on posts not in the capture are attached to a placeholder post
+        which is not served by the submission stream
+
+        Returns:
+            offsets (dict<string, float>): Seconds from the first event to each item, by fullname
+    '''
+    submissions = {}
+    offsets = {}
+    first = None
+    for event in events:
+        kind = event.get('type')
+        if kind not in ('submission', 'comment'):
+            continue
+        if first is None:
+            first = event['at']
+
+        if kind == 'submission':
+            thing = reddit.add_submission(event['title'], event['author'], event['subreddit'],
+                                        id=event['id'], created_utc=event['created_utc'])
+            submissions[thing.fullname] = thing
+        else:
+            link_id = event['link_id']
+            submission = submissions.get(link_id)
+            if submission is None:
+                submission = FakeSubmission('', None, event['subreddit'], reddit=reddit, id=link_id.split('_', 1)[-1])
+                submissions[link_id] = submission
+            thing = reddit.add_comment(submission, event['body'], event['author'],
+                                    id=event['id'], created_utc=event['created_utc'])
+        offsets[thing.fullname] = event['at'] - first
+    return offsets
+
+def get_recorded_decisions(events):
+    ''' Get the last recorded (accepted, difficulty) decision of each item, by fullname '''
+    decisions = {}
+    for event in events:
+        if event.get('type') == 'decision':
+            decisions[event['fullname']] = (event['accepted'], event['difficulty'])
+    return decisions
+
+class ReplayRecorder:
+    '''
+        Collects the decisions made while replaying a capture to compare them with
+        the recorded ones
+
+        Parameters:
+            offsets (dict<string, float>): Seconds from the start of the capture to each item
+            recorded (dict<string, tuple>): Recorded (accepted, difficulty) of each item
+    '''
+    def __init__(self, offsets, recorded):
+        self.offsets = offsets
+        self.recorded = recorded
+        self.decisions = {}
+        self.lock = threading.Lock()
+
+    def pace(self, iterable, speed=0.0):
+        '''
+            Yield the items at their recorded times
+
+            Parameters:
+                speed (float): Multiple of real time, 0 replays as fast as possible
+        '''
+        if speed <= 0:
+            yield from iterable
+            return
+
+        started = time.monotonic()
+        for thing in iterable:
+            delay = started + self.offsets.get(thing.fullname, 0.0) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield thing
+
+    def record_decision(self, kind, thing, accepted, difficulty):
+        with self.lock:
+            self.decisions[thing.fullname] = (kind, bool(accepted), difficulty)
+
+    def get_diffs(self):
+        '''
+            Get the items whose replayed decision differs from the recorded one
+
+            Returns:
+                diffs (list<tuple>): (fullname, kind, recorded, replayed) of each differing item
+        '''
+        diffs = []
+        with self.lock:
+            for fullname, (kind, accepted, difficulty) in self.decisions.items():
+                recorded = self.recorded.get(fullname)
+                if recorded is None:
+                    continue
+                replayed = (accepted, difficulty if accepted else '')
+                expected = (recorded[0], recorded[1] if recorded[0] else '')
+                if replayed != expected:
+                    diffs.append((fullname, kind, expected, replayed))
+        diffs.sort()
+        return diffs
+
+    def get_compared_count(self):
+        with self.lock:
+            return sum(1 for fullname in self.decisions if fullname in self.recorded)
@@ -0,0 +1,129 @@
+from projectbot.Constants import Const
+
+# Characters stripped from (or replaced within) a title before it is split into words
+TITLE_TRANSLATION = str.maketrans({
+    '?': None,
+    '!': None,
+    '.': None,
+    ',': None,
+    '[': None,
+    ']': None,
+    ':': None,
+    '/': ' ',
+})
+
+class TitleClassifier:
+    '''
+        Decides if a post title is asking for a project idea
+
+        The classifier is built once from the suggestion and rejection words and can
+        then be reused for every title the bot sees
+    '''
+    def __init__(self, suggestion_words, rejection_words, min_words=Const.MIN_NUM_WORDS_IN_TITLE, acceptable_ratio=Const.ACCEPTABLE_RATIO):
+        self.suggestion_words = frozenset(word.lower() for word in suggestion_words)
+        self.rejection_words = frozenset(word.lower() for word in rejection_words)
+        self.min_words = min_words
+        self.acceptable_ratio = acceptable_ratio
+
+    def normalize(self, title):
+        ''' Put the title to lowercase and remove extras '''
+        return title.lower().translate(TITLE_TRANSLATION)
+
+    def get_words(self, title):
+        ''' Get the unique words of a title, in the order they appear '''
+        return list(dict.fromkeys(self.normalize(title).split()))
+
+    def is_request(self, title):
+        '''
+            Fast check if the title is asking for a project
+
+            Parameters:
+                title (string): The title of the reddit post/phrase
+
+            Returns:
+                accepted (boolean): The title passes all criteria
+        '''
+
+        words = set(self.normalize(title).split())
+        total_words = len(words)
+        if total_words < self.min_words:
+            return False
+
+        if not self.rejection_words.isdisjoint(words):
+            return False
+
+        count = len(self.suggestion_words.intersection(words))
+        return count / total_words >= self.acceptable_ratio
+
+    def classify_many(self, titles):
+        '''
+            Check a batch of titles
+
+            Parameters:
+                titles (iterable<string>): The titles to check
+
+            Returns:
+                decisions (list<boolean>): If each title is asking for a project
+        '''
+
+        # Bind locals once for the whole batch
+        translation = TITLE_TRANSLATION
+        suggestions = self.suggestion_words
+        rejections = self.rejection_words
+        min_words = self.min_words
+        acceptable_ratio = self.acceptable_ratio
+
+        decisions = []
+        append = decisions.append
+        for title in titles:
+            words = set(title.lower().translate(translation).split())
+            total_words = len(words)
+            if total_words < min_words or not rejections.isdisjoint(words):
+                append(False)
+                continue
+            append(len(suggestions.intersection(words)) / total_words >= acceptable_ratio)
+        return decisions
+
+    def explain(self, title):
+        '''
+            Process the title and report how it was judged
+
+            Parameters:
+                title (string): The title of the reddit post/phrase
+
+            Returns:
+                ratio (string): 0.0 - 1.0 Representing the ratio of cout to total_words
+                count (int): The number of words in the suggestion_words list
+                total_words (int): The number of words in the title
+                error (string): Reason for rejection
+        '''
+
+        errors = []
+
+        normalized = self.normalize(title)
+        words = list(dict.fromkeys(normalized.split()))
+
+        count = 0
+        total_words = len(words)
+
+        # Confirm Word length is met
+        if total_words < self.min_words:
+            errors.append(f'Minimum number of words {self.min_words} not met with {total_words} words')
+
+        # Process each word
+        for word in words:
+            if word in self.rejection_words:
+                errors.append(f'Rejecting ({word}): {normalized}')
+            if word in self.suggestion_words:
+                count += 1
+
+        # Calculate ratio
+        ratio = float(count / total_words) if total_words > 0 else 0.0
+        if ratio < self.acceptable_ratio:
+            errors.append(f'Minimum ratio is not met')
+
+        # Append label to error message to get total number errors
+        if len(errors) > 0:
+            errors.insert(0, f'{len(errors)} Errors')
+
+        return ratio, count, total_words, '\n'.join(errors)
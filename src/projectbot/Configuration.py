@@ -10,14 +10,20 @@ class Configuration:
         self.SIMULATE = False
         self.SIMULATE_WAIT_TO_CONFIRM = False
 
-        self.process_config_file()
-
-        # Read the configuration INI file
+        # Read the configuration INI file, only once
         self.init_config_with_ini()
 
     def __getitem__(self, item):
         return self.config[item]
 
+    def get(self, item, default=None):
+        ''' Get an optional config value, falling back to the default '''
+        return self.config.get(item, default)
+
+    def get_int(self, item, default):
+        ''' Get an optional integer config value, falling back to the default '''
+        return self.config.getint(item, fallback=default)
+
     def init_config_with_ini(self):
         exists = check_file_exists(Asset.file_praw_ini, "The config file praw.ini is missing")
         if not exists:
@@ -26,13 +32,9 @@ class Configuration:
         parser = configparser.ConfigParser()
         parser.read(Asset.file_praw_ini)
         self.config = parser['DEFAULT']
-    
-    def process_config_file(self):
-        ''' Initizalize the config file in the same directory'''
 
-        # Dynamically create user agent and modify to current INI file
-        app_user_agent = create_user_agent()
-        add_user_agent_to_ini(app_user_agent)
+        # Dynamically create the user agent, only kept in memory and handed to praw
+        self.config['user_agent'] = create_user_agent(self.config)
 
 def get_app_level():
     level = os.environ.get('app_level')
@@ -40,13 +42,3 @@ def get_app_level():
         level = Const.DEFAULT_APP_LEVEL
     return level
 
-
-def add_user_agent_to_ini(new_user_agent):
-    ''' Put new user agent text into the ini file '''
-
-    temp_config = configparser.ConfigParser()
-    temp_config.read(Asset.file_praw_ini)
-    temp_config['DEFAULT']['user_agent'] = new_user_agent
-
-    with open(Asset.file_praw_ini, 'w') as config_writer:
-        temp_config.write(config_writer)
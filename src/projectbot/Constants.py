@@ -10,6 +10,17 @@ class Asset:
     file_suggestion_words = 'assets/suggestion_words.txt'
     coll_suggestion_mongo = 'suggestion-words'
 
+    file_response_index = 'responded.db'
+    file_corpus_snapshot = 'assets/corpus.snapshot'
+    file_idea_weights = 'assets/idea_weights.csv'
+
+    file_activity_db = 'activity.db'
+    coll_activity_mongo = 'activity'
+
+    dir_captures = 'captures'
+    dir_backfill = 'backfill'
+    file_backfill_checkpoint = 'backfill/checkpoint.json'
+
 class Error:
     GENERAL = 1
     FILE_MISSING = 2
@@ -22,8 +33,87 @@ class Const:
     MIN_NUM_WORDS_IN_TITLE = 5
     ACCEPTABLE_RATIO = 0.25
     RATE_LIMIT_SLEEP_TIME = 600    # 10 minutes
+    RATE_LIMIT_MARGIN = 5          # Seconds added to the wait reddit asks for
+
+    # Reddit allows 600 requests per 10 minutes
+    REPLY_BUCKET_CAPACITY = 10
+    REPLY_BUCKET_RATE = 1.0        # Tokens per second
+    REPLY_MAX_RETRIES = 3
+    REPLY_RETRY_DELAY = 30         # Seconds, doubled on every retry
 
     DEFAULT_APP_LEVEL = 'staging'
 
+    MONGO_MAX_POOL_SIZE = 10
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+    MONGO_READ_PREFERENCE = 'secondaryPreferred'
+    MONGO_BATCH_SIZE = 1000
+    MONGO_SYNC_BATCH_SIZE = 1000    # Writes sent in one bulk_write by upload-mongo.py
+    MONGO_EXPORT_BATCH_SIZE = 5000  # Documents per cursor batch in download-mongo.py
+    MONGO_CHANGE_STREAM_AWAIT_MS = 1000
+    MONGO_BREAKER_FAILURES = 1      # Failures in a row before mongo is skipped
+    MONGO_BREAKER_RESET_TIME = 60   # Seconds mongo is skipped before it is tried again
+
+    CORPUS_REFRESH_INTERVAL = 300   # 5 minutes
+    CORPUS_LOAD_DEADLINE = 8.0      # Seconds all corpus sources get together before the local files are used
+
+    SAMPLER_NO_REPEAT_WINDOW = 10  # Ideas remembered per thread/user
+    SAMPLER_MAX_KEYS = 10000       # Threads/users remembered
+    SAMPLER_MAX_ATTEMPTS = 8       # Draws before a repeat is accepted
+
+    RESPONSE_CACHE_SIZE = 1024     # Rendered idea responses kept
+
+    RESPONSE_INDEX_LRU_SIZE = 10000
+    RESPONSE_INDEX_BLOOM_CAPACITY = 100000
+    RESPONSE_INDEX_BLOOM_ERROR_RATE = 0.01
+    RESPONSE_INDEX_SEED_BATCH = 100
+    RESPONSE_INDEX_BUSY_TIMEOUT = 10.0  # Seconds to wait on another process writing the index
+    RESPONSE_INDEX_CLAIM_MAX_AGE = 6 * 60 * 60  # Seconds a claim is kept, the items the streams and backfill reply to are newer
+
+    PIPELINE_QUEUE_SIZE = 100
+    PIPELINE_CLASSIFY_WORKERS = 1
+    PIPELINE_DEDUP_WORKERS = 4
+    PIPELINE_REPLY_WORKERS = 2
+
+    POLL_REQUESTS_PER_SECOND = 0.5 # Leaves the rest of reddit's 1 request a second for replies
+    POLL_BUDGET_BURST = 10         # Seconds of the request budget which can be used at once
+    POLL_MIN_INTERVAL = 5          # Seconds
+    POLL_MAX_INTERVAL = 600        # Seconds
+    POLL_TARGET_ITEMS = 20         # New items aimed for in each poll of a subreddit
+    POLL_RATE_ALPHA = 0.3          # Weight of the newest poll in the arrival rate
+    POLL_BACKOFF = 1.5             # Growth of the interval of a subreddit with no new items
+    POLL_LIMIT = 100               # Items per listing request, the most reddit returns
+    POLL_SEEN_SIZE = 500           # Items remembered per listing to skip repeats
+
+    SHARD_VIRTUAL_NODES = 64       # Points on the hash ring for each worker
+    SHARD_CHECK_INTERVAL = 5       # Seconds between checks of the worker processes
+    SHARD_RESTART_DELAY = 30       # Seconds before a dead worker is started again
+    SHARD_DRAIN_TIMEOUT = 20       # Seconds a stopping worker gets to send its queued replies
+    SHARD_STOP_TIMEOUT = 30        # Seconds before a stopping worker is killed
+
+    TRIGGER_PHRASES = ['!projectbot']
+
+    CAPTURE_MAX_BYTES = 64 * 1024 * 1024   # Uncompressed bytes before a new file is started
+    CAPTURE_MAX_FILES = 20
+    CAPTURE_FLUSH_EVENTS = 100
+    METRICS_HOST = '127.0.0.1'
+
+    LOG_LEVEL = 'info'
+    LOG_SAMPLE_RATE = 0.01         # Share of rejected items logged
+    LOG_FLUSH_INTERVAL = 1.0       # Seconds between writes of the buffered records
+    LOG_MAX_BUFFER = 10000         # Records held before new ones are dropped
+
+    ACTIVITY_FLUSH_INTERVAL = 5.0  # Seconds between writes of the buffered decisions and replies
+    ACTIVITY_BATCH_SIZE = 500      # Records inserted together
+    ACTIVITY_MAX_BUFFER = 50000    # Records held before new ones are dropped
+
+    VECTOR_BATCH_SIZE = 20000      # Titles scored together by the vectorized classifier
+    BULK_TEST_CHUNK_SIZE = 2000            # Titles sent to a test worker at a time
+
+    REPLAY_MAX_DIFFS_SHOWN = 20
+    BACKFILL_PAGE_SIZE = 100              # Most items reddit returns for one listing request
+    BACKFILL_MAX_AGE = 7 * 24 * 60 * 60   # Seconds back the backfill goes by default, a week
+    BACKFILL_REPLY_MAX_AGE = 6 * 60 * 60  # Only items newer than this are replied to, 6 hours
+    REPLAY_REPLY_BUDGET = 1e9             # Replies are not rate limited in a replay
+
     SUBREDDITS_TO_SCAN_PROD = ['learnpython']
     SUBREDDITS_TO_SCAN_STAG = ['SRZ2_TestEnvironment']
@@ -0,0 +1,182 @@
+import time
+import threading
+from projectbot.Classifier import TitleClassifier
+from projectbot.Sampler import IdeaSampler
+from projectbot.IdeaStore import IdeaStore
+from projectbot.Constants import Const
+
+class Corpus:
+    '''
+        The ideas and words used by the bot, built once and never modified
+
+        A reload builds a whole new corpus and swaps it in, so a reader holding a
+        corpus always sees one complete version of it
+    '''
+    def __init__(self, snapshot, version=1, source='unknown', weights=None):
+        self.ideas = IdeaStore(snapshot.ideas, snapshot.difficulty_index)
+        self.sampler = IdeaSampler(self.ideas, weights)
+        self.suggestions = tuple(snapshot.suggestions)
+        self.rejections = tuple(snapshot.rejections)
+        self.classifier = TitleClassifier(self.suggestions, self.rejections)
+        self.content_hash = snapshot.content_hash
+        self.snapshot = snapshot
+
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+
+    def get_hash_text(self):
+        return self.content_hash.hex() if self.content_hash is not None else ''
+
+class CorpusRefresher:
+    '''
+        Background thread to pick up corpus changes without a restart
+
+        The new corpus is loaded and built on this thread, then handed to swap()
+        in one assignment. It waits on a change stream when one is available
+        and otherwise polls every interval seconds.
+
+        Parameters:
+            load (function): Returns a CorpusSnapshot of the latest corpus
+            get_current (function): Returns the corpus in use
+            swap (function): Called with the new corpus to put it in use
+            wait_for_change (function): Optionally blocks up to a timeout until the corpus changes
+            weights (dict<string, float>): Optional weight of each idea by name
+    '''
+    def __init__(self, load, get_current, swap, interval=Const.CORPUS_REFRESH_INTERVAL, wait_for_change=None, source='mongo', weights=None):
+        self.load = load
+        self.get_current = get_current
+        self.swap = swap
+        self.interval = interval
+        self.wait_for_change = wait_for_change
+        self.source = source
+        self.weights = weights
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {
+            'checks': 0,
+            'reloads': 0,
+            'failures': 0,
+            'last_reload_seconds': 0.0,
+            'last_checked_at': 0.0,
+        }
+
+    def start(self, check_now=False):
+        ''' Start checking for changes, optionally checking right away '''
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(check_now,), name='Corpus Refresher', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def wait(self):
+        ''' Wait for a change or the next poll, returns False when stopping '''
+        if self.wait_for_change is not None:
+            try:
+                self.wait_for_change(self.interval)
+                return not self.stop_event.is_set()
+            except Exception as e:
+                # Change streams need a replica set, poll instead
+                print('[Error]: Corpus change stream unavailable, polling instead:', e)
+                self.wait_for_change = None
+        return not self.stop_event.wait(self.interval)
+
+    def run(self, check_now):
+        if check_now:
+            self.refresh_now()
+        while self.wait():
+            self.refresh_now()
+
+    def refresh_now(self):
+        '''
+            Load the corpus and swap it in if its content changed
+
+            Returns:
+                changed (boolean): A new corpus was swapped in
+        '''
+        started = time.perf_counter()
+        self.stats['checks'] += 1
+        self.stats['last_checked_at'] = time.time()
+        try:
+            snapshot = self.load()
+            current = self.get_current()
+            if current is not None and snapshot.content_hash == current.content_hash:
+                return False
+
+            version = current.version + 1 if current is not None else 1
+            corpus = Corpus(snapshot, version, self.source, self.weights)
+            self.swap(corpus)
+        except Exception as e:
+            self.stats['failures'] += 1
+            print('[Error]: Failed to refresh corpus:', e)
+            return False
+
+        elapsed = time.perf_counter() - started
+        self.stats['reloads'] += 1
+        self.stats['last_reload_seconds'] = elapsed
+        print(f'Reloaded corpus version {corpus.version} ({corpus.get_hash_text()[:12]}) in {elapsed * 1000:.1f} ms')
+        return True
+
+class SourceResult:
+    ''' How one corpus source was loaded '''
+    __slots__ = ('name', 'value', 'origin', 'outcome', 'seconds')
+
+    def __init__(self, name, value, origin, outcome, seconds):
+        self.name = name
+        self.value = value
+        self.origin = origin
+        self.outcome = outcome
+        self.seconds = seconds
+
+def time_call(function):
+    started = time.perf_counter()
+    value = function()
+    return value, time.perf_counter() - started
+
+def load_sources(sources, deadline=Const.CORPUS_LOAD_DEADLINE):
+    '''
+        Load every source at the same time, falling back to local copies
+
+        Every primary loader runs on its own thread and together they get until the
+        deadline. A source whose primary loader failed or is still running then is
+        read with its fallback, a primary still running is left to finish unused.
+
+        Parameters:
+            sources (dict<string, tuple>): The primary and fallback loader of each source by name
+            deadline (float): Seconds the primary loaders get together
+
+        Returns:
+            results (dict<string, SourceResult>): The value, origin, outcome and load time of each source
+    '''
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix='corpus')
+    try:
+        futures = {name: executor.submit(time_call, primary) for name, (primary, fallback) in sources.items()}
+        wait(futures.values(), timeout=deadline)
+    finally:
+        # Never wait on a primary past the deadline
+        executor.shutdown(wait=False)
+
+    results = {}
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            value, seconds = future.result()
+            results[name] = SourceResult(name, value, 'primary', 'ok', seconds)
+            continue
+
+        if not future.done():
+            outcome = f'timed out after {deadline:.1f}s'
+        else:
+            outcome = f'failed: {future.exception()}'
+        value = sources[name][1]()
+        results[name] = SourceResult(name, value, 'fallback', outcome, time.perf_counter() - started)
+    return results
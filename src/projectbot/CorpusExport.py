@@ -0,0 +1,92 @@
+import os
+import csv
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from projectbot.Snapshot import create_snapshot, write_snapshot
+from projectbot.Constants import Const, Asset
+
+IDEAS_HEADER = ['Idea', 'difficulty', 'description']
+IDEAS_PROJECTION = {'_id': 0, 'name': 1, 'difficulty': 1, 'description': 1}
+WORDS_PROJECTION = {'_id': 0, 'term': 1}
+
+# Published in this order, the snapshot the bot loads first goes last
+EXPORTED_ASSETS = [Asset.file_ideas_csv, Asset.file_suggestion_words, Asset.file_rejection_words, Asset.file_corpus_snapshot]
+
+def export_ideas(docs, path):
+    ''' Stream the idea docs to the ideas CSV, returns the rows for the snapshot '''
+    rows = []
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
+        writer.writerow(IDEAS_HEADER)
+        for doc in docs:
+            row = [doc['name'], doc['difficulty'], doc['description']]
+            writer.writerow(row)
+            rows.append(row)
+    return rows
+
+def export_words(docs, path):
+    ''' Stream the word docs to a word file, one per line, returns the words for the snapshot '''
+    words = []
+    with open(path, 'w') as file:
+        for doc in docs:
+            file.write(doc['term'] + '\n')
+            words.append(doc['term'])
+    return words
+
+def publish_files(staging, destination, names):
+    '''
+        Move the staged files into the destination folder, in the given order
+
+        Each file is replaced with os.replace, so a reader opens either the whole
+        old file or the whole new one. The folder itself is never replaced and
+        keeps its mode, and each new file takes the mode of the file it replaces
+    '''
+    os.makedirs(destination, exist_ok=True)
+    for name in names:
+        source = os.path.join(staging, name)
+        target = os.path.join(destination, name)
+        if os.path.exists(target):
+            shutil.copymode(target, source)
+        os.replace(source, target)
+
+def export_corpus(get_docs, root='.', batch_size=Const.MONGO_EXPORT_BATCH_SIZE):
+    '''
+        Export the corpus collections to the asset files the bot reads, with its snapshot
+
+        The three collections are streamed at the same time into a staging folder
+        next to the assets folder. Only once every file and the snapshot are
+        written are they moved into the assets folder one file at a time, the
+        snapshot last, so a failed export leaves the old files. Every file is
+        replaced atomically, but not the set: a reader between two moves sees new
+        word lists with the old snapshot, which the bot loads first. Other files
+        in the assets folder, like the idea weights, are not touched.
+
+        Parameters:
+            get_docs (function): Called with a collection name, projection and batch size, returns a cursor
+            root (string): Folder the Asset paths are relative to
+            batch_size (int): Documents per cursor batch
+
+        Returns:
+            snapshot (CorpusSnapshot): The snapshot written with the files
+    '''
+    destination = os.path.join(root, os.path.dirname(Asset.file_ideas_csv))
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.assets-', dir=os.path.dirname(os.path.abspath(destination)))
+
+    def get_path(asset):
+        return os.path.join(staging, os.path.basename(asset))
+
+    try:
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix='export') as executor:
+            ideas = executor.submit(lambda: export_ideas(get_docs(Asset.coll_ideas_mongo, IDEAS_PROJECTION, batch_size), get_path(Asset.file_ideas_csv)))
+            suggestions = executor.submit(lambda: export_words(get_docs(Asset.coll_suggestion_mongo, WORDS_PROJECTION, batch_size), get_path(Asset.file_suggestion_words)))
+            rejections = executor.submit(lambda: export_words(get_docs(Asset.coll_rejection_mongo, WORDS_PROJECTION, batch_size), get_path(Asset.file_rejection_words)))
+            snapshot = create_snapshot(ideas.result(), suggestions.result(), rejections.result())
+        write_snapshot(get_path(Asset.file_corpus_snapshot), snapshot)
+
+        names = [os.path.basename(asset) for asset in EXPORTED_ASSETS]
+        publish_files(staging, destination, names)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return snapshot
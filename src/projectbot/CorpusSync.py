@@ -0,0 +1,148 @@
+import json
+import hashlib
+from projectbot.Constants import Const
+
+# The field each corpus collection is keyed by, with a unique index on it
+IDEAS_KEY = 'name'
+WORDS_KEY = 'term'
+
+HASH_FIELD = 'hash'
+
+def hash_record(record):
+    ''' Get the hash of a record's fields, stored with it so changes are found without reading the fields '''
+    text = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def create_idea_records(ideas):
+    ''' Get the records of [name, difficulty, description] rows '''
+    return [{'name': idea[0], 'difficulty': idea[1], 'description': idea[2]} for idea in ideas]
+
+def create_word_records(words):
+    return [{'term': word} for word in words]
+
+class SyncPlan:
+    '''
+        The changes which make a collection match the local records
+
+        Parameters:
+            inserts (list<dict>): Records missing on the server
+            updates (list<tuple>): (_id, record) of records which changed
+            deletes (list): _id of documents no longer in the local records
+            duplicates (list): _id of extra documents with the same key, which would break the unique index
+            unchanged (int): Number of records already up to date
+    '''
+    def __init__(self, inserts, updates, deletes, duplicates, unchanged):
+        self.inserts = inserts
+        self.updates = updates
+        self.deletes = deletes
+        self.duplicates = duplicates
+        self.unchanged = unchanged
+
+    def is_empty(self):
+        return not (self.inserts or self.updates or self.deletes or self.duplicates)
+
+    def format(self):
+        return (f'{len(self.inserts)} inserts, {len(self.updates)} updates, {len(self.deletes)} deletes, '
+                f'{len(self.duplicates)} duplicates, {self.unchanged} unchanged')
+
+def get_local_records(records, key):
+    ''' Get the records by key, the last one wins when a key is repeated '''
+    by_key = {}
+    for record in records:
+        if record[key] in by_key:
+            print(f'[Error]: Repeated {key} in the local records, using the last one:', record[key])
+        by_key[record[key]] = record
+    return by_key
+
+def plan_sync(records, server_docs, key):
+    '''
+        Diff the local records against the documents on the server
+
+        Parameters:
+            records (list<dict>): The local records
+            server_docs (iterable<dict>): _id, key and hash of every document on the server
+            key (string): The field identifying a record
+
+        Returns:
+            plan (SyncPlan): The changes to apply
+    '''
+    local = get_local_records(records, key)
+    hashes = {value: hash_record(record) for value, record in local.items()}
+
+    updates = []
+    deletes = []
+    duplicates = []
+    unchanged = 0
+    seen = set()
+    for doc in server_docs:
+        value = doc.get(key)
+        if value in seen:
+            duplicates.append(doc['_id'])
+            continue
+        seen.add(value)
+
+        if value not in local:
+            deletes.append(doc['_id'])
+        elif doc.get(HASH_FIELD) != hashes[value]:
+            # Also documents uploaded before records were hashed
+            updates.append((doc['_id'], local[value]))
+        else:
+            unchanged += 1
+
+    inserts = [record for value, record in local.items() if value not in seen]
+    return SyncPlan(inserts, updates, deletes, duplicates, unchanged)
+
+def get_batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+def apply_sync(collection, plan, batch_size=Const.MONGO_SYNC_BATCH_SIZE, allow_deletes=True):
+    '''
+        Apply a plan with unordered, batched bulk writes
+
+        Returns:
+            stats (dict): Number of documents inserted, updated and deleted
+    '''
+    from pymongo import InsertOne, ReplaceOne, DeleteMany
+
+    operations = []
+    operations.extend(InsertOne(dict(record, **{HASH_FIELD: hash_record(record)})) for record in plan.inserts)
+    operations.extend(ReplaceOne({'_id': doc_id}, dict(record, **{HASH_FIELD: hash_record(record)})) for doc_id, record in plan.updates)
+    delete_ids = list(plan.duplicates) + (list(plan.deletes) if allow_deletes else [])
+    operations.extend(DeleteMany({'_id': {'$in': ids}}) for ids in get_batches(delete_ids, batch_size))
+
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0}
+    for batch in get_batches(operations, batch_size):
+        result = collection.bulk_write(batch, ordered=False)
+        stats['inserted'] += result.inserted_count
+        stats['updated'] += result.modified_count
+        stats['deleted'] += result.deleted_count
+    return stats
+
+def sync_collection(collection, records, key, batch_size=Const.MONGO_SYNC_BATCH_SIZE, allow_deletes=True, dry_run=False):
+    '''
+        Make a collection match the local records, writing only what changed
+
+        The server is read once, only the _id, key and hash of each document.
+        Extra documents with a repeated key are always removed so the unique
+        index on the key can be created.
+
+        Parameters:
+            collection (Collection): The mongo collection
+            records (list<dict>): The local records
+            key (string): The field identifying a record
+            allow_deletes (boolean): Remove documents missing from the local records
+            dry_run (boolean): Only plan the changes
+
+        Returns:
+            plan (SyncPlan): The changes found
+            stats (dict): The changes made, None on a dry run
+    '''
+    server_docs = collection.find({}, {'_id': 1, key: 1, HASH_FIELD: 1}, batch_size=Const.MONGO_BATCH_SIZE)
+    plan = plan_sync(records, server_docs, key)
+    if dry_run:
+        return plan, None
+
+    stats = apply_sync(collection, plan, batch_size, allow_deletes)
+    collection.create_index(key, unique=True)
+    return plan, stats
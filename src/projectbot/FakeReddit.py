@@ -0,0 +1,160 @@
+import time
+import itertools
+
+# Shared id counter so every fake thing gets a unique reddit-like id
+_ids = itertools.count(1)
+
+def next_id():
+    return format(next(_ids), 'x')
+
+class FakeComment:
+    ''' Stand-in for a praw Comment '''
+    def __init__(self, body, author, submission=None, parent=None, reddit=None, id=None, created_utc=None):
+        self.id = id if id is not None else next_id()
+        self.fullname = 't1_' + self.id
+        self.body = body
+        self.author = author
+        self.submission = submission
+        self.link_id = submission.fullname if submission is not None else None
+        self.parent_id = parent.fullname if parent is not None else (submission.fullname if submission is not None else None)
+        self.subreddit = submission.subreddit if submission is not None else None
+        self.created_utc = created_utc if created_utc is not None else time.time()
+        self.permalink = f'/r/{self.subreddit}/comments/{self.id}/'
+        self.replies = []
+        self.reddit = reddit
+
+    def refresh(self):
+        if self.reddit is not None:
+            self.reddit.wait(self.reddit.refresh_latency)
+        return self
+
+    def reply(self, body):
+        return self.reddit.create_reply(self, body)
+
+class FakeSubmission:
+    ''' Stand-in for a praw Submission '''
+    def __init__(self, title, author, subreddit='SRZ2_TestEnvironment', reddit=None, id=None, created_utc=None):
+        self.id = id if id is not None else next_id()
+        self.fullname = 't3_' + self.id
+        self.title = title
+        self.author = author
+        self.subreddit = subreddit
+        self.created_utc = created_utc if created_utc is not None else time.time()
+        self.permalink = f'/r/{subreddit}/comments/{self.id}/'
+        self.comments = []
+        self.reddit = reddit
+
+    def reply(self, body):
+        return self.reddit.create_reply(self, body)
+
+class FakeStream:
+    ''' Stand-in for a praw SubredditStream, yields the things queued on the fake reddit '''
+    def __init__(self, reddit, names):
+        self.reddit = reddit
+        self.names = names
+
+    def submissions(self):
+        for submission in list(self.reddit.submissions):
+            if self.names is None or submission.subreddit.lower() in self.names:
+                self.reddit.wait(self.reddit.fetch_latency)
+                yield submission
+
+    def comments(self):
+        for comment in list(self.reddit.comments):
+            if self.names is None or str(comment.subreddit).lower() in self.names:
+                self.reddit.wait(self.reddit.fetch_latency)
+                yield comment
+
+def is_in(names, thing):
+    return names is None or str(thing.subreddit).lower() in names
+
+def get_listing(things, names, limit, params=None):
+    ''' Newest first like a reddit listing, a page starts after the fullname in params['after'] '''
+    listing = [thing for thing in things if is_in(names, thing)]
+    listing.sort(key=lambda thing: thing.created_utc, reverse=True)
+    after = (params or {}).get('after')
+    if after is not None:
+        fullnames = [thing.fullname for thing in listing]
+        listing = listing[fullnames.index(after) + 1:] if after in fullnames else []
+    return listing[:limit]
+
+class FakeSubreddit:
+    ''' Stand-in for a praw Subreddit, a query of 'all' or a '+' joined list of names '''
+    def __init__(self, reddit, query):
+        self.display_name = query
+        names = [name.lower() for name in query.split('+')]
+        self.names = None if 'all' in names else set(names)
+        self.stream = FakeStream(reddit, self.names)
+        self.reddit = reddit
+
+    def new(self, limit=100, params=None):
+        self.reddit.wait(self.reddit.fetch_latency)
+        self.reddit.requests += 1
+        return iter(get_listing(self.reddit.submissions, self.names, limit, params))
+
+    def comments(self, limit=100, params=None):
+        self.reddit.wait(self.reddit.fetch_latency)
+        self.reddit.requests += 1
+        return iter(get_listing(self.reddit.comments, self.names, limit, params))
+
+class FakeRedditInterface:
+    '''
+        Offline stand-in for RedditInterface
+
+        Submissions and comments added to it are served through the same methods the bot
+        uses on reddit. Optional latencies simulate the network so stages can be measured
+    '''
+    def __init__(self, username='BeginnerProjectBot', fetch_latency=0.0, refresh_latency=0.0, reply_latency=0.0):
+        self.username = username
+        self.fetch_latency = fetch_latency
+        self.refresh_latency = refresh_latency
+        self.reply_latency = reply_latency
+
+        self.submissions = []
+        self.comments = []
+        self.sent = []
+        self.requests = 0
+
+    def wait(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def add_submission(self, title, author='someone', subreddit='SRZ2_TestEnvironment', **kwargs):
+        submission = FakeSubmission(title, author, subreddit, reddit=self, **kwargs)
+        self.submissions.append(submission)
+        return submission
+
+    def add_comment(self, submission, body, author='someone', parent=None, **kwargs):
+        comment = FakeComment(body, author, submission, parent, reddit=self, **kwargs)
+        if parent is not None:
+            parent.replies.append(comment)
+        else:
+            submission.comments.append(comment)
+        self.comments.append(comment)
+        return comment
+
+    def create_reply(self, parent, body):
+        self.wait(self.reply_latency)
+        if isinstance(parent, FakeSubmission):
+            reply = FakeComment(body, self.username, parent, reddit=self)
+            parent.comments.append(reply)
+        else:
+            reply = FakeComment(body, self.username, parent.submission, parent, reddit=self)
+            parent.replies.append(reply)
+        self.comments.append(reply)
+        self.sent.append((parent, body))
+        return reply
+
+    def get_own_comments(self, limit=None):
+        replies = [comment for comment in self.comments if comment.author == self.username]
+        replies.sort(key=lambda comment: comment.created_utc, reverse=True)
+        return replies[:limit]
+
+    def send_comment_response(self, comment, response):
+        comment.reply(response)
+
+    def send_submission_response(self, submission, response):
+        submission.reply(response)
+
+    def query_subreddit(self, query):
+        return FakeSubreddit(self, query)
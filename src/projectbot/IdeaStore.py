@@ -0,0 +1,92 @@
+import sys
+from array import array
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+class Idea:
+    ''' A project idea '''
+    __slots__ = ('name', 'difficulty', 'description')
+
+    def __init__(self, name, difficulty, description):
+        self.name = name
+        self.difficulty = difficulty
+        self.description = description
+
+    def __eq__(self, other):
+        if not isinstance(other, Idea):
+            return NotImplemented
+        return (self.name, self.difficulty, self.description) == (other.name, other.difficulty, other.description)
+
+    def __hash__(self):
+        return hash((self.name, self.difficulty, self.description))
+
+    def __repr__(self):
+        return f'Idea({self.name!r}, {self.difficulty!r})'
+
+    def as_row(self):
+        ''' Get the idea as a [name, difficulty, description] row '''
+        return [self.name, self.difficulty, self.description]
+
+class IdeaBucket:
+    ''' Read-only sequence of the ideas of one difficulty, positions into the shared store '''
+    __slots__ = ('store', 'positions')
+
+    def __init__(self, store, positions):
+        self.store = store
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        return self.store[self.positions[index]]
+
+    def __iter__(self):
+        store = self.store
+        for position in self.positions:
+            yield store[position]
+
+class IdeaStore:
+    '''
+        Compact storage of all ideas
+
+        Every idea is stored once as an Idea record. Each difficulty is an array of
+        unsigned ints pointing into the store, and difficulty names are interned so
+        every idea shares the same few strings.
+
+        Reads like a mapping of difficulty to ideas: store['easy'][0]
+    '''
+    def __init__(self, ideas, difficulty_index=None):
+        records = []
+        for name, difficulty, description in ideas:
+            records.append(Idea(name, sys.intern(difficulty), description))
+        self.records = tuple(records)
+
+        if difficulty_index is None:
+            difficulty_index = {}
+            for position, idea in enumerate(self.records):
+                difficulty_index.setdefault(idea.difficulty, []).append(position)
+
+        self.buckets = {'all': IdeaBucket(self.records, range(len(self.records)))}
+        for difficulty in DIFFICULTIES:
+            self.buckets[difficulty] = IdeaBucket(self.records, array('I'))
+        for difficulty, positions in difficulty_index.items():
+            self.buckets[sys.intern(difficulty)] = IdeaBucket(self.records, array('I', positions))
+
+    def __getitem__(self, difficulty):
+        return self.buckets[difficulty]
+
+    def __contains__(self, difficulty):
+        return difficulty in self.buckets
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, difficulty, default=None):
+        return self.buckets.get(difficulty, default)
+
+    def keys(self):
+        return self.buckets.keys()
+
+    def items(self):
+        return self.buckets.items()
@@ -1,31 +1,49 @@
 import os
 import sys
 import csv
-import praw
-import random
 from projectbot.Utilities import is_recongized_difficulty
 from projectbot.Configuration import Configuration, Asset, get_app_level, check_file_exists
-from projectbot.RedditActions import RedditInterface
+from projectbot.RedditActions import RedditInterface, get_retry_exceptions
 from projectbot.Database import Database
+from projectbot.Classifier import TitleClassifier
+from projectbot.Corpus import Corpus, CorpusRefresher, load_sources
+from projectbot.Sampler import RecentIdeas
+from projectbot.TriggerScanner import TriggerScanner
+from projectbot.ReplyScheduler import ReplyScheduler
+from projectbot.ResponseIndex import ResponseIndex
+from projectbot.Activity import ActivityStore, create_activity_store
+from projectbot.Snapshot import CorpusSnapshot, SnapshotError, create_snapshot, read_snapshot, write_snapshot
 from projectbot.Constants import Const
 
 class BotInternals:
+    '''
+        Everything the bot runs with
+
+        Only the config is read when created. The reddit client, the mongo client,
+        the reply scheduler and the corpus are created on first use, so quick
+        actions like ver and help do not pay for them
+    '''
     def __init__(self):
 
         self.database: Database = None
-        self.reddit : RedditInterface = RedditInterface()
         self.config : Configuration = Configuration()
+        self.reddit : RedditInterface = RedditInterface(self.config)
+        self.scheduler : ReplyScheduler = None
+        self.activity_store : ActivityStore = None
+        self.response_index : ResponseIndex = ResponseIndex(self.config.get('response_index', Asset.file_response_index))
 
         self.subreddits_to_scan = []
 
-        self.idea_query_words = []
-        self.active_rejection_words = []
-        self.ideas = {
-            'all': [],
-            'easy': [],
-            'medium': [],
-            'hard': [],
-        }
+        # Replaced as a whole on reload, never modified
+        self.current_corpus : Corpus = None
+        self.corpus_refresher : CorpusRefresher = None
+        self.corpus_listeners = []
+        self.idea_weights = {}
+        self.recent_ideas : RecentIdeas = RecentIdeas(
+            max_keys=self.config.get_int('sampler_max_keys', Const.SAMPLER_MAX_KEYS),
+            window=self.config.get_int('sampler_no_repeat_window', Const.SAMPLER_NO_REPEAT_WINDOW))
+        self.loaded_from_snapshot = False
+        self.trigger_scanner : TriggerScanner = None
 
         # Set app level
         level = get_app_level()
@@ -34,7 +52,63 @@ class BotInternals:
         # Initialize the database
         self.database = Database(self.config['mongo_username'],
                             self.config['mongo_password'],
-                            self.config['username'])
+                            self.config['username'],
+                            uri=self.config.get('mongo_uri'))
+
+    @property
+    def reply_scheduler(self) -> ReplyScheduler:
+        if self.scheduler is None:
+            self.scheduler = ReplyScheduler(
+                max_retries=self.config.get_int('reply_max_retries', Const.REPLY_MAX_RETRIES),
+                retry_exceptions=get_retry_exceptions(),
+                limits_provider=self.reddit.get_rate_limits)
+        return self.scheduler
+
+    @reply_scheduler.setter
+    def reply_scheduler(self, scheduler : ReplyScheduler):
+        self.scheduler = scheduler
+
+    @property
+    def activity(self) -> ActivityStore:
+        ''' The store of the decisions and replies, created on first use '''
+        if self.activity_store is None:
+            self.activity_store = create_activity_store(
+                self.config.get('activity_store', 'mongo'),
+                self.database,
+                self.config.get('activity_db', Asset.file_activity_db),
+                flush_interval=float(self.config.get('activity_flush_interval', Const.ACTIVITY_FLUSH_INTERVAL)))
+        return self.activity_store
+
+    @activity.setter
+    def activity(self, store : ActivityStore):
+        self.activity_store = store
+
+    @property
+    def corpus(self) -> Corpus:
+        ''' The corpus in use, loaded on first use '''
+        if self.current_corpus is None:
+            self.initialize()
+        return self.current_corpus
+
+    @property
+    def ideas(self):
+        return self.corpus.ideas
+
+    @property
+    def idea_query_words(self):
+        return self.corpus.suggestions
+
+    @property
+    def active_rejection_words(self):
+        return self.corpus.rejections
+
+    @property
+    def classifier(self) -> TitleClassifier:
+        return self.corpus.classifier
+
+    @property
+    def corpus_hash(self):
+        return self.corpus.content_hash
 
     def set_app_level(self, level):
 
@@ -46,6 +120,11 @@ class BotInternals:
             print('Set to staging settings')
             self.subreddits_to_scan = Const.SUBREDDITS_TO_SCAN_STAG
 
+        # A configured list of subreddits replaces the defaults of the level
+        configured = [name.strip() for name in self.config.get('subreddits', '').split(',') if name.strip() != '']
+        if len(configured) > 0:
+            self.subreddits_to_scan = configured
+
     def turn_ON_simulation_mode(self):
         ''' Turn on the simulation flag '''
         self.config.SIMULATE = True
@@ -57,19 +136,21 @@ class BotInternals:
         print('Simulation mode turned: OFF')
 
     def add_to_idea_list(self, newIdea):
-        if not isinstance(newIdea, list):
-            raise Exception('Failed to add new idea, not a list object')
-        if len(newIdea) != 3:
-            raise Exception('Failed to add new idea, improperly formatted list')
-        difficulty = newIdea[1].replace('"', '').strip()
-        self.ideas['all'].append(newIdea)
-        self.ideas[difficulty].append(newIdea)
+        self.add_ideas_range([newIdea])
     
     def add_ideas_range(self, idea_list):
+        ''' Swap in a new corpus with the ideas added '''
         if not isinstance(idea_list, list):
             raise Exception('Failed to add new idea list, not a list object')
         for idea in idea_list:
-            self.add_to_idea_list(idea)
+            if not isinstance(idea, list):
+                raise Exception('Failed to add new idea, not a list object')
+            if len(idea) != 3:
+                raise Exception('Failed to add new idea, improperly formatted list')
+
+        current = self.corpus
+        snapshot = create_snapshot([idea.as_row() for idea in current.ideas['all']] + idea_list, current.suggestions, current.rejections)
+        self.swap_corpus(Corpus(snapshot, current.version + 1, current.source, self.idea_weights))
 
     def get_ideas_internal(self):
         ''' Open the Ideas Database and fill idea stucture '''
@@ -86,33 +167,7 @@ class BotInternals:
 
 
     def get_ideas_mongodb(self):
-        ideas = []
-        docs = self.database.get_docs_from_collection(Asset.coll_ideas_mongo)
-        for doc in docs:
-            idea = [
-                doc['name'],
-                doc['difficulty'],
-                doc['description']
-            ]
-            ideas.append(idea)
-
-        return ideas
-
-
-    def get_ideas(self):
-        ''' Loads the ideas from external DB '''
-
-        ideas = []
-
-        try:
-            ideas = self.get_ideas_mongodb()
-            print('Loaded ideas from mongo')
-        except Exception as e:
-            print('[Error]:', e)
-            ideas = self.get_ideas_internal()
-            print('Loaded ideas from internal')
-
-        return ideas
+        return self.database.get_ideas()
 
 
     def get_suggestion_words_internal(self):
@@ -133,22 +188,6 @@ class BotInternals:
         return suggestions
 
 
-    def get_suggestion_words(self):
-        ''' Loads the suggestion words from external DB '''
-        suggestions = []
-
-        try:
-            suggestions = self.get_suggestion_words_mongo()
-            print('Loaded suggestions from mongo')
-        except Exception as e:
-            print('[Error]:', e)
-            suggestions = self.get_suggestion_words_internal()
-            print('Loaded suggestions from internal')
-            pass
-
-        return suggestions
-
-
     def get_rejection_words_default(self):
         ''' Opne the rejection words database and fill list '''
 
@@ -168,57 +207,174 @@ class BotInternals:
         return rejections
 
 
-    def get_rejection_words(self):
-        ''' Loads the rejectin words from external DB '''
-        rejections = []
+    def get_corpus(self):
+        ''' Loads the ideas, suggestion words and rejection words from external DB, each falling back to internal '''
 
-        try:
-            rejections = self.get_rejection_words_mongo()
-            print('Loaded rejections from mongo')
-        except Exception as e:
-            print('[Error]:', e)
-            rejections = self.get_rejection_words_default()
-            print('Loaded rejections from internal')
+        deadline = float(self.config.get('corpus_load_deadline', Const.CORPUS_LOAD_DEADLINE))
+        results = load_sources({
+            'ideas': (self.get_ideas_mongodb, self.get_ideas_internal),
+            'suggestions': (self.get_suggestion_words_mongo, self.get_suggestion_words_internal),
+            'rejections': (self.get_rejection_words_mongo, self.get_rejection_words_default),
+        }, deadline)
 
-        return rejections
+        for result in results.values():
+            origin = 'mongo' if result.origin == 'primary' else 'internal'
+            if result.outcome != 'ok':
+                print(f'[Error]: Loading {result.name} from mongo {result.outcome}')
+            print(f'Loaded {result.name} from {origin} in {result.seconds:.3f}s')
 
+        return results['ideas'].value, results['suggestions'].value, results['rejections'].value
+
+    def get_idea_weights(self):
+        ''' Read the optional weight of each idea, ideas without one have a weight of 1 '''
+        weights = {}
+        path = self.config.get('idea_weights', Asset.file_idea_weights)
+        if not os.path.exists(path):
+            return weights
+
+        with open(path) as csvfile:
+            reader = csv.reader(csvfile, delimiter=',', skipinitialspace=True)
+            for index, row in enumerate(reader):
+                if index == 0 or len(row) < 2:
+                    continue
+                try:
+                    weights[row[0].strip()] = float(row[1])
+                except ValueError:
+                    print('[Error]: Invalid idea weight:', row)
+        print('Read:', len(weights), 'idea weights')
+        return weights
+
+    def load_snapshot(self):
+        ''' Load the corpus snapshot if there is a valid one '''
+        path = self.config.get('corpus_snapshot', Asset.file_corpus_snapshot)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            return read_snapshot(path)
+        except (OSError, ValueError, EOFError, SnapshotError) as e:
+            print('[Error]: Failed to read corpus snapshot:', e)
+            return None
+
+    def save_snapshot(self, snapshot):
+        ''' Save the corpus snapshot for the next start '''
+        path = self.config.get('corpus_snapshot', Asset.file_corpus_snapshot)
+        try:
+            write_snapshot(path, snapshot)
+            print('Saved corpus snapshot:', snapshot.get_hash_text()[:12])
+        except OSError as e:
+            print('[Error]: Failed to save corpus snapshot:', e)
+
+    def add_corpus_listener(self, listener):
+        ''' Call the listener with the new corpus every time one is put in use '''
+        self.corpus_listeners.append(listener)
+
+    def swap_corpus(self, corpus : Corpus):
+        ''' Put a new corpus in use, readers keep the one they already hold '''
+        self.current_corpus = corpus
+        for listener in self.corpus_listeners:
+            listener(corpus)
+
+    def swap_corpus_and_save(self, corpus : Corpus):
+        ''' Put a reloaded corpus in use and save it for the next start '''
+        self.swap_corpus(corpus)
+        self.save_snapshot(corpus.snapshot)
 
     def initialize(self):
         ''' Initialize all things used for the application '''
 
-        # Import the ideas
-        retrieved_ideas = self.get_ideas()
-        self.add_ideas_range(retrieved_ideas)
-        print('Read:', len(self.ideas['all']), 'idea entries')
+        # Import the ideas, suggestion words and rejection words
+        self.idea_weights = self.get_idea_weights()
+        snapshot = self.load_snapshot()
+        if snapshot is not None:
+            self.loaded_from_snapshot = True
+            print('Loaded corpus from snapshot:', snapshot.get_hash_text()[:12])
+        else:
+            self.loaded_from_snapshot = False
+            snapshot = create_snapshot(*self.get_corpus())
+            self.save_snapshot(snapshot)
+        self.swap_corpus(Corpus(snapshot, source='snapshot' if self.loaded_from_snapshot else 'startup', weights=self.idea_weights))
 
-        # Import suggestion words
-        self.idea_query_words = self.get_suggestion_words()
+        print('Read:', len(self.ideas['all']), 'idea entries')
         print('Read:', len(self.idea_query_words), 'suggestion entries')
-
-        # Import rejection words
-        self.active_rejection_words = self.get_rejection_words()
         print('Read:', len(self.active_rejection_words), 'rejction entries')
 
-    def get_random_idea(self, ideas, desired_difficulty='all'):
+        # Build the comment trigger scanner from the configured phrases
+        self.trigger_scanner = TriggerScanner(self.get_trigger_phrases())
+
+    def load_corpus_snapshot_mongodb(self):
+        ''' Load the latest corpus from mongo '''
+        return create_snapshot(*self.database.load_corpus())
+
+    def get_corpus_refresher(self):
+        if self.corpus_refresher is None:
+            wait_for_change = None
+            if self.config.get('corpus_change_streams', 'false').lower() == 'true':
+                wait_for_change = self.database.wait_for_change
+            self.corpus_refresher = CorpusRefresher(self.load_corpus_snapshot_mongodb,
+                                                    lambda: self.corpus,
+                                                    self.swap_corpus_and_save,
+                                                    interval=self.config.get_int('corpus_refresh_interval', Const.CORPUS_REFRESH_INTERVAL),
+                                                    wait_for_change=wait_for_change,
+                                                    weights=self.idea_weights)
+        return self.corpus_refresher
+
+    def refresh_corpus(self):
         '''
-        Get a random idea from the list
+            Reload the corpus from mongo, the snapshot is only replaced when the content changed
 
-        Argument:
-            ideas (list<csvrow>): The list of ideas parsed from database
-            desired_difficulty (string): The default difficulty. Defaults to all.
+            Returns:
+                changed (boolean): A new corpus is being used
+        '''
+        return self.get_corpus_refresher().refresh_now()
 
-        Returns:
-            idea (csvrow): A random idea
+    def start_corpus_refresh(self):
+        ''' Keep checking mongo for a newer corpus in the background '''
+        self.get_corpus_refresher().start(check_now=self.loaded_from_snapshot)
+
+    def get_trigger_phrases(self):
+        ''' Get all phrases which call the bot, including any aliases from the config '''
+
+        phrases = []
+        phrases.append('u/' + self.config['username'])
+        phrases.extend(Const.TRIGGER_PHRASES)
+
+        aliases = self.config.get('trigger_aliases', '')
+        for alias in aliases.split(','):
+            alias = alias.strip()
+            if alias != '':
+                phrases.append(alias)
+
+        return phrases
+
+    def seed_response_index(self):
+        ''' Add the replies in the bot's comment history to the response index '''
+        self.response_index.open()
+        count = self.response_index.seed_from_history(self.reddit.get_own_comments())
+        print('Seeded:', count, 'new responses into the response index,', len(self.response_index), 'total')
+
+    def sample_idea(self, desired_difficulty='all', keys=()):
         '''
+        Get a weighted random idea, avoiding the ideas recently given to the same thread or user
 
-        # Check ideas is filled
-        if len(ideas['all']) == 0:
-            return None
+        Argument:
+            desired_difficulty (string): The difficulty of the idea. Defaults to all.
+            keys (list<string>): The thread and/or user asking for the idea
 
-        if is_recongized_difficulty(desired_difficulty):
-            tmp_ideas = ideas[desired_difficulty]
-        else:
-            tmp_ideas = ideas['all']
+        Returns:
+            idea (Idea): A random idea, None if there are no ideas
+        '''
 
-        num = random.randrange(0, len(tmp_ideas))
-        return tmp_ideas[num]
+        if not is_recongized_difficulty(desired_difficulty):
+            desired_difficulty = 'all'
+        desired_difficulty = desired_difficulty.lower()
+
+        corpus = self.corpus
+        excluded = self.recent_ideas.get_excluded(keys) if keys else None
+        idea = corpus.sampler.sample(desired_difficulty, excluded)
+        if idea is None:
+            # Nothing of that difficulty, any idea will do
+            idea = corpus.sampler.sample('all', excluded)
+        if idea is not None and keys:
+            self.recent_ideas.record(keys, idea.name)
+        return idea
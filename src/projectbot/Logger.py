@@ -0,0 +1,158 @@
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from collections import deque
+from projectbot.Constants import Const
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {
+    DEBUG: 'debug',
+    INFO: 'info',
+    WARNING: 'warning',
+    ERROR: 'error',
+}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+def parse_level(level):
+    ''' Get the level number of a level name or number '''
+    if isinstance(level, int):
+        return level
+    text = str(level).strip().lower()
+    if text.isdigit():
+        return int(text)
+    if text not in LEVELS:
+        raise ValueError(f'Unknown log level: {level}')
+    return LEVELS[text]
+
+class StructuredLogger:
+    '''
+        Leveled JSON logging which never blocks the caller
+
+        A call only checks the level and appends a tuple to a buffer. A background
+        thread turns the records into JSON lines and writes them every flush
+        interval, so the stream threads never format or wait on output. When the
+        buffer is full new records are dropped and counted.
+
+        Parameters:
+            stream (file): Where the lines are written, the current stdout when missing
+            level (int/string): Records below this level are skipped
+            sample_rate (float): Share of sampled records which are kept
+            flush_interval (float): Seconds between writes
+            max_buffer (int): Records held before new ones are dropped
+    '''
+    def __init__(self, stream=None, level=INFO, sample_rate=Const.LOG_SAMPLE_RATE,
+                flush_interval=Const.LOG_FLUSH_INTERVAL, max_buffer=Const.LOG_MAX_BUFFER):
+        self.stream = stream
+        self.level = parse_level(level)
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self.buffer = deque()
+        self.dropped = 0
+        self.write_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def set_level(self, level):
+        ''' Change the verbosity, takes effect on the next record '''
+        self.level = parse_level(level)
+
+    def get_level_name(self):
+        return LEVEL_NAMES.get(self.level, str(self.level))
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, event, fields):
+        if level < self.level:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.buffer.append((time.time(), level, event, fields))
+        if self.thread is None:
+            self.start()
+
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self.log(INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, fields)
+
+    def sampled(self, event, level=INFO, **fields):
+        ''' Log only a sample_rate share of these records, for high volume events '''
+        if level < self.level or random.random() >= self.sample_rate:
+            return
+        fields['sampled'] = self.sample_rate
+        self.log(level, event, fields)
+
+    def start(self):
+        ''' Start the background writer, done on the first record '''
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name='Log Writer', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        ''' Stop the background writer after writing everything buffered '''
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.thread = None
+        self.flush()
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def format_record(self, record):
+        created_at, level, event, fields = record
+        line = {'ts': round(created_at, 3), 'level': LEVEL_NAMES.get(level, level), 'event': event}
+        line.update(fields)
+        return json.dumps(line, default=str)
+
+    def flush(self):
+        ''' Write every buffered record '''
+        with self.write_lock:
+            lines = []
+            buffer = self.buffer
+            while buffer:
+                lines.append(self.format_record(buffer.popleft()))
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                lines.append(self.format_record((time.time(), WARNING, 'log_records_dropped', {'count': dropped})))
+            if not lines:
+                return
+
+            stream = self.stream if self.stream is not None else sys.stdout
+            try:
+                stream.write('\n'.join(lines) + '\n')
+                stream.flush()
+            except (OSError, ValueError):
+                # The stream was closed, nothing else to write to
+                pass
+
+# Shared by the whole bot
+log = StructuredLogger()
+atexit.register(log.stop)
@@ -0,0 +1,288 @@
+import time
+import bisect
+import threading
+
+# Seconds, from fast in-memory checks up to slow reddit calls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class CounterValue:
+    ''' One labelled series of a counter '''
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        return self.value
+
+class GaugeValue(CounterValue):
+    ''' One labelled series of a gauge, optionally read from a function when rendered '''
+    __slots__ = ('function',)
+
+    def __init__(self):
+        super().__init__()
+        self.function = None
+
+    def set(self, value):
+        self.value = float(value)
+
+    def set_function(self, function):
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float('nan')
+        return self.value
+
+class HistogramValue:
+    ''' One labelled series of a histogram '''
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def get(self):
+        ''' Get the cumulative count of each bucket, the total count and the sum '''
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total
+
+class Metric:
+    '''
+        A named metric with a series for every combination of label values
+
+        Series are created on first use and kept, so the hot path is one dict
+        lookup (or none when the series is kept by the caller) and one lock
+    '''
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.series[()] = self.create_value()
+
+    def create_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        ''' Get the series of the label values '''
+        series = self.series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self.lock:
+                series = self.series.setdefault(values, self.create_value())
+        return series
+
+    def get_series(self):
+        with self.lock:
+            return sorted(self.series.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for values, series in self.get_series():
+            lines.append(f'{self.name}{format_labels(self.labelnames, values)} {format_value(series.get())}')
+        return lines
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def create_value(self):
+        return CounterValue()
+
+    def inc(self, amount=1.0):
+        self.series[()].inc(amount)
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def create_value(self):
+        return GaugeValue()
+
+    def set(self, value):
+        self.series[()].set(value)
+
+    def set_function(self, function):
+        self.series[()].set_function(function)
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def create_value(self):
+        return HistogramValue(self.bounds)
+
+    def observe(self, value):
+        self.series[()].observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for values, series in self.get_series():
+            cumulative, count, total = series.get()
+            for bound, bucket_count in zip(self.bounds + (float('inf'),), cumulative):
+                labels = format_labels(self.labelnames, values, f'le="{format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+            labels = format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    ''' The metrics exposed together on the metrics endpoint '''
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        ''' Get every metric in the Prometheus text format '''
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+def create_handler(metrics_registry):
+    ''' Create the request handler serving the metrics, http.server is only imported when serving '''
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics_registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes would flood the output
+            pass
+
+    return MetricsHandler
+
+def start_metrics_server(port, host='127.0.0.1', metrics_registry=None):
+    '''
+        Serve the metrics on http://host:port/metrics from a background thread
+
+        Returns:
+            server (ThreadingHTTPServer): The running server, call shutdown() to stop it
+    '''
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), create_handler(metrics_registry or registry))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='Metrics Server', daemon=True)
+    thread.start()
+    return server
+
+def instrument_stream(kind, iterable):
+    '''
+        Count the items of a reddit stream, how long each was waited on and how old each is when read
+
+        With a kind of None the stream yields (kind, thing) for mixed items
+    '''
+    started = time.perf_counter()
+    for item in iterable:
+        item_kind, thing = item if kind is None else (kind, item)
+        STREAM_WAIT_SECONDS.labels(item_kind).observe(time.perf_counter() - started)
+        STREAM_ITEMS.labels(item_kind).inc()
+        created_utc = getattr(thing, 'created_utc', None)
+        if created_utc is not None:
+            STREAM_LAG_SECONDS.labels(item_kind).observe(max(0.0, time.time() - created_utc))
+        yield item
+        started = time.perf_counter()
+
+# Metrics of the bot, all exposed on the metrics endpoint
+registry = MetricsRegistry()
+
+STREAM_ITEMS = registry.counter('projectbot_stream_items_total', 'Items read from the reddit streams', ['kind'])
+STREAM_WAIT_SECONDS = registry.histogram('projectbot_stream_wait_seconds', 'Seconds waited on a reddit stream for the next item', ['kind'])
+STREAM_LAG_SECONDS = registry.histogram('projectbot_stream_lag_seconds', 'Seconds between an item being created and the bot reading it', ['kind'], LAG_BUCKETS)
+
+CLASSIFY_SECONDS = registry.histogram('projectbot_classify_seconds', 'Seconds deciding if an item asks for a project', ['kind'])
+DECISIONS = registry.counter('projectbot_decisions_total', 'Items accepted or rejected by the classifier', ['kind', 'decision'])
+
+DEDUP_SECONDS = registry.histogram('projectbot_dedup_seconds', 'Seconds checking if the bot already responded to an item', ['kind'])
+DUPLICATES = registry.counter('projectbot_duplicates_total', 'Accepted items the bot had already responded to', ['kind'])
+
+POLL_REQUESTS = registry.counter('projectbot_poll_requests_total', 'Listing requests made by the adaptive poller', ['kind'])
+POLL_INTERVAL_SECONDS = registry.histogram('projectbot_poll_interval_seconds', 'Interval chosen until the next poll of a subreddit', buckets=(5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+REDDIT_SEND_SECONDS = registry.histogram('projectbot_reddit_send_seconds', 'Seconds sending a reply to reddit', ['method'])
+REDDIT_SEND_ERRORS = registry.counter('projectbot_reddit_send_errors_total', 'Replies reddit failed to accept', ['method'])
+
+REPLY_LATENCY_SECONDS = registry.histogram('projectbot_reply_latency_seconds', 'Seconds from scheduling a reply to it being sent', buckets=DEFAULT_BUCKETS + (60.0, 300.0, 600.0))
+REPLIES_PENDING = registry.gauge('projectbot_replies_pending', 'Replies waiting to be sent')
+RATE_LIMITED = registry.counter('projectbot_rate_limited_total', 'Replies reddit rejected with a RATELIMIT error')
+RATE_LIMIT_WAIT_SECONDS = registry.counter('projectbot_rate_limit_wait_seconds_total', 'Seconds replies were held because of reddit rate limits')
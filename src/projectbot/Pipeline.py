@@ -0,0 +1,185 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from projectbot.Constants import Const
+from projectbot.Logger import log
+
+class IngestionPipeline:
+    '''
+        Staged pipeline to fetch, classify, dedup check and reply to reddit items
+
+        Each stage is a set of workers connected to the next stage by a bounded queue.
+        When a queue is full, the stage before it waits, so a slow reply never lets
+        the backlog grow without limit. Every stage runs its handler on threads, so
+        a slow network call only holds up its own worker and the classify workers
+        do not hold the event loop.
+
+        Stage handlers:
+            classify(kind, thing) -> (accepted, payload)
+            dedup(kind, thing) -> already_handled
+            reply(kind, thing, payload) -> success
+    '''
+    def __init__(self, classify, dedup, reply,
+                queue_size=Const.PIPELINE_QUEUE_SIZE,
+                classify_workers=Const.PIPELINE_CLASSIFY_WORKERS,
+                dedup_workers=Const.PIPELINE_DEDUP_WORKERS,
+                reply_workers=Const.PIPELINE_REPLY_WORKERS):
+        self.classify = classify
+        self.dedup = dedup
+        self.reply = reply
+
+        self.queue_size = queue_size
+        self.classify_workers = max(1, classify_workers)
+        self.dedup_workers = max(1, dedup_workers)
+        self.reply_workers = max(1, reply_workers)
+
+        self.sources = []
+        self.loop = None
+        self.executor = None
+        self.classify_queue = None
+        self.dedup_queue = None
+        self.reply_queue = None
+
+        self.started_at = None
+        self.finished_at = None
+        self.stats = {
+            'fetched': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'duplicates': 0,
+            'replied': 0,
+            'failed': 0,
+            'errors': 0,
+        }
+
+    def add_source(self, kind, iterable):
+        '''
+            Add a stream of items (submissions or comments) to the fetch stage
+
+            With a kind of None the stream yields (kind, thing) for mixed items
+        '''
+        self.sources.append((kind, iterable))
+
+    def run(self):
+        ''' Blocking method to run the pipeline until all sources are exhausted '''
+        asyncio.run(self.run_async())
+
+    def get_throughput(self):
+        ''' Get the number of items fetched per second '''
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        elapsed = end - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return self.stats['fetched'] / elapsed
+
+    async def run_async(self):
+        ''' Run all stages until every source is exhausted and every queue is drained '''
+
+        self.loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.classify_workers + self.dedup_workers + self.reply_workers,
+                                        thread_name_prefix='pipeline')
+        self.classify_queue = asyncio.Queue(self.queue_size)
+        self.dedup_queue = asyncio.Queue(self.queue_size)
+        self.reply_queue = asyncio.Queue(self.queue_size)
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+        workers = []
+        workers += [asyncio.create_task(self.classify_worker()) for _ in range(self.classify_workers)]
+        workers += [asyncio.create_task(self.dedup_worker()) for _ in range(self.dedup_workers)]
+        workers += [asyncio.create_task(self.reply_worker()) for _ in range(self.reply_workers)]
+
+        # Fetchers are daemon threads since reddit streams block forever
+        fetchers_done = []
+        for kind, iterable in self.sources:
+            done = self.loop.create_future()
+            fetchers_done.append(done)
+            thread = threading.Thread(target=self.fetch, args=(kind, iterable, done),
+                                    name=f'Fetch {kind or "items"}', daemon=True)
+            thread.start()
+
+        try:
+            await asyncio.gather(*fetchers_done)
+            await self.classify_queue.join()
+            await self.dedup_queue.join()
+            await self.reply_queue.join()
+        finally:
+            self.finished_at = time.perf_counter()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.executor.shutdown(wait=False)
+
+    def fetch(self, kind, iterable, done):
+        ''' Fetch stage, pulls from a blocking stream and waits while the classify queue is full '''
+        try:
+            for item in iterable:
+                entry = item if kind is None else (kind, item)
+                try:
+                    put = asyncio.run_coroutine_threadsafe(self.classify_queue.put(entry), self.loop)
+                    put.result()
+                except RuntimeError:
+                    if self.loop.is_closed():
+                        # The event loop was closed underneath us
+                        return
+                    raise
+        except Exception as e:
+            log.error('stream_failed', kind=kind, error=str(e))
+
+        try:
+            self.loop.call_soon_threadsafe(done.set_result, None)
+        except RuntimeError:
+            pass
+
+    async def classify_worker(self):
+        ''' Classify stage, decides if an item is asking for a project '''
+        while True:
+            kind, thing = await self.classify_queue.get()
+            try:
+                self.stats['fetched'] += 1
+                accepted, payload = await self.loop.run_in_executor(self.executor, self.classify, kind, thing)
+                if accepted:
+                    self.stats['accepted'] += 1
+                    await self.dedup_queue.put((kind, thing, payload))
+                else:
+                    self.stats['rejected'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                log.error('classify_failed', kind=kind, error=str(e))
+            finally:
+                self.classify_queue.task_done()
+
+    async def dedup_worker(self):
+        ''' Dedup stage, confirms the bot has not already responded to the item '''
+        while True:
+            kind, thing, payload = await self.dedup_queue.get()
+            try:
+                duplicate = await self.loop.run_in_executor(self.executor, self.dedup, kind, thing)
+                if duplicate:
+                    self.stats['duplicates'] += 1
+                else:
+                    await self.reply_queue.put((kind, thing, payload))
+            except Exception as e:
+                self.stats['errors'] += 1
+                log.error('dedup_failed', kind=kind, error=str(e))
+            finally:
+                self.dedup_queue.task_done()
+
+    async def reply_worker(self):
+        ''' Reply stage, sends the response for the item '''
+        while True:
+            kind, thing, payload = await self.reply_queue.get()
+            try:
+                success = await self.loop.run_in_executor(self.executor, self.reply, kind, thing, payload)
+                if success:
+                    self.stats['replied'] += 1
+                else:
+                    self.stats['failed'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                log.error('reply_failed', kind=kind, error=str(e))
+            finally:
+                self.reply_queue.task_done()
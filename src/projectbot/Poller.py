@@ -0,0 +1,179 @@
+import time
+import heapq
+import threading
+from collections import OrderedDict
+from projectbot.ReplyScheduler import TokenBucket
+from projectbot.Constants import Const
+from projectbot.Logger import log
+from projectbot.Metrics import POLL_REQUESTS, POLL_INTERVAL_SECONDS
+
+class SeenSet:
+    ''' Bounded set of the most recent fullnames, to skip items already read on an earlier poll '''
+    def __init__(self, max_size=Const.POLL_SEEN_SIZE):
+        self.max_size = max_size
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def add(self, key):
+        self.items[key] = None
+        if len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+class PollState:
+    '''
+        Polling state of one subreddit
+
+        The arrival rate is an exponentially weighted moving average of the new
+        items per second, and the interval aims for target_items new items a poll
+    '''
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.rate = 0.0
+        self.last_polled_at = None
+        self.seen = {'submission': SeenSet(), 'comment': SeenSet()}
+        self.polls = 0
+        self.items = 0
+
+    def update(self, new_items, page_full, now, min_interval, max_interval, target_items, alpha):
+        ''' Update the arrival rate and get the interval until the next poll '''
+        self.polls += 1
+        self.items += new_items
+        if self.last_polled_at is not None:
+            elapsed = max(now - self.last_polled_at, 1e-3)
+            self.rate = alpha * (new_items / elapsed) + (1 - alpha) * self.rate
+        self.last_polled_at = now
+
+        if page_full:
+            # More arrived than one page holds, catch up right away
+            self.interval = min_interval
+        elif self.rate > 0:
+            self.interval = target_items / self.rate
+        else:
+            self.interval = self.interval * Const.POLL_BACKOFF
+        self.interval = min(max_interval, max(min_interval, self.interval))
+        return self.interval
+
+class SubredditPoller:
+    '''
+        One loop polling the new submissions and comments of every subreddit
+
+        Each subreddit is polled on its own interval, short for busy subreddits
+        and growing for quiet ones. Every poll takes one request per listing from
+        a global budget, so the loop never uses more than requests_per_second.
+
+        Parameters:
+            reddit (RedditInterface): Used for query_subreddit()
+            subreddits (list<string>): The subreddits to poll
+            requests_per_second (float): Global request budget of the poller
+            limit (int): Items fetched per listing request
+    '''
+    def __init__(self, reddit, subreddits,
+                requests_per_second=Const.POLL_REQUESTS_PER_SECOND,
+                min_interval=Const.POLL_MIN_INTERVAL, max_interval=Const.POLL_MAX_INTERVAL,
+                target_items=Const.POLL_TARGET_ITEMS, alpha=Const.POLL_RATE_ALPHA,
+                limit=Const.POLL_LIMIT, clock=time.monotonic, sleep=None):
+        self.reddit = reddit
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_items = target_items
+        self.alpha = alpha
+        self.limit = limit
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self.sleep = sleep if sleep is not None else self.stop_event.wait
+        self.budget = TokenBucket(max(2.0, requests_per_second * Const.POLL_BUDGET_BURST), requests_per_second, clock)
+
+        self.states = {name: PollState(name, min_interval) for name in subreddits}
+        now = clock()
+        # Spread the first polls so they do not all start at once
+        self.schedule = [(now + index * (1.0 / requests_per_second) * 2, name) for index, name in enumerate(subreddits)]
+        heapq.heapify(self.schedule)
+        self.stats = {
+            'polls': 0,
+            'requests': 0,
+            'items': 0,
+            'errors': 0,
+        }
+
+    def stop(self):
+        self.stop_event.set()
+
+    def fetch(self, state, kind):
+        ''' Get the new items of a listing, oldest first '''
+        subreddit = self.reddit.query_subreddit(state.name)
+        if kind == 'submission':
+            listing = subreddit.new(limit=self.limit)
+        else:
+            listing = subreddit.comments(limit=self.limit)
+        things = list(listing)
+        self.stats['requests'] += 1
+        POLL_REQUESTS.labels(kind).inc()
+
+        seen = state.seen[kind]
+        fresh = []
+        for thing in things:
+            if thing.fullname not in seen:
+                fresh.append(thing)
+        for thing in fresh:
+            seen.add(thing.fullname)
+        fresh.reverse()
+        return fresh, len(things) >= self.limit and len(fresh) == len(things)
+
+    def poll(self, state):
+        '''
+            Poll both listings of a subreddit and reschedule it
+
+            Returns:
+                items (list<tuple>): (kind, thing) of every new item, oldest first in each listing
+        '''
+        items = []
+        page_full = False
+        for kind in ('submission', 'comment'):
+            try:
+                fresh, full = self.fetch(state, kind)
+            except Exception as e:
+                self.stats['errors'] += 1
+                log.error('poll_failed', subreddit=state.name, kind=kind, error=str(e))
+                continue
+            # A full first page is only the backlog from before the bot started
+            page_full = page_full or (full and state.polls > 0)
+            items.extend((kind, thing) for thing in fresh)
+
+        now = self.clock()
+        interval = state.update(len(items), page_full, now, self.min_interval, self.max_interval, self.target_items, self.alpha)
+        heapq.heappush(self.schedule, (now + interval, state.name))
+        POLL_INTERVAL_SECONDS.observe(interval)
+        self.stats['polls'] += 1
+        self.stats['items'] += len(items)
+        return items
+
+    def wait_for_next(self):
+        ''' Wait until a subreddit is due and the budget allows its requests, None when stopped '''
+        while not self.stop_event.is_set():
+            due, name = self.schedule[0]
+            now = self.clock()
+            wait = max(due - now, self.budget.time_until_available(2, now))
+            if wait > 0:
+                self.sleep(wait)
+                continue
+            self.budget.take(2, now)
+            heapq.heappop(self.schedule)
+            return self.states[name]
+        return None
+
+    def items(self):
+        ''' Blocking stream of (kind, thing) for every new submission and comment '''
+        if not self.states:
+            return
+        while True:
+            state = self.wait_for_next()
+            if state is None:
+                return
+            yield from self.poll(state)
+
+    def get_intervals(self):
+        ''' Get the current poll interval of each subreddit '''
+        return {name: state.interval for name, state in self.states.items()}
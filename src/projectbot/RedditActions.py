@@ -1,30 +1,86 @@
-import praw
+import time
+import threading
 from projectbot.Constants import Error
+from projectbot.Metrics import REDDIT_SEND_SECONDS, REDDIT_SEND_ERRORS
 
 class RedditInterface:
-    def __init__(self):
-        self.init_reddit_client()
+    '''
+        Access to reddit through PRAW
+
+        The client is created and logged in on first use, so actions which never
+        talk to reddit do not import praw or wait on a login
+    '''
+    def __init__(self, config=None):
+        self.config = config
+        self.client = None
+        self.client_lock = threading.Lock()
+
+    @property
+    def reddit(self):
+        return self.get_client()
+
+    def get_client(self):
+        ''' Get the reddit client, creating it on first use '''
+        if self.client is None:
+            with self.client_lock:
+                if self.client is None:
+                    self.client = self.init_reddit_client()
+        return self.client
 
     def init_reddit_client(self):
         ''' Initialize an instance of the PRAW reddit client using the assumed praw.ini in the same directory '''
-        self.reddit = praw.Reddit()
+        import praw
+
+        # The user agent is built from the config, praw.ini itself is never rewritten
+        options = {}
+        if self.config is not None:
+            options['user_agent'] = self.config['user_agent']
+        reddit = praw.Reddit(**options)
         try:
-            self.reddit.user.me()
+            reddit.user.me()
         except:
             print('Failed to log into bot')
             exit(Error.LOGIN_FAILED)
+        return reddit
 
 
     def send_comment_response(self, comment, response):
-        new_comment = comment.reply(response)
+        new_comment = send_timed('comment', comment, response)
         if new_comment == None:
             print('[Error]: Failed to post new comment')
 
 
     def send_submission_response(self, submission, response):
-        new_comment = submission.reply(response)
+        new_comment = send_timed('submission', submission, response)
         if new_comment == None:
             print("[Error]: Failed to post new comment")
 
+    def get_own_comments(self, limit=None):
+        ''' Get the comments made by the bot, newest first and fetched a page at a time '''
+        return self.reddit.user.me().comments.new(limit=limit)
+
+    def get_rate_limits(self):
+        ''' Get the request budget reddit reported on the last request '''
+        return self.reddit.auth.limits
+
     def query_subreddit(self, query):
         return self.reddit.subreddit(query)
+
+def get_retry_exceptions():
+    ''' Get the reddit errors a reply is retried after '''
+    from praw.exceptions import RedditAPIException
+    return (RedditAPIException,)
+
+def send_timed(method, thing, response):
+    ''' Reply to the thing, recording how long reddit took and if it failed '''
+    started = time.perf_counter()
+    try:
+        new_comment = thing.reply(response)
+    except Exception:
+        REDDIT_SEND_ERRORS.labels(method).inc()
+        raise
+    finally:
+        REDDIT_SEND_SECONDS.labels(method).observe(time.perf_counter() - started)
+    if new_comment == None:
+        REDDIT_SEND_ERRORS.labels(method).inc()
+    return new_comment
@@ -0,0 +1,416 @@
+import re
+import time
+import heapq
+import itertools
+import threading
+from projectbot.Constants import Const
+from projectbot.Logger import log
+from projectbot.Metrics import REPLY_LATENCY_SECONDS, RATE_LIMITED, RATE_LIMIT_WAIT_SECONDS
+
+RATELIMIT_ERROR = 'RATELIMIT'
+RATELIMIT_PATTERN = re.compile(r'(\d+)\s*(milliseconds?|ms|seconds?|minutes?|hours?)', re.IGNORECASE)
+UNIT_SECONDS = {
+    'ms': 0.001,
+    'millisecond': 0.001,
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+}
+
+def parse_ratelimit_delay(exception):
+    '''
+        Get the wait time out of a reddit RATELIMIT error
+
+        Parameters:
+            exception (Exception): Error raised while sending a reply
+
+        Returns:
+            delay (float): Seconds to wait, None if it is not a rate limit error
+    '''
+
+    messages = []
+    items = getattr(exception, 'items', None)
+    if isinstance(items, list):
+        for item in items:
+            if getattr(item, 'error_type', None) == RATELIMIT_ERROR:
+                messages.append(getattr(item, 'message', ''))
+    elif getattr(exception, 'error_type', None) == RATELIMIT_ERROR:
+        messages.append(getattr(exception, 'message', ''))
+    elif RATELIMIT_ERROR in str(exception):
+        messages.append(str(exception))
+
+    if len(messages) == 0:
+        return None
+
+    delay = None
+    for message in messages:
+        for amount, unit in RATELIMIT_PATTERN.findall(message):
+            unit = unit.lower().rstrip('s') if unit.lower() != 'ms' else 'ms'
+            seconds = int(amount) * UNIT_SECONDS[unit]
+            delay = seconds if delay is None else max(delay, seconds)
+
+    if delay is None:
+        # Rate limited but no time given, wait the default time
+        delay = Const.RATE_LIMIT_SLEEP_TIME
+    return delay
+
+class TokenBucket:
+    '''
+        Token bucket to keep the bot within reddit's request budget
+
+        Not thread safe, the owner is expected to hold its own lock
+    '''
+    def __init__(self, capacity, rate, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+
+    def refill(self, now=None):
+        now = self.clock() if now is None else now
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def time_until_available(self, tokens=1, now=None):
+        ''' Get the seconds until the number of tokens can be taken '''
+        self.refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (tokens - self.tokens) / self.rate
+
+    def take(self, tokens=1, now=None):
+        ''' Take tokens if available, returns if they were taken '''
+        self.refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def try_take(self, tokens=1, now=None):
+        '''
+            Take tokens if available, else get the seconds to wait for them
+
+            Returns:
+                wait (float): 0 when the tokens were taken, else the seconds until they can be
+        '''
+        wait = self.time_until_available(tokens, now)
+        if wait == 0:
+            self.tokens -= tokens
+        return wait
+
+    def drain(self, now=None):
+        ''' Empty the bucket, used when reddit reports the budget is gone '''
+        self.refill(now)
+        self.tokens = 0.0
+
+    def sync(self, remaining, seconds_until_reset, now=None):
+        ''' Match the bucket to the budget reported by reddit '''
+        self.refill(now)
+        if remaining is None:
+            return
+        self.tokens = min(self.tokens, float(remaining), self.capacity)
+        if remaining <= 0 and seconds_until_reset is not None and seconds_until_reset > 0:
+            # Nothing left until the window resets
+            self.tokens = -seconds_until_reset * self.rate
+
+class SharedTokenBucket(TokenBucket):
+    '''
+        Token bucket kept in shared memory so every worker process draws from the
+        one reply budget of the account
+
+        Must be created before the workers and handed to them when they start
+    '''
+    def __init__(self, capacity, rate, clock=time.monotonic, context=None):
+        if context is None:
+            import multiprocessing
+            context = multiprocessing.get_context('spawn')
+        # tokens, updated_at
+        self.shared = context.Array('d', [float(capacity), clock()], lock=True)
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.clock = clock
+
+    @property
+    def tokens(self):
+        return self.shared[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self.shared[0] = value
+
+    @property
+    def updated_at(self):
+        return self.shared[1]
+
+    @updated_at.setter
+    def updated_at(self, value):
+        self.shared[1] = value
+
+    def refill(self, now=None):
+        with self.shared.get_lock():
+            super().refill(now)
+
+    def time_until_available(self, tokens=1, now=None):
+        with self.shared.get_lock():
+            return super().time_until_available(tokens, now)
+
+    def take(self, tokens=1, now=None):
+        with self.shared.get_lock():
+            return super().take(tokens, now)
+
+    def try_take(self, tokens=1, now=None):
+        # Checked and taken under one lock, so two workers never take the last token
+        with self.shared.get_lock():
+            return super().try_take(tokens, now)
+
+    def drain(self, now=None):
+        with self.shared.get_lock():
+            super().drain(now)
+
+    def sync(self, remaining, seconds_until_reset, now=None):
+        with self.shared.get_lock():
+            super().sync(remaining, seconds_until_reset, now)
+
+class ScheduledReply:
+    ''' A reply waiting to be sent '''
+    __slots__ = ('send', 'thing', 'response', 'on_success', 'on_drop', 'attempts', 'submitted_at')
+
+    def __init__(self, send, thing, response, on_success=None, on_drop=None, submitted_at=0.0):
+        self.send = send
+        self.thing = thing
+        self.response = response
+        self.on_success = on_success
+        self.on_drop = on_drop
+        self.attempts = 0
+        self.submitted_at = submitted_at
+
+class ReplyScheduler:
+    '''
+        Sends replies on a background thread so the streams never wait on reddit
+
+        Replies are sent when a token is available. When reddit answers with a
+        RATELIMIT error, the wait time from the message is used to reschedule the
+        reply and to hold every other reply until the limit is over. A reply is
+        dropped after max_retries failed attempts, and the replies still waiting
+        when the scheduler stops are dropped too.
+    '''
+    def __init__(self, bucket=None, max_retries=Const.REPLY_MAX_RETRIES, retry_exceptions=(Exception,),
+                limits_provider=None, retry_delay=Const.REPLY_RETRY_DELAY,
+                rate_limit_margin=Const.RATE_LIMIT_MARGIN, clock=time.monotonic):
+        self.clock = clock
+        self.bucket = bucket if bucket is not None else TokenBucket(Const.REPLY_BUCKET_CAPACITY, Const.REPLY_BUCKET_RATE, clock)
+        self.max_retries = max_retries
+        self.retry_exceptions = retry_exceptions
+        self.limits_provider = limits_provider
+        self.retry_delay = retry_delay
+        self.rate_limit_margin = rate_limit_margin
+
+        self.queue = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.running = False
+        self.thread = None
+
+        self.stats = {
+            'scheduled': 0,
+            'sent': 0,
+            'retried': 0,
+            'dropped': 0,
+            'rate_limited': 0,
+        }
+
+    def start(self):
+        ''' Start the sending thread '''
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.run, name='Reply Scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self, drain=True, timeout=None):
+        '''
+            Stop the sending thread, the replies it did not send are dropped
+
+            Parameters:
+                drain (boolean): Send the replies still waiting before stopping
+                timeout (float): Maximum seconds to wait for the thread
+        '''
+        if drain:
+            self.wait_until_empty(timeout)
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+        with self.condition:
+            unsent = [reply for _, _, reply in self.queue]
+            self.queue = []
+            self.stats['dropped'] += len(unsent)
+            self.condition.notify_all()
+        if unsent:
+            log.warning('replies_unsent', count=len(unsent))
+        for reply in unsent:
+            self.drop(reply)
+
+    def wait_until_empty(self, timeout=None):
+        ''' Block until every scheduled reply was sent or dropped '''
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while self.queue or self.in_flight:
+                remaining = None if deadline is None else deadline - self.clock()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def pending(self):
+        ''' Get the number of replies waiting to be sent '''
+        with self.condition:
+            return len(self.queue) + self.in_flight
+
+    def submit(self, send, thing, response, on_success=None, on_drop=None):
+        '''
+            Schedule a reply to be sent as soon as the budget allows
+
+            Parameters:
+                send (function): Method sending the reply, called with (thing, response)
+                thing (Comment/Submission): The reddit item to reply to
+                response (string): The text of the reply
+                on_success (function): Optionally called with the thing once sent
+                on_drop (function): Optionally called with the thing if it is never sent
+        '''
+        now = self.clock()
+        reply = ScheduledReply(send, thing, response, on_success, on_drop, now)
+        self.schedule(reply, now)
+        with self.condition:
+            self.stats['scheduled'] += 1
+
+    def schedule(self, reply, due):
+        with self.condition:
+            heapq.heappush(self.queue, (due, next(self.counter), reply))
+            self.condition.notify_all()
+
+    def next_reply(self):
+        ''' Wait for the next reply which is due and allowed by the budget '''
+        with self.condition:
+            while self.running:
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+
+                now = self.clock()
+                due = self.queue[0][0]
+                wait = max(due - now, self.blocked_until - now)
+                if wait <= 0:
+                    wait = self.bucket.try_take(1, now)
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+
+                _, _, reply = heapq.heappop(self.queue)
+                self.in_flight += 1
+                return reply
+        return None
+
+    def run(self):
+        while True:
+            reply = self.next_reply()
+            if reply is None:
+                return
+            try:
+                self.send(reply)
+            finally:
+                with self.condition:
+                    self.in_flight -= 1
+                    self.condition.notify_all()
+
+    def send(self, reply):
+        ''' Send one reply and reschedule it if it failed '''
+        reply.attempts += 1
+        try:
+            reply.send(reply.thing, reply.response)
+        except self.retry_exceptions as e:
+            self.handle_failure(reply, e)
+            return
+        except Exception as e:
+            # e.g. a banned subreddit or a server error, retrying will not help and must not stop the thread
+            with self.condition:
+                self.stats['dropped'] += 1
+            log.error('reply_failed', attempts=reply.attempts, error=str(e))
+            self.drop(reply)
+            return
+
+        with self.condition:
+            self.stats['sent'] += 1
+        REPLY_LATENCY_SECONDS.observe(self.clock() - reply.submitted_at)
+        self.sync_limits()
+        if reply.on_success is not None:
+            try:
+                reply.on_success(reply.thing)
+            except Exception as e:
+                log.error('reply_callback_failed', error=str(e))
+
+    def drop(self, reply):
+        ''' Tell the owner of a reply it will never be sent '''
+        if reply.on_drop is None:
+            return
+        try:
+            reply.on_drop(reply.thing)
+        except Exception as e:
+            log.error('reply_callback_failed', error=str(e))
+
+    def handle_failure(self, reply, exception):
+        now = self.clock()
+        delay = parse_ratelimit_delay(exception)
+        with self.condition:
+            if delay is not None:
+                # The limit is for the whole account, hold every reply
+                self.stats['rate_limited'] += 1
+                delay += self.rate_limit_margin
+                RATE_LIMITED.inc()
+                RATE_LIMIT_WAIT_SECONDS.inc(max(0.0, now + delay - max(self.blocked_until, now)))
+                self.blocked_until = max(self.blocked_until, now + delay)
+                self.bucket.drain(now)
+            else:
+                delay = self.retry_delay * (2 ** (reply.attempts - 1))
+
+            dropped = reply.attempts > self.max_retries
+            if dropped:
+                self.stats['dropped'] += 1
+            else:
+                self.stats['retried'] += 1
+
+        if dropped:
+            log.error('reply_dropped', attempts=reply.attempts, error=str(exception))
+            self.drop(reply)
+            return
+        log.warning('reply_retry', attempts=reply.attempts, delay=round(delay, 1), error=str(exception))
+        self.schedule(reply, now + delay)
+
+    def sync_limits(self):
+        ''' Update the bucket from the budget reddit reported on the last request '''
+        if self.limits_provider is None:
+            return
+        try:
+            limits = self.limits_provider()
+        except Exception:
+            return
+        if not limits:
+            return
+
+        remaining = limits.get('remaining')
+        reset_timestamp = limits.get('reset_timestamp')
+        seconds_until_reset = None
+        if reset_timestamp is not None:
+            seconds_until_reset = reset_timestamp - time.time()
+        with self.condition:
+            self.bucket.sync(remaining, seconds_until_reset, self.clock())
@@ -0,0 +1,219 @@
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from projectbot.Constants import Const, Asset
+
+class BloomFilter:
+    '''
+        Probabilistic set of keys, a miss means the key was never added
+
+        Used in front of the index so most lookups never reach the lru or sqlite
+    '''
+    def __init__(self, capacity, error_rate):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def positions(self, key):
+        # Double hashing, two 64 bit halves of one digest give all positions
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        for position in self.positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class ResponseIndex:
+    '''
+        Persistent index of the fullnames of the posts/comments the bot replied to
+
+        Lookups go through a bloom filter, then an in-memory lru and only then sqlite,
+        so checking for an existing response never needs a request to reddit
+
+        When shared by several processes, rows added by the others are not in this
+        process' bloom filter, so misses always go to sqlite and claim() decides
+        which process replies. A claim whose reply was never sent is released, and
+        claims older than claim_max_age are removed when the index is opened
+    '''
+    def __init__(self, path=Asset.file_response_index,
+                lru_size=Const.RESPONSE_INDEX_LRU_SIZE,
+                bloom_capacity=Const.RESPONSE_INDEX_BLOOM_CAPACITY,
+                bloom_error_rate=Const.RESPONSE_INDEX_BLOOM_ERROR_RATE,
+                shared=False, claim_max_age=Const.RESPONSE_INDEX_CLAIM_MAX_AGE):
+        self.path = path
+        self.shared = shared
+        self.claim_max_age = claim_max_age
+        self.lru_size = lru_size
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+
+        self.lock = threading.Lock()
+        self.connection = None
+        self.bloom = None
+        self.lru = OrderedDict()
+
+    def open(self):
+        ''' Open the sqlite file, remove the old claims and load every known fullname into the bloom filter '''
+        with self.lock:
+            if self.connection is not None:
+                return
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=Const.RESPONSE_INDEX_BUSY_TIMEOUT)
+            if self.shared:
+                # Readers and the writer of other processes do not block each other
+                self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS responded (parent TEXT PRIMARY KEY, replied_at REAL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS claimed (parent TEXT PRIMARY KEY, claimed_at REAL)')
+            # The items of these claims are too old to be seen again
+            self.connection.execute('DELETE FROM claimed WHERE claimed_at < ?', (time.time() - self.claim_max_age,))
+            self.connection.commit()
+
+            count = self.connection.execute('SELECT COUNT(*) FROM responded').fetchone()[0]
+            self.bloom = BloomFilter(max(self.bloom_capacity, count * 2), self.bloom_error_rate)
+            for (parent,) in self.connection.execute('SELECT parent FROM responded'):
+                self.bloom.add(parent)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __len__(self):
+        self.open()
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM responded').fetchone()[0]
+
+    def remember(self, fullname, responded):
+        ''' Put a lookup result in the lru, must hold the lock '''
+        self.lru[fullname] = responded
+        self.lru.move_to_end(fullname)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def contains(self, fullname):
+        '''
+            Check if the bot already replied to the given post/comment
+
+            Parameters:
+                fullname (string): The reddit fullname of the parent (t1_..., t3_...)
+
+            Returns:
+                responded (boolean): The bot already replied to it
+        '''
+        self.open()
+        if not self.shared and fullname not in self.bloom:
+            return False
+
+        with self.lock:
+            responded = self.lru.get(fullname)
+            # Another process may have replied since a miss was cached
+            if responded is not None and (responded or not self.shared):
+                self.lru.move_to_end(fullname)
+                return responded
+
+            row = self.connection.execute('SELECT 1 FROM responded WHERE parent = ?', (fullname,)).fetchone()
+            responded = row is not None
+            self.remember(fullname, responded)
+            return responded
+
+    def add(self, fullname, replied_at=None):
+        ''' Record a reply to the given post/comment '''
+        self.add_many([(fullname, replied_at)])
+
+    def add_many(self, entries):
+        '''
+            Record many replies in one transaction
+
+            Parameters:
+                entries (list<(string, float)>): The parent fullname and time of each reply
+        '''
+        self.open()
+        rows = [(fullname, replied_at if replied_at is not None else time.time()) for fullname, replied_at in entries]
+        with self.lock:
+            self.connection.executemany('INSERT OR IGNORE INTO responded (parent, replied_at) VALUES (?, ?)', rows)
+            self.connection.commit()
+            for fullname, _ in rows:
+                self.bloom.add(fullname)
+                self.remember(fullname, True)
+
+    def claim(self, fullname):
+        '''
+            Take the reply to the given post/comment, only the first process to claim it gets it
+
+            Returns:
+                claimed (boolean): This process should reply
+        '''
+        self.open()
+        with self.lock:
+            cursor = self.connection.execute('INSERT OR IGNORE INTO claimed (parent, claimed_at) VALUES (?, ?)', (fullname, time.time()))
+            self.connection.commit()
+            return cursor.rowcount == 1
+
+    def release(self, fullname):
+        ''' Give up the claim on a post/comment which was not replied to, so another process can take it '''
+        self.open()
+        with self.lock:
+            self.connection.execute('DELETE FROM claimed WHERE parent = ?', (fullname,))
+            self.connection.commit()
+
+    def get_meta(self, key, default=None):
+        self.open()
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        self.open()
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+            self.connection.commit()
+
+    def seed_from_history(self, comments, batch_size=Const.RESPONSE_INDEX_SEED_BATCH):
+        '''
+            Fill the index from the bot's own comment history
+
+            The history is read newest first and stops at the newest comment seen by
+            the last seed, so a restart only reads what was posted since
+
+            Parameters:
+                comments (iterable<Comment>): The bot's comments, newest first
+
+            Returns:
+                count (int): The number of replies added
+        '''
+        seeded_until = self.get_meta('seeded_until', 0.0)
+        newest = seeded_until
+
+        count = 0
+        batch = []
+        for comment in comments:
+            created = comment.created_utc
+            if created <= seeded_until:
+                break
+            newest = max(newest, created)
+            batch.append((comment.parent_id, created))
+            if len(batch) >= batch_size:
+                self.add_many(batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            self.add_many(batch)
+            count += len(batch)
+
+        self.set_meta('seeded_until', newest)
+        return count
@@ -0,0 +1,133 @@
+import random
+import threading
+from array import array
+from collections import OrderedDict, deque
+from projectbot.Constants import Const
+
+class AliasTable:
+    '''
+        Walker/Vose alias table for O(1) weighted sampling
+
+        Built once in O(n), every draw after is one random index and one coin flip
+    '''
+    __slots__ = ('size', 'probability', 'alias')
+
+    def __init__(self, weights):
+        size = len(weights)
+        self.size = size
+        self.probability = array('d', [1.0] * size)
+        self.alias = array('I', range(size))
+        if size == 0:
+            return
+
+        total = float(sum(weights))
+        if total <= 0:
+            # Nothing to weigh by, every entry is equally likely
+            return
+
+        scaled = [weight * size / total for weight in weights]
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # Whatever is left is 1.0 apart from rounding
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def sample(self, rng=random.random):
+        ''' Draw an index with the probability of its weight '''
+        column = int(rng() * self.size)
+        if rng() < self.probability[column]:
+            return column
+        return self.alias[column]
+
+class IdeaSampler:
+    '''
+        Weighted random choice of ideas per difficulty
+
+        Parameters:
+            ideas (IdeaStore): The ideas of each difficulty
+            weights (dict<string, float>): Optional weight of each idea by name, 1.0 when missing
+    '''
+    def __init__(self, ideas, weights=None):
+        self.ideas = ideas
+        weights = weights or {}
+        self.tables = {}
+        for difficulty, bucket in ideas.items():
+            self.tables[difficulty] = AliasTable([max(0.0, float(weights.get(idea.name, 1.0))) for idea in bucket])
+
+    def sample(self, difficulty='all', exclude=None, rng=random.random, attempts=Const.SAMPLER_MAX_ATTEMPTS):
+        '''
+            Get a weighted random idea
+
+            Parameters:
+                difficulty (string): The difficulty of the idea
+                exclude (set<string>): Names of ideas to avoid if possible
+                attempts (int): Draws to try before accepting an excluded idea
+
+            Returns:
+                idea (Idea): A random idea, None if there are no ideas of the difficulty
+        '''
+        bucket = self.ideas.get(difficulty)
+        if not bucket:
+            return None
+
+        table = self.tables[difficulty]
+        idea = bucket[table.sample(rng)]
+        if not exclude:
+            return idea
+
+        for _ in range(attempts - 1):
+            if idea.name not in exclude:
+                break
+            idea = bucket[table.sample(rng)]
+        return idea
+
+class RecentIdeas:
+    '''
+        Bounded lru of the ideas recently served to each thread or user
+
+        Parameters:
+            max_keys (int): Number of threads/users remembered
+            window (int): Number of ideas remembered for each of them
+    '''
+    def __init__(self, max_keys=Const.SAMPLER_MAX_KEYS, window=Const.SAMPLER_NO_REPEAT_WINDOW):
+        self.max_keys = max_keys
+        self.window = window
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_excluded(self, keys):
+        ''' Get the names of the ideas recently served to any of the keys '''
+        excluded = set()
+        with self.lock:
+            for key in keys:
+                served = self.recent.get(key)
+                if served is not None:
+                    self.recent.move_to_end(key)
+                    excluded.update(served)
+        return excluded
+
+    def record(self, keys, name):
+        ''' Remember the idea was served to each of the keys '''
+        with self.lock:
+            for key in keys:
+                served = self.recent.get(key)
+                if served is None:
+                    served = deque(maxlen=self.window)
+                    self.recent[key] = served
+                    if len(self.recent) > self.max_keys:
+                        self.recent.popitem(last=False)
+                else:
+                    self.recent.move_to_end(key)
+                served.append(name)
@@ -0,0 +1,205 @@
+import time
+import bisect
+import hashlib
+import threading
+from projectbot.Constants import Const
+from projectbot.Logger import log
+
+def hash_key(key):
+    ''' Get a stable 64 bit position on the ring, the same in every process and run '''
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    '''
+        Consistent hashing of keys (subreddits) to nodes (workers)
+
+        Each node is placed on the ring many times, a key belongs to the first node
+        after it. Adding or removing a node only moves the keys next to its points,
+        every other key stays with its node.
+    '''
+    def __init__(self, nodes=(), replicas=Const.SHARD_VIRTUAL_NODES):
+        self.replicas = replicas
+        self.points = []
+        self.owners = []
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = hash_key(f'{node}#{replica}')
+            index = bisect.bisect(self.points, point)
+            self.points.insert(index, point)
+            self.owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self.points, self.owners) if owner != node]
+        self.points = [point for point, _ in kept]
+        self.owners = [owner for _, owner in kept]
+
+    def get_node(self, key):
+        ''' Get the node a key belongs to, None when the ring is empty '''
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, hash_key(key.lower())) % len(self.points)
+        return self.owners[index]
+
+    def partition(self, keys):
+        ''' Get the keys of every node, nodes without keys get an empty list '''
+        assignments = {node: [] for node in self.nodes}
+        for key in keys:
+            node = self.get_node(key)
+            if node is not None:
+                assignments[node].append(key)
+        return assignments
+
+class ShardSupervisor:
+    '''
+        Runs worker processes which each scan their share of the subreddits
+
+        The subreddits are split across the workers with a HashRing. When a worker
+        dies it leaves the ring and only its subreddits move to the others, then
+        it is started again after restart_delay and takes them back. A worker whose
+        share changes is restarted with the new share. Workers are stopped with
+        SIGTERM so they can send the replies they queued, and only killed when
+        still running after stop_timeout.
+
+        Parameters:
+            keys (list<string>): The subreddits to split
+            workers (int): Number of worker processes
+            target (function): Worker entry, called as target(worker_id, keys, *args) in the new process
+            args (tuple): Extra arguments, e.g. shared state, passed to every worker
+    '''
+    def __init__(self, keys, workers, target, args=(), context=None,
+                check_interval=Const.SHARD_CHECK_INTERVAL, restart_delay=Const.SHARD_RESTART_DELAY,
+                stop_timeout=Const.SHARD_STOP_TIMEOUT):
+        self.keys = list(keys)
+        self.worker_ids = [f'worker-{index}' for index in range(max(1, workers))]
+        self.target = target
+        self.args = tuple(args)
+        if context is None:
+            import multiprocessing
+            context = multiprocessing.get_context('spawn')
+        self.context = context
+        self.check_interval = check_interval
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+
+        self.ring = HashRing()
+        self.processes = {}
+        self.assignments = {}
+        self.restart_at = {}
+        self.stop_event = threading.Event()
+        self.stats = {
+            'started': 0,
+            'died': 0,
+            'rebalances': 0,
+        }
+
+    def start(self):
+        ''' Put every worker on the ring and start them '''
+        for worker_id in self.worker_ids:
+            self.ring.add(worker_id)
+        self.rebalance()
+
+    def run(self):
+        ''' Blocking loop watching the workers until stop() '''
+        self.start()
+        try:
+            while not self.stop_event.wait(self.check_interval):
+                self.check()
+        finally:
+            self.stop_workers()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def start_worker(self, worker_id, keys):
+        process = self.context.Process(target=self.target, args=(worker_id, keys) + self.args,
+                                    name=f'Shard {worker_id}', daemon=True)
+        process.start()
+        self.processes[worker_id] = process
+        self.stats['started'] += 1
+        log.info('shard_worker_started', worker=worker_id, pid=process.pid, subreddits=len(keys))
+
+    def stop_worker(self, worker_id):
+        self.stop_workers([worker_id])
+
+    def stop_workers(self, worker_ids=None):
+        '''
+            Stop workers together, waiting for them to send their queued replies
+
+            Parameters:
+                worker_ids (list<string>): The workers to stop, every worker when None
+        '''
+        worker_ids = list(self.processes) if worker_ids is None else worker_ids
+        stopping = [(worker_id, self.processes.pop(worker_id)) for worker_id in worker_ids if worker_id in self.processes]
+        for worker_id, process in stopping:
+            if process.is_alive():
+                # SIGTERM, the worker stops scanning and drains its reply scheduler
+                process.terminate()
+
+        deadline = time.monotonic() + self.stop_timeout
+        for worker_id, process in stopping:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                log.error('shard_worker_killed', worker=worker_id, pid=process.pid)
+                process.kill()
+                process.join()
+
+    def rebalance(self):
+        ''' Split the subreddits over the workers on the ring, restarting the workers whose share changed '''
+        self.stats['rebalances'] += 1
+        assignments = self.ring.partition(self.keys)
+        changed = []
+        for worker_id in self.worker_ids:
+            keys = assignments.get(worker_id)
+            if keys is None:
+                # Off the ring, waiting to be restarted
+                self.assignments.pop(worker_id, None)
+                continue
+            if keys == self.assignments.get(worker_id) and worker_id in self.processes:
+                continue
+            changed.append((worker_id, keys))
+
+        # Stopped together so their drains overlap
+        self.stop_workers([worker_id for worker_id, _ in changed])
+        for worker_id, keys in changed:
+            self.assignments[worker_id] = keys
+            if keys:
+                self.start_worker(worker_id, keys)
+
+    def check(self, now=None):
+        '''
+            Take dead workers off the ring and put restarted ones back
+
+            Returns:
+                changed (boolean): The subreddits were split again
+        '''
+        now = time.monotonic() if now is None else now
+        changed = False
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            self.stats['died'] += 1
+            log.error('shard_worker_died', worker=worker_id, exitcode=process.exitcode)
+            self.processes.pop(worker_id, None)
+            self.ring.remove(worker_id)
+            self.restart_at[worker_id] = now + self.restart_delay
+            changed = True
+
+        for worker_id, restart_at in list(self.restart_at.items()):
+            if restart_at <= now:
+                del self.restart_at[worker_id]
+                self.ring.add(worker_id)
+                changed = True
+
+        if changed:
+            self.rebalance()
+        return changed
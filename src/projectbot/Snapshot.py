@@ -0,0 +1,143 @@
+import os
+import time
+import struct
+import marshal
+import hashlib
+import tempfile
+
+SNAPSHOT_MAGIC = b'BPBS'
+SNAPSHOT_FORMAT_VERSION = 1
+
+# magic, format version, content hash (sha256), created at, payload length
+SNAPSHOT_HEADER = struct.Struct('<4sH32sdQ')
+
+class SnapshotError(Exception):
+    pass
+
+class CorpusSnapshot:
+    ''' The corpus as read from a snapshot file '''
+    def __init__(self, ideas, difficulty_index, suggestions, rejections, content_hash, created_at):
+        self.ideas = ideas
+        self.difficulty_index = difficulty_index
+        self.suggestions = suggestions
+        self.rejections = rejections
+        self.content_hash = content_hash
+        self.created_at = created_at
+
+    def get_hash_text(self):
+        return self.content_hash.hex()
+
+def normalize_idea(idea):
+    '''
+        Clean a raw [name, difficulty, description] row
+
+        Returns:
+            idea (tuple): The name, lowercase difficulty and description
+    '''
+    if len(idea) != 3:
+        raise SnapshotError(f'Improperly formatted idea: {idea}')
+    name, difficulty, description = idea
+    return (name.strip(), difficulty.replace('"', '').strip().lower(), description.strip())
+
+def create_difficulty_index(ideas):
+    ''' Map each difficulty to the positions of its ideas '''
+    index = {}
+    for position, idea in enumerate(ideas):
+        index.setdefault(idea[1], []).append(position)
+    return index
+
+def compute_corpus_hash(ideas, suggestions, rejections):
+    '''
+        Hash the content of a corpus, independent of the snapshot format
+
+        Parameters:
+            ideas (list<tuple>): The normalized ideas
+            suggestions (list<string>): The suggestion words
+            rejections (list<string>): The rejection words
+
+        Returns:
+            digest (bytes): The sha256 digest of the content
+    '''
+    digest = hashlib.sha256()
+    for idea in ideas:
+        digest.update('\x1f'.join(idea).encode('utf-8'))
+        digest.update(b'\x1e')
+    digest.update(b'\x1d')
+    digest.update('\x1e'.join(suggestions).encode('utf-8'))
+    digest.update(b'\x1d')
+    digest.update('\x1e'.join(rejections).encode('utf-8'))
+    return digest.digest()
+
+def create_snapshot(ideas, suggestions, rejections):
+    '''
+        Build a snapshot from a raw corpus
+
+        Parameters:
+            ideas (list<list>): The ideas as [name, difficulty, description]
+            suggestions (list<string>): The suggestion words
+            rejections (list<string>): The rejection words
+
+        Returns:
+            snapshot (CorpusSnapshot): The normalized corpus with its indexes and hash
+    '''
+    ideas = [normalize_idea(idea) for idea in ideas]
+    suggestions = list(suggestions)
+    rejections = list(rejections)
+
+    content_hash = compute_corpus_hash(ideas, suggestions, rejections)
+    return CorpusSnapshot(ideas, create_difficulty_index(ideas), suggestions, rejections, content_hash, time.time())
+
+def serialize_snapshot(snapshot):
+    ''' Get the bytes of the snapshot file '''
+    payload = marshal.dumps((snapshot.ideas, snapshot.difficulty_index, snapshot.suggestions, snapshot.rejections))
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, snapshot.content_hash, snapshot.created_at, len(payload))
+    return header + payload
+
+def write_snapshot(path, snapshot):
+    ''' Write the snapshot to a file, replacing any old one atomically '''
+    data = serialize_snapshot(snapshot)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def read_snapshot(path, verify=False):
+    '''
+        Read a snapshot file
+
+        Parameters:
+            path (string): Path of the snapshot
+            verify (boolean): Recompute the content hash to check the file is not corrupt
+
+        Returns:
+            snapshot (CorpusSnapshot): The corpus stored in the file
+    '''
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise SnapshotError('Snapshot is truncated')
+
+    magic, format_version, content_hash, created_at, length = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError('Not a corpus snapshot')
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f'Unsupported snapshot version {format_version}')
+    if len(data) - SNAPSHOT_HEADER.size != length:
+        raise SnapshotError('Snapshot is truncated')
+
+    ideas, difficulty_index, suggestions, rejections = marshal.loads(data[SNAPSHOT_HEADER.size:])
+    if verify and compute_corpus_hash(ideas, suggestions, rejections) != content_hash:
+        raise SnapshotError('Snapshot content does not match its hash')
+
+    return CorpusSnapshot(ideas, difficulty_index, suggestions, rejections, content_hash, created_at)
@@ -0,0 +1,77 @@
+import re
+
+DEFAULT_DIFFICULTY = 'all'
+DIFFICULTY_KEYWORDS = {
+    'easy': 'easy',
+    'medium': 'medium',
+    'hard': 'hard',
+    'all': 'all',
+}
+
+def normalize_phrase(phrase):
+    ''' Normalize a phrase the same way the comment body is read '''
+    return phrase.lower().replace('*', '').replace('_', ' ')
+
+def create_char_pattern(char):
+    ''' Get the pattern of a normalized character in a raw comment body, _ reads as a space '''
+    return '[ _]' if char == ' ' else re.escape(char)
+
+def create_phrase_pattern(phrase):
+    '''
+        Get the case insensitive pattern of a normalized phrase in a raw comment body,
+        where markdown * may be between any characters
+
+        The first character is a plain character set rather than case insensitive,
+        so the regex engine can skip ahead to where a phrase may start
+    '''
+    first = phrase[0]
+    if first.lower() != first.upper():
+        start = f'[{re.escape(first.lower())}{re.escape(first.upper())}]'
+    else:
+        start = create_char_pattern(first)
+    if len(phrase) == 1:
+        return start
+    rest = r'\**'.join(create_char_pattern(char) for char in phrase[1:])
+    return f'{start}\\**(?i:{rest})'
+
+class TriggerScanner:
+    '''
+        Scanner for the phrases which call the bot
+
+        All trigger phrases are compiled into one case insensitive regular expression,
+        longest first so a phrase is never cut short by another one it starts with.
+        The markdown the body is normalized for is part of the pattern, so one search
+        of the raw body finds the trigger and the word which follows it
+    '''
+    def __init__(self, triggers, difficulties=DIFFICULTY_KEYWORDS):
+        self.triggers = []
+        for trigger in triggers:
+            phrase = normalize_phrase(trigger)
+            if phrase != '' and phrase not in self.triggers:
+                self.triggers.append(phrase)
+        self.difficulties = {normalize_phrase(keyword): difficulty for keyword, difficulty in difficulties.items()}
+
+        alternation = '|'.join(create_phrase_pattern(phrase) for phrase in sorted(self.triggers, key=len, reverse=True))
+        self.pattern = re.compile(f'(?:{alternation})[\\s_*]*([^\\s_]*)') if self.triggers else None
+
+    def scan(self, content):
+        '''
+            Scan a comment for a trigger phrase and the difficulty which follows it
+
+            Parameters:
+                content (string): The body of the comment
+
+            Returns:
+                asking_for_help (boolean): The content is asking for a project
+                difficulty (string): The difficulty requested
+        '''
+        if self.pattern is None:
+            return False, ''
+
+        match = self.pattern.search(content)
+        if match is None:
+            return False, ''
+        word = match.group(1)
+        if word == '':
+            return True, DEFAULT_DIFFICULTY
+        return True, self.difficulties.get(normalize_phrase(word), DEFAULT_DIFFICULTY)
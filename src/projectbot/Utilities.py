@@ -1,12 +1,117 @@
 import os
 import sys
 import time
-import configparser
-from projectbot.Constants import Asset, Error
+import threading
+from collections import OrderedDict
+from projectbot.Constants import Asset, Error, Const
+
+DEFAULT_TEMPLATE = 'default'
+
+class ResponseTemplate:
+    '''
+        The text of the bot's responses
+
+        Parameters:
+            idea_text (string): Idea response, with {name}, {difficulty} and {description} fields
+            basic_text (string): Basic response, with a {links} field
+            links (list<(string, string)>): The text and URL of each link in the basic response
+            difficulty_words (dict<string, string>): Word used in the idea response for each difficulty
+            default_difficulty_word (string): Word used for any other difficulty
+    '''
+    def __init__(self, idea_text, basic_text, links, difficulty_words, default_difficulty_word):
+        self.idea_text = idea_text
+        self.basic_text = basic_text
+        self.links = links
+        self.difficulty_words = difficulty_words
+        self.default_difficulty_word = default_difficulty_word
+
+class CompiledTemplate:
+    ''' A template with its static parts, including the bot reference, rendered once '''
+    __slots__ = ('idea_format', 'basic_response', 'difficulty_words', 'default_difficulty_word')
+
+    def __init__(self, template, links_text, reference_text):
+        # The reference is static text, escape it so only the idea fields are formatted
+        escaped_reference_text = reference_text.replace('{', '{{').replace('}', '}}')
+        self.idea_format = template.idea_text + escaped_reference_text
+        self.basic_response = template.basic_text.format(links=links_text) + reference_text
+        self.difficulty_words = dict(template.difficulty_words)
+        self.default_difficulty_word = template.default_difficulty_word
+
+    def render_idea(self, idea):
+        difficulty = self.difficulty_words.get(idea.difficulty, self.default_difficulty_word)
+        return self.idea_format.format(name=idea.name, difficulty=difficulty, description=idea.description)
+
+def create_default_template():
+    ''' The original english responses of the bot '''
+    return ResponseTemplate(
+        idea_text=(
+            'Hey, I think you are trying to figure out a project to do; how about this one?\n\n'
+            'Project: **{name}** \n\n'
+            'I think its a _{difficulty}_ project for you! Try it out but, dont get discouraged. If you need more guidance, here\'s a description:\n'
+            '>{description}\n\n\n'
+        ),
+        basic_text=(
+            'Hey, I think you are trying to figure out a project to do; Here are some helpful resources:\n\n'
+            '{links}'
+            '\n'
+        ),
+        links=[
+            ('/r/learnpython - Wiki', 'https://www.reddit.com/r/learnpython/wiki/index#wiki_flex_your_coding_skill.21'),
+            ('Five mini projects', 'https://knightlab.northwestern.edu/2014/06/05/five-mini-programming-projects-for-the-python-beginner/'),
+            ('Automate the Boring Stuff with Python', 'https://automatetheboringstuff.com/'),
+            ('RealPython - Projects', 'https://realpython.com/tutorials/projects/'),
+        ],
+        difficulty_words={
+            'easy': 'nice',
+            'medium': 'cool',
+            'hard': 'challenging',
+        },
+        default_difficulty_word='fasinating')
 
 class ResponseFormatter:
-    def __init__(self, repo_url):
+    '''
+        Renders the bot's responses
+
+        Templates are compiled once when registered. Rendered idea responses are kept
+        in a bounded cache, which must be cleared with invalidate() when the corpus reloads
+    '''
+    def __init__(self, repo_url, cache_size=Const.RESPONSE_CACHE_SIZE):
         self.repo_url = repo_url
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.templates = {}
+        self.subreddit_templates = {}
+        self.register_template(DEFAULT_TEMPLATE, create_default_template())
+
+    def register_template(self, name, template, subreddits=()):
+        '''
+            Add a template, optionally used for the given subreddits
+
+            Parameters:
+                name (string): Name of the template, e.g. a language
+                template (ResponseTemplate): The text of the responses
+                subreddits (list<string>): Subreddits which use this template
+        '''
+        links_text = ''.join(self.create_link_reference(text, url) for text, url in template.links)
+        compiled = CompiledTemplate(template, links_text, self.get_bot_reference_text())
+        with self.lock:
+            self.templates[name] = compiled
+            for subreddit in subreddits:
+                self.subreddit_templates[subreddit.lower()] = name
+            self.cache.clear()
+
+    def get_template_name(self, subreddit=None):
+        ''' Get the name of the template used for a subreddit '''
+        if subreddit is None:
+            return DEFAULT_TEMPLATE
+        return self.subreddit_templates.get(str(subreddit).lower(), DEFAULT_TEMPLATE)
+
+    def invalidate(self, *args):
+        ''' Forget every rendered response, used when the corpus reloads '''
+        with self.lock:
+            self.cache.clear()
 
     def get_bot_reference_text(self):
         ''' Format the text response for bot disclaimer '''
@@ -32,45 +137,28 @@ class ResponseFormatter:
 
         return f'- [{text}]({url})\n'
 
-    def format_idea_response(self, idea):
+    def format_idea_response(self, idea, subreddit=None):
         ''' Return the formatted text to post to reddit based on a given idea '''
 
-        raw_project_name = idea[0]
-        raw_difficulty = idea[1]
-        raw_description = idea[2]
-
-        # Replace the text for the difficulty for diffent output
-        if raw_difficulty == 'easy':
-            difficulty = 'nice'
-        elif raw_difficulty == 'medium':
-            difficulty = 'cool'
-        elif raw_difficulty == 'hard':
-            difficulty = 'challenging'
-        else:
-            difficulty = 'fasinating'
-
-        response = ''
-        response += f'Hey, I think you are trying to figure out a project to do; how about this one?\n\n'
-        response += f'Project: **{raw_project_name}** \n\n'
-        response += f'I think it''s a _' + difficulty + '_ project for you! Try it out but, dont get discouraged. If you need more guidance, here\'s a description:\n'
-        response += f'>{raw_description}\n\n\n'
-        response += self.get_bot_reference_text()
-
+        name = self.get_template_name(subreddit)
+        key = (name, idea)
+        with self.lock:
+            response = self.cache.get(key)
+            if response is not None:
+                self.cache.move_to_end(key)
+                return response
+            template = self.templates[name]
+
+        response = template.render_idea(idea)
+        with self.lock:
+            self.cache[key] = response
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
         return response
 
-    def format_basic_response(self):
+    def format_basic_response(self, subreddit=None):
         ''' Return the formatted text to post to reddit to direct a user to some project resources '''
-
-        response = ''
-        response += f'Hey, I think you are trying to figure out a project to do; Here are some helpful resources:\n\n'
-        response += self.create_link_reference('/r/learnpython - Wiki', 'https://www.reddit.com/r/learnpython/wiki/index#wiki_flex_your_coding_skill.21')
-        response += self.create_link_reference('Five mini projects', 'https://knightlab.northwestern.edu/2014/06/05/five-mini-programming-projects-for-the-python-beginner/')
-        response += self.create_link_reference('Automate the Boring Stuff with Python', 'https://automatetheboringstuff.com/')
-        response += self.create_link_reference('RealPython - Projects', 'https://realpython.com/tutorials/projects/')
-        response += '\n'
-        response += self.get_bot_reference_text()
-
-        return response
+        return self.templates[self.get_template_name(subreddit)].basic_response
 
 
 def output_stats(title, count, total, ratio, error_msg):
@@ -92,8 +180,17 @@ def get_help():
     output += f'        run: Run the default application of the bot\n'
     output += f'        test: Test a specific phrase to determine how the bot interprets it. It does not run the main application\n'
     output += f'            phrase: Add this following the test action\n'
+    output += f'            --file <path>: Test a file of titles (or - for stdin) with optional labels, see test --help\n'
     output += f'        sim: Set the bot to simulation mode where it does not post to reddit\n'
     output += f'            confirm: Add this following the test action\n'
+    output += f'        capture: Record every post and comment the bot sees to compressed files, in simulation mode\n'
+    output += f'            live: Add this following the capture action to also post to reddit\n'
+    output += f'        shard: Split the subreddits over worker processes which share the dedup index and reply budget\n'
+    output += f'            workers: Optionally add the number of worker processes following the shard action\n'
+    output += f'        backfill: Page back through the subreddits and record a decision for every post and comment, see backfill --help\n'
+    output += f'            --reply: Also reply to recent accepted items the bot has not responded to\n'
+    output += f'        replay: Run a capture through the bot against a fake reddit and report throughput and decision changes\n'
+    output += f'            file: The capture file or folder, optionally followed by the speed as a multiple of real time\n'
     output += f'        help: Show help/usage output\n'
 
     return output
@@ -117,13 +214,9 @@ def check_file_exists(path, error_msg):
         return True
 
 
-def create_user_agent():
-    ''' Create the user agent string '''
-
-    temp_config = configparser.ConfigParser()
-    temp_config.read(Asset.file_praw_ini)
+def create_user_agent(c):
+    ''' Create the user agent string from the config '''
 
-    c = temp_config['DEFAULT']
     username = c['username']
     version = c['version']
     author = c['author']
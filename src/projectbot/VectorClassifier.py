@@ -0,0 +1,167 @@
+import itertools
+from projectbot.Classifier import TITLE_TRANSLATION
+from projectbot.Constants import Const
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Put between titles so the words of a whole batch are split at once, never a word itself
+TITLE_SEPARATOR = '\x00'
+# Bits of a matrix entry key holding the word id, the title is above them
+WORD_ID_BITS = 32
+
+def is_available():
+    ''' Determine if NumPy is installed for the vectorized classifier '''
+    return numpy is not None
+
+class TitleScores:
+    ''' The stats of a batch of titles, one array entry per title '''
+    __slots__ = ('ratios', 'counts', 'totals', 'rejected', 'accepted')
+
+    def __init__(self, ratios, counts, totals, rejected, accepted):
+        self.ratios = ratios
+        self.counts = counts
+        self.totals = totals
+        self.rejected = rejected
+        self.accepted = accepted
+
+    def __len__(self):
+        return len(self.accepted)
+
+class VectorizedClassifier:
+    '''
+        Decides if post titles are asking for a project idea, a whole batch at a time
+
+        The words of a batch are split once and given ids, then the (title, word)
+        pairs of the batch form a sparse document-term matrix in row order. The
+        unique words, suggestion words and rejection hits of every title are sums
+        over that matrix, so the decisions are the same as TitleClassifier for the
+        same words. Needs NumPy, see is_available().
+    '''
+    def __init__(self, suggestion_words, rejection_words, min_words=Const.MIN_NUM_WORDS_IN_TITLE,
+                acceptable_ratio=Const.ACCEPTABLE_RATIO, batch_size=Const.VECTOR_BATCH_SIZE):
+        if numpy is None:
+            raise ImportError('The vectorized classifier needs numpy')
+        self.suggestion_words = frozenset(word.lower() for word in suggestion_words)
+        self.rejection_words = frozenset(word.lower() for word in rejection_words)
+        self.min_words = min_words
+        self.acceptable_ratio = acceptable_ratio
+        self.batch_size = max(1, batch_size)
+
+        # The separator and the words of both lists get the first ids, every other word
+        # of a batch gets a new id past them which all share the last flag
+        known = [TITLE_SEPARATOR] + sorted(self.suggestion_words | self.rejection_words)
+        self.known_ids = {word: index for index, word in enumerate(known)}
+        self.is_suggestion = numpy.array([word in self.suggestion_words for word in known] + [False])
+        self.is_rejection = numpy.array([word in self.rejection_words for word in known] + [False])
+
+    @classmethod
+    def from_classifier(cls, classifier, batch_size=Const.VECTOR_BATCH_SIZE):
+        ''' Create one with the same words and criteria as a TitleClassifier '''
+        return cls(classifier.suggestion_words, classifier.rejection_words,
+                classifier.min_words, classifier.acceptable_ratio, batch_size)
+
+    def get_document_terms(self, titles):
+        '''
+            Get the sparse document-term matrix of a batch, one entry per unique word of a title
+
+            Returns:
+                rows (ndarray<int>): The title of each entry, sorted
+                terms (ndarray<int>): The word id of each entry
+        '''
+        text = f' {TITLE_SEPARATOR} '.join(titles).lower().translate(TITLE_TRANSLATION)
+        tokens = text.split()
+
+        # setdefault keeps the id of a word's first token, the lookups all run in C
+        word_ids = self.known_ids.copy()
+        ids = numpy.fromiter(map(word_ids.setdefault, tokens, itertools.count(len(self.known_ids))),
+                            dtype=numpy.int64, count=len(tokens))
+
+        # The title of each word is the number of separators before it
+        is_separator = ids == 0
+        rows = numpy.cumsum(is_separator)
+        keep = ~is_separator
+
+        # A word counts once per title, like the set of words the scalar path uses
+        keys = (rows[keep] << WORD_ID_BITS) | ids[keep]
+        keys.sort()
+        first = numpy.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        keys = keys[first]
+        return keys >> WORD_ID_BITS, keys & ((1 << WORD_ID_BITS) - 1)
+
+    def score_batch(self, titles):
+        count = len(titles)
+        rows, terms = self.get_document_terms(titles)
+
+        # Words outside both lists share the last flag
+        terms = numpy.minimum(terms, len(self.known_ids))
+        totals = numpy.bincount(rows, minlength=count)
+        counts = numpy.bincount(rows, weights=self.is_suggestion[terms], minlength=count).astype(numpy.int64)
+        rejected = numpy.bincount(rows, weights=self.is_rejection[terms], minlength=count) > 0
+
+        ratios = numpy.zeros(count, dtype=numpy.float64)
+        numpy.divide(counts, totals, out=ratios, where=totals > 0)
+        accepted = (totals >= self.min_words) & ~rejected & (ratios >= self.acceptable_ratio)
+        return TitleScores(ratios, counts, totals, rejected, accepted)
+
+    def score_many(self, titles):
+        '''
+            Score a batch of titles
+
+            Parameters:
+                titles (iterable<string>): The titles to score
+
+            Returns:
+                scores (TitleScores): Ratio, suggestion word count, unique word count, rejection hit and decision of each title
+        '''
+        titles = [title.replace(TITLE_SEPARATOR, ' ') for title in titles]
+        if len(titles) <= self.batch_size:
+            return self.score_batch(titles)
+
+        # Bounds the memory of the token arrays
+        batches = [self.score_batch(titles[i:i + self.batch_size]) for i in range(0, len(titles), self.batch_size)]
+        return TitleScores(*(numpy.concatenate([getattr(batch, field) for batch in batches]) for field in TitleScores.__slots__))
+
+    def classify_many(self, titles):
+        '''
+            Check a batch of titles
+
+            Parameters:
+                titles (iterable<string>): The titles to check
+
+            Returns:
+                decisions (list<boolean>): If each title is asking for a project
+        '''
+        return self.score_many(titles).accepted.tolist()
+
+    def explain_many(self, titles):
+        '''
+            Score a batch of titles and report how each was judged, with the errors of TitleClassifier.explain
+
+            Only the titles with a rejection word are split again, to name the words
+
+            Returns:
+                stats (list<tuple>): (ratio, count, total_words, error) of each title
+        '''
+        titles = list(titles)
+        scores = self.score_many(titles)
+        stats = []
+        for title, ratio, count, total_words, rejected in zip(titles, scores.ratios.tolist(), scores.counts.tolist(),
+                                                            scores.totals.tolist(), scores.rejected.tolist()):
+            errors = []
+            if total_words < self.min_words:
+                errors.append(f'Minimum number of words {self.min_words} not met with {total_words} words')
+            if rejected:
+                normalized = title.lower().translate(TITLE_TRANSLATION)
+                for word in dict.fromkeys(normalized.split()):
+                    if word in self.rejection_words:
+                        errors.append(f'Rejecting ({word}): {normalized}')
+            if ratio < self.acceptable_ratio:
+                errors.append('Minimum ratio is not met')
+            if len(errors) > 0:
+                errors.insert(0, f'{len(errors)} Errors')
+            stats.append((ratio, count, total_words, '\n'.join(errors)))
+        return stats
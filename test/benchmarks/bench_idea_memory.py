@@ -0,0 +1,61 @@
+# Idea memory benchmark
+#
+# Compares the memory used by the old idea lists with the IdeaStore for a synthetic corpus
+#
+# Usage: python3 bench_idea_memory.py <count>
+#   count: Number of ideas to create, defaults to 100000
+#
+
+import os
+import sys
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from projectbot.IdeaStore import IdeaStore
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+def create_rows(count):
+    ''' Create rows the way the csv reader does, with a new string for every field '''
+    rng = random.Random(count)
+    rows = []
+    for i in range(count):
+        difficulty = ''.join(list(rng.choice(DIFFICULTIES)))
+        rows.append([f'Project {i}', difficulty, f'Description of project number {i} ' * 3])
+    return rows
+
+def create_lists(rows):
+    ''' The idea structure used before the IdeaStore '''
+    ideas = {'all': [], 'easy': [], 'medium': [], 'hard': []}
+    for row in rows:
+        ideas['all'].append(row)
+        ideas[row[1]].append(row)
+    return ideas
+
+def measure(build, rows):
+    ''' Get the bytes allocated by the structure, the rows themselves included '''
+    copies = [list(row) for row in rows]
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    structure = build([[''.join(list(field)) for field in row] for row in copies])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return current - start, peak - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = create_rows(count)
+
+    results = [
+        ('lists', measure(create_lists, rows)),
+        ('IdeaStore', measure(IdeaStore, rows)),
+    ]
+
+    print(f'Ideas: {count}')
+    for name, (current, peak) in results:
+        print(f'{name:>10}: {current / 1024 / 1024:8.2f} MiB retained, {peak / 1024 / 1024:8.2f} MiB peak, {current / count:6.1f} bytes per idea')
+
+if __name__ == "__main__":
+    main()
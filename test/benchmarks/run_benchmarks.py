@@ -0,0 +1,356 @@
+# Benchmarks
+#
+# Runs every hot path of the bot offline against a synthetic corpus and synthetic
+# title/comment streams, then compares the throughput with the baselines in
+# baselines.json. Exits with 1 when a hot path is slower than its baseline by more
+# than the threshold.
+#
+# Throughput is compared as a ratio to a fixed pure Python workload measured in the
+# same run, so baselines recorded on one machine still hold on a faster or slower one.
+#
+# Usage: python3 run_benchmarks.py <options>
+#   --ideas N, --words N, --titles N, --comments N: Size of the synthetic data
+#   --only NAME: Only run the benchmarks starting with NAME
+#   --threshold RATIO: Allowed drop in relative throughput before failing, defaults to 0.5
+#   --update-baselines: Save the results as the new baselines
+#   --output FILE: Write the results as JSON
+#
+
+import os
+import sys
+import json
+import time
+import csv
+import shutil
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BENCHMARK_DIR, '..', '..', 'src')
+sys.path.insert(0, SOURCE_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic import SyntheticCorpus
+from projectbot.Corpus import Corpus
+from projectbot.Sampler import RecentIdeas
+from projectbot.Snapshot import create_snapshot, read_snapshot, write_snapshot
+from projectbot.TriggerScanner import TriggerScanner
+from projectbot.Utilities import ResponseFormatter
+from projectbot.Metrics import MetricsRegistry
+from projectbot.VectorClassifier import VectorizedClassifier, is_available as is_vectorized_available
+
+FILE_BASELINES = os.path.join(BENCHMARK_DIR, 'baselines.json')
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_SIZES = {
+    'ideas': 10000,
+    'words': 1000,
+    'titles': 20000,
+    'comments': 20000,
+}
+
+benchmarks = []
+
+def benchmark(name):
+    ''' Register a benchmark, the function returns the operation and the items to run it on '''
+    def register(setup):
+        benchmarks.append((name, setup))
+        return setup
+    return register
+
+class BenchmarkData:
+    ''' Everything the benchmarks share, built once '''
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.synthetic = SyntheticCorpus(sizes['ideas'], sizes['words'])
+        self.snapshot = create_snapshot(self.synthetic.ideas, self.synthetic.suggestions, self.synthetic.rejections)
+        self.corpus = Corpus(self.snapshot)
+        self.titles = self.synthetic.create_titles(sizes['titles'])
+        self.comments = self.synthetic.create_comments(sizes['comments'])
+        self.directory = tempfile.mkdtemp()
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+@benchmark('classifier.is_request')
+def bench_is_request(data):
+    return data.corpus.classifier.is_request, data.titles
+
+@benchmark('classifier.explain')
+def bench_explain(data):
+    return data.corpus.classifier.explain, data.titles
+
+@benchmark('classifier.classify_many')
+def bench_classify_many(data):
+    # One op is a batch of 1000 titles
+    batches = [data.titles[i:i + 1000] for i in range(0, len(data.titles), 1000)]
+    return data.corpus.classifier.classify_many, batches
+
+@benchmark('classifier.vectorized_classify_many')
+def bench_vectorized_classify_many(data):
+    # One op is a batch of 1000 titles, the same batches as classifier.classify_many
+    if not is_vectorized_available():
+        return None
+    classifier = VectorizedClassifier.from_classifier(data.corpus.classifier)
+    batches = [data.titles[i:i + 1000] for i in range(0, len(data.titles), 1000)]
+    return classifier.classify_many, batches
+
+@benchmark('classifier.vectorized_explain_many')
+def bench_vectorized_explain_many(data):
+    # Compare with classifier.explain, one op is a batch of 1000 titles
+    if not is_vectorized_available():
+        return None
+    classifier = VectorizedClassifier.from_classifier(data.corpus.classifier)
+    batches = [data.titles[i:i + 1000] for i in range(0, len(data.titles), 1000)]
+    return classifier.explain_many, batches
+
+@benchmark('trigger_scanner.scan')
+def bench_scan(data):
+    scanner = TriggerScanner(['u/BeginnerProjectBot', '!projectbot'])
+    return scanner.scan, data.comments
+
+@benchmark('sampler.sample')
+def bench_sample(data):
+    sampler = data.corpus.sampler
+    difficulties = ['all', 'easy', 'medium', 'hard']
+    items = [difficulties[i % 4] for i in range(len(data.comments))]
+    return sampler.sample, items
+
+@benchmark('sampler.sample_no_repeat')
+def bench_sample_no_repeat(data):
+    sampler = data.corpus.sampler
+    recent = RecentIdeas()
+    def sample(key):
+        keys = [key, 'u/someone']
+        idea = sampler.sample('easy', recent.get_excluded(keys))
+        recent.record(keys, idea.name)
+        return idea
+    items = [f't3_{i % 500}' for i in range(len(data.comments))]
+    return sample, items
+
+@benchmark('formatter.format_idea_response')
+def bench_format_idea(data):
+    formatter = ResponseFormatter('https://github.com/srz2/BeginnerProjectBot')
+    ideas = data.corpus.ideas['all']
+    items = [ideas[i % min(2000, len(ideas))] for i in range(len(data.comments))]
+    return formatter.format_idea_response, items
+
+@benchmark('formatter.format_basic_response')
+def bench_format_basic(data):
+    formatter = ResponseFormatter('https://github.com/srz2/BeginnerProjectBot')
+    return (lambda item: formatter.format_basic_response()), [None] * len(data.titles)
+
+@benchmark('metrics.counter_inc')
+def bench_counter_inc(data):
+    counter = MetricsRegistry().counter('bench_total', 'Bench', ['kind'])
+    return (lambda item: counter.labels(item).inc()), ['comment'] * len(data.comments)
+
+@benchmark('metrics.histogram_observe')
+def bench_histogram_observe(data):
+    histogram = MetricsRegistry().histogram('bench_seconds', 'Bench', ['kind'])
+    items = [i / len(data.comments) for i in range(len(data.comments))]
+    return (lambda item: histogram.labels('comment').observe(item)), items
+
+@benchmark('corpus.read_snapshot')
+def bench_read_snapshot(data):
+    path = os.path.join(data.directory, 'corpus.snapshot')
+    write_snapshot(path, data.snapshot)
+    return (lambda item: Corpus(read_snapshot(path))), [None] * 20
+
+@benchmark('corpus.read_csv')
+def bench_read_csv(data):
+    # The same load as BotInternals.get_ideas_internal, to compare with the snapshot
+    path = os.path.join(data.directory, 'ideas.csv')
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Name', 'Difficulty', 'Description'])
+        writer.writerows(data.synthetic.ideas)
+    synthetic = data.synthetic
+    def load(item):
+        with open(path) as csvfile:
+            reader = csv.reader(csvfile, delimiter=',', skipinitialspace=True)
+            next(reader)
+            ideas = list(reader)
+        return Corpus(create_snapshot(ideas, synthetic.suggestions, synthetic.rejections))
+    return load, [None] * 20
+
+@benchmark('corpus.create_snapshot')
+def bench_create_snapshot(data):
+    synthetic = data.synthetic
+    return (lambda item: create_snapshot(synthetic.ideas, synthetic.suggestions, synthetic.rejections)), [None] * 20
+
+def run_action(data, *args):
+    ''' Get an op running the bot once with the action, from a fresh interpreter like a restart '''
+    bot = os.path.abspath(os.path.join(SOURCE_DIR, 'bot.py'))
+    if not os.path.exists(os.path.join(data.directory, 'praw.ini')):
+        shutil.copy(os.path.join(SOURCE_DIR, 'praw.ini.example'), os.path.join(data.directory, 'praw.ini'))
+    def run(item):
+        subprocess.run([sys.executable, bot] + list(args), cwd=data.directory, stdout=subprocess.DEVNULL, check=True)
+    return run, [None] * 10
+
+@benchmark('startup.ver')
+def bench_startup_ver(data):
+    return run_action(data, 'ver')
+
+@benchmark('startup.help')
+def bench_startup_help(data):
+    return run_action(data, 'help')
+
+@benchmark('startup.test_phrase')
+def bench_startup_test_phrase(data):
+    path = os.path.join(data.directory, 'startup.snapshot')
+    write_snapshot(path, data.snapshot)
+    return run_action(data, 'test', 'Need a beginner python project idea', '--snapshot', path)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(operation, items):
+    '''
+        Measure one operation over every item
+
+        Returns:
+            result (dict): ops/sec, p50/p99 latency in microseconds and peak memory in KiB
+    '''
+    # Warm up caches and lazily built state
+    for item in items[:min(len(items), 100)]:
+        operation(item)
+
+    # Throughput without the timing overhead of every op
+    started = time.perf_counter()
+    for item in items:
+        operation(item)
+    elapsed = time.perf_counter() - started
+
+    # Latency of every op
+    timer = time.perf_counter_ns
+    latencies = []
+    append = latencies.append
+    for item in items:
+        start = timer()
+        operation(item)
+        append(timer() - start)
+    latencies.sort()
+
+    # Peak memory allocated while running
+    tracemalloc.start()
+    for item in items:
+        operation(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': len(items) / elapsed if elapsed > 0 else float('inf'),
+        'p50_us': percentile(latencies, 0.50) / 1000,
+        'p99_us': percentile(latencies, 0.99) / 1000,
+        'peak_kib': peak / 1024,
+    }
+
+def calibration_workload(count):
+    counts = {}
+    for i in range(count):
+        key = str(i % 97)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def calibrate(rounds=5, count=2000, repeats=200):
+    ''' Get the speed of this machine as ops/sec of a fixed workload, the best of a few rounds '''
+    best = 0.0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            calibration_workload(count)
+        elapsed = time.perf_counter() - started
+        best = max(best, repeats / elapsed)
+    return best
+
+def load_baselines():
+    if not os.path.exists(FILE_BASELINES):
+        return {'sizes': None, 'calibration': None, 'results': {}}
+    with open(FILE_BASELINES) as file:
+        return json.load(file)
+
+def save_baselines(sizes, calibration, results):
+    with open(FILE_BASELINES, 'w') as file:
+        json.dump({'sizes': sizes, 'calibration': calibration, 'results': results}, file, indent=4, sort_keys=True)
+        file.write('\n')
+
+def compare(results, baselines, sizes, threshold):
+    ''' Get the benchmarks slower than their baseline by more than the threshold '''
+    if baselines.get('sizes') != sizes:
+        print('Baselines were recorded with other sizes, not comparing')
+        return []
+
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines['results'].get(name)
+        if baseline is None or 'relative' not in baseline:
+            continue
+        minimum = baseline['relative'] * (1 - threshold)
+        if result['relative'] < minimum:
+            regressions.append((name, result['relative'], baseline['relative']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the bot')
+    for key, value in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{key}', type=int, default=value)
+    parser.add_argument('--only', default=None)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--update-baselines', action='store_true')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    sizes = {key: getattr(args, key) for key in DEFAULT_SIZES}
+    data = BenchmarkData(sizes)
+    baselines = load_baselines()
+    comparable = baselines.get('sizes') == sizes
+
+    calibration = calibrate()
+    print(f'Calibration: {calibration:.0f} ops/sec, baselines are scaled to this machine')
+
+    results = {}
+    try:
+        print(f'{"benchmark":<34}{"ops/sec":>14}{"p50 us":>10}{"p99 us":>10}{"peak KiB":>11}{"baseline":>14}')
+        for name, setup in benchmarks:
+            if args.only is not None and not name.startswith(args.only):
+                continue
+            setup_result = setup(data)
+            if setup_result is None:
+                print(f'{name:<34}{"skipped, missing an optional package":>45}')
+                continue
+            operation, items = setup_result
+            result = measure(operation, items)
+            result['relative'] = result['ops_per_sec'] / calibration
+            results[name] = result
+
+            # The ops/sec the baseline would have on this machine
+            relative = baselines['results'].get(name, {}).get('relative') if comparable else None
+            baseline = relative * calibration if relative is not None else None
+            baseline_text = f'{baseline:14.0f}' if baseline is not None else f'{"-":>14}'
+            print(f'{name:<34}{result["ops_per_sec"]:14.0f}{result["p50_us"]:10.2f}{result["p99_us"]:10.2f}{result["peak_kib"]:11.1f}{baseline_text}')
+    finally:
+        data.close()
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump({'sizes': sizes, 'calibration': calibration, 'results': results}, file, indent=4, sort_keys=True)
+
+    if args.update_baselines:
+        merged = baselines['results'] if comparable else {}
+        merged.update(results)
+        save_baselines(sizes, calibration, merged)
+        print('Saved baselines to', FILE_BASELINES)
+        return 0
+
+    regressions = compare(results, baselines, sizes, args.threshold)
+    for name, relative, baseline in regressions:
+        print(f'[Error]: {name} regressed to {relative * calibration:.0f} ops/sec from a baseline of {baseline * calibration:.0f} ops/sec on this machine')
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    exit(main())
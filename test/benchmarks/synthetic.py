@@ -0,0 +1,63 @@
+# Synthetic data for the benchmarks
+#
+# Everything is generated from a seed so runs with the same size see the same data
+#
+
+import random
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+FILLER_WORDS = [
+    'the', 'a', 'to', 'for', 'with', 'my', 'i', 'in', 'on', 'is', 'how', 'what', 'code',
+    'function', 'list', 'loop', 'error', 'class', 'file', 'data', 'script', 'variable',
+    'string', 'dictionary', 'module', 'install', 'windows', 'output', 'input', 'print',
+]
+
+def create_vocabulary(rng, prefix, count):
+    return [f'{prefix}{i}' for i in range(count)]
+
+class SyntheticCorpus:
+    '''
+        Corpus of generated ideas and words
+
+        Parameters:
+            ideas (int): Number of ideas
+            words (int): Number of suggestion words, a tenth as many rejection words are made
+            seed (int): Seed of the generator
+    '''
+    def __init__(self, ideas=1000, words=1000, seed=1):
+        rng = random.Random(seed)
+        self.rng = rng
+        self.ideas = [[f'Project {i}', rng.choice(DIFFICULTIES), f'Build project number {i}. ' * 4] for i in range(ideas)]
+        self.suggestions = ['project', 'projects', 'idea', 'ideas', 'beginner', 'python'] + create_vocabulary(rng, 'suggest', words)
+        self.rejections = ['selenium', 'help'] + create_vocabulary(rng, 'reject', max(1, words // 10))
+
+    def create_titles(self, count, accept_ratio=0.3):
+        ''' Create post titles, about accept_ratio of them asking for a project '''
+        rng = self.rng
+        titles = []
+        for _ in range(count):
+            length = rng.randint(3, 16)
+            words = [rng.choice(FILLER_WORDS) for _ in range(length)]
+            if rng.random() < accept_ratio:
+                for position in rng.sample(range(length), max(1, length // 2)):
+                    words[position] = rng.choice(self.suggestions)
+            elif rng.random() < 0.2:
+                words[rng.randrange(length)] = rng.choice(self.rejections)
+            words[0] = words[0].capitalize()
+            titles.append(' '.join(words) + rng.choice(['?', '!', '.', '']))
+        return titles
+
+    def create_comments(self, count, trigger_ratio=0.05):
+        ''' Create comment bodies, about trigger_ratio of them calling the bot '''
+        rng = self.rng
+        comments = []
+        for _ in range(count):
+            length = rng.randint(5, 80)
+            words = [rng.choice(FILLER_WORDS) for _ in range(length)]
+            if rng.random() < trigger_ratio:
+                position = rng.randrange(length)
+                words.insert(position, rng.choice(['!projectbot', '**!ProjectBot**', 'u/BeginnerProjectBot']))
+                words.insert(position + 1, rng.choice(DIFFICULTIES + ['please']))
+            comments.append(' '.join(words))
+        return comments
@@ -0,0 +1,151 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from projectbot.Activity import ActivityStore, SqliteActivitySink, MongoActivitySink, FIELDS, create_activity_store, create_decision_record
+from projectbot.Database import Database, CircuitBreaker
+from projectbot.FakeReddit import FakeSubmission, FakeComment
+
+class MemorySink:
+    name = 'memory'
+
+    def __init__(self, fail=False, block=None):
+        self.batches = []
+        self.fail = fail
+        self.block = block
+        self.closed = False
+
+    def write(self, records):
+        if self.block is not None:
+            self.block.wait()
+        if self.fail:
+            raise ConnectionError('store went away')
+        self.batches.append(list(records))
+
+    def close(self):
+        self.closed = True
+
+    def get_records(self):
+        return [record for batch in self.batches for record in batch]
+
+class FakeCollection:
+    def __init__(self, fail=False):
+        self.docs = []
+        self.indexes = []
+        self.fail = fail
+
+    def insert_many(self, docs, ordered=True):
+        if self.fail:
+            raise ConnectionError('No servers found')
+        self.docs.extend(docs)
+        return type('InsertManyResult', (), {'inserted_ids': list(range(len(docs)))})()
+
+    def create_index(self, keys):
+        self.indexes.append(keys)
+
+class FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_database(self, name):
+        return self
+
+    def get_collection(self, name):
+        return self.collection
+
+def create_submission(index):
+    return FakeSubmission('A title for a project', 'someone', subreddit='learnpython', id=f'post{index}')
+
+class ActivityStoring(unittest.TestCase):
+    def test_records_are_written_on_stop(self):
+        sink = MemorySink()
+        store = ActivityStore(sink, flush_interval=60, batch_size=2)
+        for index in range(5):
+            store.record_decision('submission', create_submission(index), index % 2 == 0, 'all')
+        store.stop()
+
+        records = sink.get_records()
+        self.assertEqual(len(records), 5)
+        self.assertTrue(all(len(batch) <= 2 for batch in sink.batches))
+        self.assertEqual(dict(zip(FIELDS, records[0]))['fullname'], 't3_post0')
+        self.assertEqual(dict(zip(FIELDS, records[0]))['subreddit'], 'learnpython')
+        self.assertTrue(sink.closed)
+        self.assertEqual(store.stats['written'], 5)
+
+    def test_recording_does_not_wait_on_the_store(self):
+        block = threading.Event()
+        sink = MemorySink(block=block)
+        store = ActivityStore(sink, flush_interval=0.01, batch_size=1, max_buffer=3)
+
+        # The flusher is stuck writing, records are buffered until it is full then dropped
+        for index in range(10):
+            store.record_decision('submission', create_submission(index), True, 'all')
+        self.assertLessEqual(len(store.buffer), 3)
+        self.assertGreater(store.dropped, 0)
+
+        block.set()
+        store.stop()
+        self.assertEqual(len(sink.get_records()) + store.stats['dropped'], 10)
+
+    def test_failed_batch_goes_to_the_fallback(self):
+        fallback = MemorySink()
+        store = ActivityStore(MemorySink(fail=True), fallback, flush_interval=60)
+        comment = FakeComment('Any ideas? !projectbot easy', 'someone', submission=create_submission(0))
+        store.record_reply('comment', comment, 'idea', 'Web Scraper')
+        store.stop()
+
+        record = dict(zip(FIELDS, fallback.get_records()[0]))
+        self.assertEqual(record['type'], 'reply')
+        self.assertEqual(record['idea'], 'Web Scraper')
+        self.assertEqual(store.stats['fallback'], 1)
+
+    def test_off_records_nothing(self):
+        store = create_activity_store('off')
+        store.record_decision('submission', create_submission(0), True, 'all')
+        store.stop()
+        self.assertFalse(store.is_enabled())
+        self.assertIsNone(store.thread)
+
+class ActivitySinks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_sqlite_is_indexed_and_queryable(self):
+        path = os.path.join(self.directory, 'activity.db')
+        sink = SqliteActivitySink(path)
+        sink.write([create_decision_record('submission', create_submission(index), index < 3, 'all', at=index) for index in range(10)])
+        sink.close()
+
+        connection = sqlite3.connect(path)
+        indexes = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        accepted = connection.execute("SELECT COUNT(*) FROM activity WHERE type = 'decision' AND at >= 1 AND accepted").fetchone()[0]
+        connection.close()
+
+        self.assertIn('activity_type_at', indexes)
+        self.assertEqual(accepted, 2)
+
+    def test_mongo_goes_through_the_database(self):
+        collection = FakeCollection()
+        database = Database('user', 'pass', 'db', client=FakeClient(collection), breaker=CircuitBreaker())
+        sink = MongoActivitySink(database)
+        sink.write([create_decision_record('submission', create_submission(0), True, 'all')])
+        sink.write([create_decision_record('submission', create_submission(1), False, 'all')])
+
+        self.assertEqual([doc['fullname'] for doc in collection.docs], ['t3_post0', 't3_post1'])
+        self.assertIn([('type', 1), ('at', 1)], collection.indexes)
+        self.assertEqual(len(collection.indexes), 4)
+
+    def test_failed_writes_do_not_open_the_corpus_breaker(self):
+        database = Database('user', 'pass', 'db', client=FakeClient(FakeCollection(fail=True)), breaker=CircuitBreaker())
+        sink = MongoActivitySink(database)
+        with self.assertRaises(ConnectionError):
+            sink.write([create_decision_record('submission', create_submission(0), True, 'all')])
+
+        self.assertEqual(sink.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(database.breaker.state, CircuitBreaker.CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from projectbot.Backfill import Backfiller, BackfillCheckpoint
+from projectbot.Capture import CaptureWriter, read_events, get_recorded_decisions
+from projectbot.FakeReddit import FakeRedditInterface
+
+NOW = 1000000.0
+
+def classify(kind, things):
+    if kind == 'submission':
+        return [('project' in thing.title, 'all') for thing in things]
+    return [('!projectbot' in thing.body, 'easy') for thing in things]
+
+class FailingReddit:
+    def __init__(self, reddit, fail_after):
+        self.reddit = reddit
+        self.fail_after = fail_after
+
+    def query_subreddit(self, query):
+        if self.reddit.requests >= self.fail_after:
+            raise ConnectionError('Reddit is down')
+        return self.reddit.query_subreddit(query)
+
+class Backfilling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.reddit = FakeRedditInterface()
+        for i in range(250):
+            title = f'Need a project idea {i}' if i % 10 == 0 else f'Plain post {i}'
+            submission = self.reddit.add_submission(title, subreddit='learnpython', created_utc=NOW - 3600 * (250 - i))
+            self.reddit.add_comment(submission, f'Comment {i}', created_utc=NOW - 3600 * (250 - i) + 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_backfiller(self, reddit=None, **kwargs):
+        self.writer = CaptureWriter(os.path.join(self.directory, 'output'), max_files=0)
+        self.checkpoint = BackfillCheckpoint(os.path.join(self.directory, 'checkpoint.json'))
+        self.checkpoint.load()
+        return Backfiller(reddit or self.reddit, ['learnpython'], classify, self.writer, self.checkpoint,
+                        page_size=100, clock=lambda: NOW, **kwargs)
+
+    def get_events(self):
+        self.writer.close()
+        return list(read_events(os.path.join(self.directory, 'output')))
+
+    def test_pages_back_to_the_time_bound(self):
+        accepted = []
+        backfiller = self.create_backfiller(max_age=3600 * 150, on_accepted=lambda kind, thing, difficulty: accepted.append(thing))
+        self.assertTrue(backfiller.run())
+
+        events = self.get_events()
+        submissions = [event for event in events if event['type'] == 'submission']
+        self.assertEqual(len(submissions), 150)
+        self.assertEqual(submissions[0]['title'], 'Plain post 249')
+        self.assertEqual(len(get_recorded_decisions(events)), 300)
+        self.assertEqual(len(accepted), 15)
+        self.assertEqual(backfiller.stats['requests'], 4)
+
+    def test_count_bound(self):
+        backfiller = self.create_backfiller(max_items=120)
+        backfiller.run()
+        self.assertEqual(self.checkpoint.get('learnpython', 'submission')['count'], 120)
+        self.assertEqual(self.checkpoint.get('learnpython', 'comment')['count'], 120)
+
+    def test_resumes_from_checkpoint(self):
+        backfiller = self.create_backfiller(reddit=FailingReddit(self.reddit, fail_after=1), max_age=3600 * 1000)
+        self.assertFalse(backfiller.run())
+        self.writer.close()
+        self.assertEqual(self.checkpoint.get('learnpython', 'submission')['count'], 100)
+
+        backfiller = self.create_backfiller(max_age=3600 * 1000)
+        self.assertTrue(backfiller.run())
+        events = self.get_events()
+        titles = [event['title'] for event in events if event['type'] == 'submission']
+        self.assertEqual(len(titles), 250)
+        self.assertEqual(len(set(titles)), 250)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import json
+import unittest
+from projectbot.BulkTest import BulkTester, ConfusionMatrix, ResultWriter, read_titles
+from projectbot.VectorClassifier import is_available
+
+SUGGESTIONS = ['project', 'projects', 'idea', 'ideas', 'beginner']
+REJECTIONS = ['selenium']
+
+class BulkTest(unittest.TestCase):
+    def test_read_text_titles(self):
+        reader = io.StringIO('1\tNeed beginner project ideas please\nno label here\n\n0\tSelenium project help\nnot_a_label\tkept whole\n')
+        self.assertEqual(list(read_titles(reader)), [
+            ('Need beginner project ideas please', True),
+            ('no label here', None),
+            ('Selenium project help', False),
+            ('not_a_label\tkept whole', None),
+        ])
+
+    def test_read_csv_titles(self):
+        reader = io.StringIO('title,label\n"Ideas, for a project",accept\nPlain title,\n')
+        self.assertEqual(list(read_titles(reader, is_csv=True)), [('Ideas, for a project', True), ('Plain title', None)])
+
+    def test_pool_matches_single_process(self):
+        titles = [(f'Looking for a beginner project idea number {i}', None) for i in range(50)]
+        titles += [(f'Selenium error in my script number {i}', None) for i in range(50)]
+        single = list(BulkTester(SUGGESTIONS, REJECTIONS, workers=1).run(titles))
+        pooled = list(BulkTester(SUGGESTIONS, REJECTIONS, workers=2, chunk_size=7).run(titles))
+        self.assertEqual(single, pooled)
+        self.assertEqual([title for title, _, _ in pooled], [title for title, _ in titles])
+
+    @unittest.skipUnless(is_available(), 'Needs numpy')
+    def test_vectorized_matches_single_process(self):
+        titles = [(f'Looking for a beginner project idea number {i}', None) for i in range(50)]
+        titles += [(f'Selenium error in my script number {i}', None) for i in range(50)]
+        single = list(BulkTester(SUGGESTIONS, REJECTIONS, workers=1).run(titles))
+        vectorized = list(BulkTester(SUGGESTIONS, REJECTIONS, chunk_size=7, vectorized=True).run(titles))
+        self.assertEqual([(title, stats[:3], stats[3] == '') for title, _, stats in vectorized],
+                        [(title, stats[:3], stats[3] == '') for title, _, stats in single])
+
+    def test_confusion_matrix(self):
+        matrix = ConfusionMatrix()
+        for accepted, label in [(True, True), (True, True), (True, False), (False, True), (False, False), (False, None)]:
+            matrix.add(accepted, label)
+        self.assertEqual(matrix.get_labelled_count(), 5)
+        self.assertEqual(matrix.unlabelled, 1)
+        self.assertAlmostEqual(matrix.get_precision(), 2 / 3)
+        self.assertAlmostEqual(matrix.get_recall(), 2 / 3)
+        self.assertAlmostEqual(matrix.get_accuracy(), 3 / 5)
+
+    def test_result_writer_formats(self):
+        results = list(BulkTester(SUGGESTIONS, REJECTIONS, workers=1).run([('Any beginner project ideas for me', True)]))
+
+        output = io.StringIO()
+        ResultWriter(output, 'jsonl').write(*results[0])
+        row = json.loads(output.getvalue())
+        self.assertEqual(row['title'], 'Any beginner project ideas for me')
+        self.assertTrue(row['label'])
+        self.assertTrue(row['accepted'])
+        self.assertEqual(row['count'], 3)
+
+        output = io.StringIO()
+        ResultWriter(output, 'csv').write(*results[0])
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], 'title,label,accepted,count,total_words,ratio,error')
+        self.assertTrue(lines[1].startswith('Any beginner project ideas for me,1,1,3,6,'))
+
+if __name__ == '__main__':
+    unittest.main()
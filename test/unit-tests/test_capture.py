@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from projectbot.Capture import CaptureWriter, ReplayRecorder, read_events, load_fake_reddit, get_recorded_decisions, get_capture_files
+from projectbot.FakeReddit import FakeRedditInterface
+
+class CaptureReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.reddit = FakeRedditInterface()
+        self.submission = self.reddit.add_submission('Looking for a beginner project', author='poster')
+        self.comment = self.reddit.add_comment(self.submission, '!projectbot easy', author='commenter')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def capture(self, writer):
+        stream = self.reddit.query_subreddit('all').stream
+        submissions = list(writer.record_stream('submission', stream.submissions()))
+        comments = list(writer.record_stream('comment', stream.comments()))
+        writer.record_decision('submission', self.submission, True, 'all')
+        writer.record_decision('comment', self.comment, True, 'easy')
+        writer.close()
+        return submissions, comments
+
+    def test_capture_round_trip(self):
+        submissions, comments = self.capture(CaptureWriter(self.directory))
+        self.assertEqual(submissions, [self.submission])
+        self.assertEqual(comments, [self.comment])
+
+        events = list(read_events(self.directory))
+        self.assertEqual([event['type'] for event in events], ['submission', 'comment', 'decision', 'decision'])
+        self.assertEqual(events[0]['title'], 'Looking for a beginner project')
+        self.assertEqual(events[1]['body'], '!projectbot easy')
+        self.assertEqual(events[1]['link_id'], self.submission.fullname)
+        self.assertEqual(get_recorded_decisions(events)[self.comment.fullname], (True, 'easy'))
+
+    def test_rotation_keeps_newest_files(self):
+        writer = CaptureWriter(self.directory, max_bytes=1, max_files=2)
+        for _ in range(5):
+            writer.record_decision('comment', self.comment, False, '')
+        writer.close()
+
+        self.assertEqual(writer.stats['files'], 5)
+        self.assertEqual(len(get_capture_files(self.directory)), 2)
+        self.assertEqual(len(list(read_events(self.directory))), 2)
+
+    def test_replay_into_fake_reddit(self):
+        self.capture(CaptureWriter(self.directory))
+        events = list(read_events(self.directory))
+
+        fake = FakeRedditInterface()
+        offsets = load_fake_reddit(fake, events)
+        self.assertEqual([submission.fullname for submission in fake.submissions], [self.submission.fullname])
+        self.assertEqual(fake.comments[0].body, '!projectbot easy')
+        self.assertEqual(fake.comments[0].link_id, self.submission.fullname)
+        self.assertEqual(set(offsets), {self.submission.fullname, self.comment.fullname})
+
+    def test_orphan_comment_gets_placeholder_post(self):
+        events = [{'type': 'comment', 'at': 1.0, 'id': 'abc', 'author': 'someone', 'subreddit': 'learnpython',
+                'created_utc': 1.0, 'body': 'hello', 'link_id': 't3_xyz', 'parent_id': 't3_xyz'}]
+        fake = FakeRedditInterface()
+        load_fake_reddit(fake, events)
+        self.assertEqual(fake.submissions, [])
+        self.assertEqual(fake.comments[0].link_id, 't3_xyz')
+        self.assertEqual(fake.comments[0].subreddit, 'learnpython')
+
+    def test_decision_diffs(self):
+        recorder = ReplayRecorder({}, {'t3_a': (True, 'all'), 't1_b': (False, ''), 't1_c': (True, 'easy')})
+        submission = self.reddit.add_submission('a', id='a')
+        recorder.record_decision('submission', submission, True, 'all')
+        recorder.record_decision('comment', self.reddit.add_comment(submission, 'b', id='b'), False, 'hard')
+        recorder.record_decision('comment', self.reddit.add_comment(submission, 'c', id='c'), True, 'medium')
+
+        self.assertEqual(recorder.get_compared_count(), 3)
+        self.assertEqual(recorder.get_diffs(), [('t1_c', 'comment', (True, 'easy'), (True, 'medium'))])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from projectbot.Classifier import TitleClassifier
+
+class TitleClassification(unittest.TestCase):
+    def setUp(self):
+        suggestions = ['beginner', 'project', 'ideas', 'python', 'simple']
+        rejections = ['selenium', 'help']
+        self.classifier = TitleClassifier(suggestions, rejections)
+
+    def test_accepts_project_request(self):
+        title = 'Any simple Python project ideas for a beginner?'
+        self.assertTrue(self.classifier.is_request(title))
+
+    def test_rejects_short_title(self):
+        self.assertFalse(self.classifier.is_request('Python project ideas'))
+
+    def test_rejects_rejection_word(self):
+        title = 'Beginner python project with selenium, need ideas'
+        self.assertFalse(self.classifier.is_request(title))
+
+    def test_rejects_low_ratio(self):
+        title = 'What is the best way to structure a python package'
+        self.assertFalse(self.classifier.is_request(title))
+
+    def test_normalizes_punctuation(self):
+        title = '[Beginner] Python/project: ideas, simple!'
+        self.assertEqual(self.classifier.get_words(title), ['beginner', 'python', 'project', 'ideas', 'simple'])
+
+    def test_empty_title(self):
+        self.assertFalse(self.classifier.is_request(''))
+        ratio, count, total, error = self.classifier.explain('')
+        self.assertEqual(total, 0)
+        self.assertNotEqual(error, '')
+
+    def test_explain_matches_fast_path(self):
+        titles = [
+            'Any simple Python project ideas for a beginner?',
+            'Beginner python project with selenium, need ideas',
+            'What is the best way to structure a python package',
+            'Python project ideas',
+        ]
+        for title in titles:
+            ratio, count, total, error = self.classifier.explain(title)
+            self.assertEqual(error == '', self.classifier.is_request(title), title)
+
+    def test_classify_many_matches_fast_path(self):
+        titles = [
+            'Any simple Python project ideas for a beginner?',
+            'Beginner python project with selenium, need ideas',
+            'Python project ideas',
+        ]
+        expected = [self.classifier.is_request(title) for title in titles]
+        self.assertEqual(self.classifier.classify_many(titles), expected)
@@ -0,0 +1,92 @@
+import time
+import threading
+import unittest
+from projectbot.Corpus import Corpus, CorpusRefresher, load_sources
+from projectbot.Snapshot import create_snapshot
+
+IDEAS = [
+    ['Number Guessing', 'easy', 'Guess a number'],
+    ['Web Scraper', 'hard', 'Scrape a site'],
+]
+
+class CorpusContents(unittest.TestCase):
+    def test_difficulty_buckets(self):
+        corpus = Corpus(create_snapshot(IDEAS, ['project'], ['selenium']))
+        self.assertEqual(len(corpus.ideas['all']), 2)
+        self.assertEqual(corpus.ideas['easy'][0].name, 'Number Guessing')
+        self.assertEqual(len(corpus.ideas['medium']), 0)
+        self.assertEqual(corpus.classifier.suggestion_words, frozenset(['project']))
+
+    def test_is_read_only(self):
+        corpus = Corpus(create_snapshot(IDEAS, ['project'], ['selenium']))
+        with self.assertRaises(TypeError):
+            corpus.ideas['all'] = ()
+
+class CorpusRefreshing(unittest.TestCase):
+    def setUp(self):
+        self.source = create_snapshot(IDEAS, ['project'], ['selenium'])
+        self.current = Corpus(self.source, version=1)
+        self.refresher = CorpusRefresher(lambda: self.source, lambda: self.current, self.swap, interval=0.01)
+
+    def swap(self, corpus):
+        self.current = corpus
+
+    def test_unchanged_corpus_is_kept(self):
+        original = self.current
+        self.assertFalse(self.refresher.refresh_now())
+        self.assertIs(self.current, original)
+
+    def test_changed_corpus_is_swapped(self):
+        held = self.current
+        self.source = create_snapshot(IDEAS + [['Dice Rolling', 'easy', 'Roll dice']], ['project'], ['selenium'])
+        self.assertTrue(self.refresher.refresh_now())
+        self.assertEqual(self.current.version, 2)
+        self.assertEqual(len(self.current.ideas['easy']), 2)
+        self.assertEqual(self.refresher.stats['reloads'], 1)
+
+        # A reader holding the old corpus still sees the whole old version
+        self.assertEqual(len(held.ideas['easy']), 1)
+
+    def test_failed_load_keeps_corpus(self):
+        def failing_load():
+            raise Exception('Mongo is down')
+        self.refresher.load = failing_load
+        original = self.current
+        self.assertFalse(self.refresher.refresh_now())
+        self.assertIs(self.current, original)
+        self.assertEqual(self.refresher.stats['failures'], 1)
+
+
+class SourceLoading(unittest.TestCase):
+    def fail(self):
+        raise TimeoutError('No servers found')
+
+    def test_each_source_falls_back_alone(self):
+        results = load_sources({
+            'ideas': (lambda: IDEAS, lambda: []),
+            'suggestions': (self.fail, lambda: ['project']),
+        }, deadline=5)
+        self.assertEqual(results['ideas'].value, IDEAS)
+        self.assertEqual(results['ideas'].origin, 'primary')
+        self.assertEqual(results['suggestions'].value, ['project'])
+        self.assertEqual(results['suggestions'].origin, 'fallback')
+        self.assertIn('No servers found', results['suggestions'].outcome)
+
+    def test_slow_sources_share_the_deadline(self):
+        release = threading.Event()
+        def slow():
+            release.wait(5)
+            return ['slow']
+
+        started = time.perf_counter()
+        results = load_sources({
+            'suggestions': (slow, lambda: ['project']),
+            'rejections': (slow, lambda: ['selenium']),
+        }, deadline=0.1)
+        elapsed = time.perf_counter() - started
+        release.set()
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(results['suggestions'].value, ['project'])
+        self.assertEqual(results['rejections'].value, ['selenium'])
+        self.assertIn('timed out', results['rejections'].outcome)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from projectbot.CorpusExport import export_corpus
+from projectbot.Snapshot import read_snapshot
+from projectbot.Constants import Asset
+
+COLLECTIONS = {
+    Asset.coll_ideas_mongo: [
+        {'name': 'Number Guessing', 'difficulty': 'easy', 'description': 'Guess a number'},
+        {'name': 'Web Scraper', 'difficulty': 'hard', 'description': 'Scrape a site, "politely"'},
+    ],
+    Asset.coll_suggestion_mongo: [{'term': 'project'}, {'term': 'idea'}],
+    Asset.coll_rejection_mongo: [{'term': 'hire'}],
+}
+
+def get_docs(name, projection, batch_size):
+    return iter(COLLECTIONS[name])
+
+def get_failing_docs(name, projection, batch_size):
+    if name == Asset.coll_rejection_mongo:
+        raise ConnectionError('mongo went away')
+    return iter(COLLECTIONS[name])
+
+class CorpusExport(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def get_path(self, asset):
+        return os.path.join(self.root, asset)
+
+    def test_export_writes_every_asset(self):
+        snapshot = export_corpus(get_docs, self.root)
+
+        with open(self.get_path(Asset.file_suggestion_words)) as file:
+            self.assertEqual(file.read().split(), ['project', 'idea'])
+        with open(self.get_path(Asset.file_rejection_words)) as file:
+            self.assertEqual(file.read().split(), ['hire'])
+        with open(self.get_path(Asset.file_ideas_csv)) as file:
+            self.assertEqual(file.readline().strip(), '"Idea","difficulty","description"')
+
+        written = read_snapshot(self.get_path(Asset.file_corpus_snapshot), verify=True)
+        self.assertEqual(written.content_hash, snapshot.content_hash)
+        self.assertEqual(len(written.ideas), 2)
+        self.assertEqual(os.listdir(self.root), ['assets'])
+
+    def test_unexported_files_are_kept(self):
+        os.makedirs(os.path.dirname(self.get_path(Asset.file_idea_weights)))
+        with open(self.get_path(Asset.file_idea_weights), 'w') as file:
+            file.write('Web Scraper,2\n')
+
+        export_corpus(get_docs, self.root)
+
+        with open(self.get_path(Asset.file_idea_weights)) as file:
+            self.assertEqual(file.read(), 'Web Scraper,2\n')
+
+    def test_assets_folder_and_file_modes_are_kept(self):
+        export_corpus(get_docs, self.root)
+        assets = os.path.join(self.root, 'assets')
+        os.chmod(assets, 0o755)
+        os.chmod(self.get_path(Asset.file_corpus_snapshot), 0o644)
+
+        export_corpus(get_docs, self.root)
+
+        self.assertEqual(os.stat(assets).st_mode & 0o777, 0o755)
+        self.assertEqual(os.stat(self.get_path(Asset.file_corpus_snapshot)).st_mode & 0o777, 0o644)
+
+    def test_failed_export_leaves_old_assets(self):
+        export_corpus(get_docs, self.root)
+        with open(self.get_path(Asset.file_ideas_csv)) as file:
+            before = file.read()
+
+        with self.assertRaises(ConnectionError):
+            export_corpus(get_failing_docs, self.root)
+
+        with open(self.get_path(Asset.file_ideas_csv)) as file:
+            self.assertEqual(file.read(), before)
+        self.assertEqual(os.listdir(self.root), ['assets'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from projectbot.CorpusSync import hash_record, plan_sync, sync_collection, create_idea_records, create_word_records
+
+try:
+    import pymongo
+except ImportError:
+    pymongo = None
+
+IDEAS = create_idea_records([
+    ['Number Guessing', 'easy', 'Guess a number'],
+    ['Web Scraper', 'hard', 'Scrape a site'],
+    ['Todo List', 'medium', 'Track tasks'],
+])
+
+def create_doc(doc_id, record, hashed=True):
+    doc = dict(record, _id=doc_id)
+    if hashed:
+        doc['hash'] = hash_record(record)
+    return doc
+
+class SyncPlanning(unittest.TestCase):
+    def test_only_changes_are_planned(self):
+        changed = dict(IDEAS[1], description='Scrape a website')
+        server = [create_doc(1, IDEAS[0]), create_doc(2, IDEAS[1]), create_doc(3, {'name': 'Old Idea', 'difficulty': 'easy', 'description': 'Gone'})]
+        plan = plan_sync([IDEAS[0], changed, IDEAS[2]], server, 'name')
+
+        self.assertEqual(plan.inserts, [IDEAS[2]])
+        self.assertEqual(plan.updates, [(2, changed)])
+        self.assertEqual(plan.deletes, [3])
+        self.assertEqual(plan.unchanged, 1)
+
+    def test_unhashed_and_repeated_docs(self):
+        words = create_word_records(['project', 'beginner'])
+        server = [create_doc(1, words[0], hashed=False), create_doc(2, words[1]), create_doc(3, words[1])]
+        plan = plan_sync(words, server, 'term')
+
+        self.assertEqual(plan.updates, [(1, words[0])])
+        self.assertEqual(plan.duplicates, [3])
+        self.assertEqual(plan.inserts, [])
+
+    def test_in_sync(self):
+        plan = plan_sync(IDEAS, [create_doc(i, idea) for i, idea in enumerate(IDEAS)], 'name')
+        self.assertTrue(plan.is_empty())
+
+class FakeResult:
+    def __init__(self, inserted, modified, deleted):
+        self.inserted_count = inserted
+        self.modified_count = modified
+        self.deleted_count = deleted
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.batches = []
+        self.indexes = []
+
+    def find(self, filter, projection=None, batch_size=0):
+        return iter([{field: doc[field] for field in projection if field in doc} for doc in self.docs])
+
+    def bulk_write(self, operations, ordered=True):
+        self.batches.append((operations, ordered))
+        return FakeResult(sum(isinstance(op, pymongo.InsertOne) for op in operations),
+                        sum(isinstance(op, pymongo.ReplaceOne) for op in operations),
+                        sum(isinstance(op, pymongo.DeleteMany) for op in operations))
+
+    def create_index(self, key, unique=False):
+        self.indexes.append((key, unique))
+
+@unittest.skipUnless(pymongo is not None, 'Needs pymongo')
+class SyncApplying(unittest.TestCase):
+    def test_unordered_batches(self):
+        collection = FakeCollection([create_doc(1, IDEAS[0]), create_doc(2, {'name': 'Old Idea', 'difficulty': 'easy', 'description': 'Gone'})])
+        plan, stats = sync_collection(collection, IDEAS, 'name', batch_size=2, allow_deletes=False)
+
+        self.assertEqual(len(plan.inserts), 2)
+        self.assertEqual(stats, {'inserted': 2, 'updated': 0, 'deleted': 0})
+        self.assertTrue(all(not ordered for _, ordered in collection.batches))
+        self.assertEqual(collection.indexes, [('name', True)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from projectbot.Database import Database, CircuitBreaker, CircuitOpenError
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = []
+
+    def find(self, filter, projection=None, batch_size=0):
+        self.finds.append((filter, projection, batch_size))
+        for doc in self.docs:
+            if projection is None:
+                yield dict(doc)
+            else:
+                yield {key: value for key, value in doc.items() if projection.get(key, 0)}
+
+class FakeDatabase:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+class FakeClient:
+    ''' In-process stand-in for a MongoClient '''
+    def __init__(self, collections):
+        self.collections = collections
+        self.closed = False
+
+    def get_database(self, name):
+        return FakeDatabase(self.collections)
+
+    def close(self):
+        self.closed = True
+
+class FailingCollection:
+    def __init__(self):
+        self.finds = 0
+
+    def find(self, filter, projection=None, batch_size=0):
+        self.finds += 1
+        raise TimeoutError('No servers found')
+
+class DatabaseLoading(unittest.TestCase):
+    def setUp(self):
+        self.collections = {
+            'ideas': FakeCollection([
+                {'_id': 1, 'name': 'Number Guessing', 'difficulty': 'easy', 'description': 'Guess a number'},
+                {'_id': 2, 'name': 'Web Scraper', 'difficulty': 'hard', 'description': 'Scrape a site'},
+            ]),
+            'suggestion-words': FakeCollection([{'_id': 1, 'term': 'project'}, {'_id': 2, 'term': 'beginner'}]),
+            'rejection-words': FakeCollection([{'_id': 1, 'term': 'selenium'}]),
+        }
+        self.client = FakeClient(self.collections)
+        self.database = Database('user', 'password', 'BeginnerProjectBot', client=self.client)
+
+    def test_list_uses_projection(self):
+        terms = self.database.get_list_from_collection('suggestion-words')
+        self.assertEqual(terms, ['project', 'beginner'])
+        filter, projection, batch_size = self.collections['suggestion-words'].finds[0]
+        self.assertEqual(projection, {'_id': 0, 'term': 1})
+        self.assertGreater(batch_size, 0)
+
+    def test_load_corpus(self):
+        ideas, suggestions, rejections = self.database.load_corpus()
+        self.assertEqual(ideas, [
+            ['Number Guessing', 'easy', 'Guess a number'],
+            ['Web Scraper', 'hard', 'Scrape a site'],
+        ])
+        self.assertEqual(suggestions, ['project', 'beginner'])
+        self.assertEqual(rejections, ['selenium'])
+
+    def test_client_is_shared(self):
+        self.assertIs(self.database.get_client(), self.database.get_client())
+        self.database.close()
+        self.assertTrue(self.client.closed)
+
+    def test_configured_uri(self):
+        database = Database('user', 'password', 'BeginnerProjectBot', uri='mongodb://localhost:27017')
+        self.assertEqual(database.get_uri(), 'mongodb://localhost:27017')
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class CircuitBreaking(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_time=60, clock=self.clock)
+
+    def fail(self):
+        raise TimeoutError('No servers found')
+
+    def test_failure_opens_the_circuit(self):
+        with self.assertRaises(TimeoutError):
+            self.breaker.call(self.fail)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'called')
+        self.assertEqual(self.breaker.stats['refused'], 1)
+
+    def test_trial_call_after_reset_time(self):
+        with self.assertRaises(TimeoutError):
+            self.breaker.call(self.fail)
+
+        self.clock.now = 60
+        with self.assertRaises(TimeoutError):
+            self.breaker.call(self.fail)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'called')
+
+        self.clock.now = 120
+        self.assertEqual(self.breaker.call(lambda: 'called'), 'called')
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_calls_are_counted_from_many_threads(self):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda i: self.breaker.call(lambda: i), range(3000)))
+        self.assertEqual(self.breaker.stats['calls'], 3000)
+
+    def test_database_calls_share_the_breaker(self):
+        failing = FailingCollection()
+        collections = {'ideas': failing, 'suggestion-words': FailingCollection(), 'rejection-words': FailingCollection()}
+        database = Database('user', 'password', 'BeginnerProjectBot', client=FakeClient(collections), breaker=self.breaker)
+
+        with self.assertRaises(TimeoutError):
+            database.get_ideas()
+        with self.assertRaises(CircuitOpenError):
+            database.get_list_from_collection('suggestion-words')
+        self.assertEqual(collections['suggestion-words'].finds, 0)
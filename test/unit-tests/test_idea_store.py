@@ -0,0 +1,27 @@
+import unittest
+from projectbot.IdeaStore import Idea, IdeaStore
+
+class IdeaStoreBuckets(unittest.TestCase):
+    def setUp(self):
+        self.store = IdeaStore([
+            ('Number Guessing', 'easy', 'Guess a number'),
+            ('Web Scraper', 'hard', 'Scrape a site'),
+            ('Dice Rolling', 'easy', 'Roll some dice'),
+        ])
+
+    def test_all_bucket(self):
+        self.assertEqual(len(self.store['all']), 3)
+        self.assertEqual([idea.name for idea in self.store['all']], ['Number Guessing', 'Web Scraper', 'Dice Rolling'])
+
+    def test_difficulty_buckets(self):
+        self.assertEqual([idea.name for idea in self.store['easy']], ['Number Guessing', 'Dice Rolling'])
+        self.assertEqual(self.store['hard'][0], Idea('Web Scraper', 'hard', 'Scrape a site'))
+        self.assertEqual(len(self.store['medium']), 0)
+
+    def test_ideas_are_shared(self):
+        self.assertIs(self.store['easy'][1], self.store['all'][2])
+        self.assertIs(self.store['easy'][0].difficulty, self.store['easy'][1].difficulty)
+
+    def test_records_have_no_dict(self):
+        with self.assertRaises(AttributeError):
+            self.store['all'][0].extra = 'value'
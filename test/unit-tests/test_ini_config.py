@@ -38,3 +38,10 @@ class FileINIConfigured(unittest.TestCase):
     def test_configuration_ini(self):
         config = Configuration()
         self.assertRegex(config['user_agent'], r'BeginnerProjectBot:[0-9].[0-9] \(by \/u\/srz2\)')
+
+    def test_ini_is_not_rewritten(self):
+        with open(self.file_test_ini) as file:
+            before = file.read()
+        Configuration()
+        with open(self.file_test_ini) as file:
+            self.assertEqual(file.read(), before)
@@ -0,0 +1,64 @@
+import io
+import json
+import unittest
+from projectbot.Logger import StructuredLogger, parse_level, DEBUG, WARNING
+
+class Logger(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        self.logger = StructuredLogger(self.output, flush_interval=60)
+
+    def tearDown(self):
+        self.logger.stop()
+
+    def get_records(self):
+        self.logger.flush()
+        return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+    def test_records_are_json(self):
+        self.logger.info('submission_accepted', id='abc', ratio=0.5)
+        records = self.get_records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['level'], 'info')
+        self.assertEqual(records[0]['event'], 'submission_accepted')
+        self.assertEqual(records[0]['id'], 'abc')
+        self.assertEqual(records[0]['ratio'], 0.5)
+
+    def test_level_changes_at_runtime(self):
+        self.logger.debug('hidden')
+        self.logger.set_level('debug')
+        self.logger.debug('shown')
+        self.logger.set_level(WARNING)
+        self.logger.info('hidden')
+        self.logger.warning('shown')
+        self.assertEqual([record['event'] for record in self.get_records()], ['shown', 'shown'])
+
+    def test_sampling(self):
+        self.logger.set_sample_rate(0.0)
+        for _ in range(100):
+            self.logger.sampled('submission_rejected')
+        self.assertEqual(self.get_records(), [])
+
+        self.logger.set_sample_rate(1.0)
+        self.logger.sampled('submission_rejected', id='abc')
+        records = self.get_records()
+        self.assertEqual(records[0]['sampled'], 1.0)
+
+    def test_full_buffer_drops_records(self):
+        logger = StructuredLogger(self.output, flush_interval=60, max_buffer=2)
+        for index in range(5):
+            logger.info('item', index=index)
+        logger.stop()
+        records = [json.loads(line) for line in self.output.getvalue().splitlines()]
+        self.assertEqual([record.get('index') for record in records[:2]], [0, 1])
+        self.assertEqual(records[2]['event'], 'log_records_dropped')
+        self.assertEqual(records[2]['count'], 3)
+
+    def test_parse_level(self):
+        self.assertEqual(parse_level('DEBUG'), DEBUG)
+        self.assertEqual(parse_level('30'), WARNING)
+        with self.assertRaises(ValueError):
+            parse_level('loud')
+
+if __name__ == '__main__':
+    unittest.main()
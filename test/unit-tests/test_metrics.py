@@ -0,0 +1,67 @@
+import unittest
+import urllib.request
+from projectbot.Metrics import MetricsRegistry, STREAM_ITEMS, instrument_stream, start_metrics_server
+from projectbot.FakeReddit import FakeRedditInterface
+
+class Metrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_render(self):
+        counter = self.registry.counter('test_items_total', 'Items', ['kind'])
+        counter.labels('comment').inc()
+        counter.labels('comment').inc(2)
+        counter.labels('sub"mission').inc()
+        self.assertEqual(self.registry.render(),
+                        '# HELP test_items_total Items\n'
+                        '# TYPE test_items_total counter\n'
+                        'test_items_total{kind="comment"} 3\n'
+                        'test_items_total{kind="sub\\"mission"} 1\n')
+
+    def test_unlabelled_metrics_render_zero(self):
+        self.registry.counter('test_sent_total', 'Sent')
+        gauge = self.registry.gauge('test_pending', 'Pending')
+        gauge.set_function(lambda: 4)
+        output = self.registry.render()
+        self.assertIn('test_sent_total 0\n', output)
+        self.assertIn('test_pending 4\n', output)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram('test_seconds', 'Seconds', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+        output = self.registry.render()
+        self.assertIn('test_seconds_bucket{le="0.1"} 1\n', output)
+        self.assertIn('test_seconds_bucket{le="1"} 3\n', output)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 4\n', output)
+        self.assertIn('test_seconds_sum 6.05\n', output)
+        self.assertIn('test_seconds_count 4\n', output)
+
+    def test_wrong_labels(self):
+        counter = self.registry.counter('test_total', 'Total', ['kind'])
+        with self.assertRaises(ValueError):
+            counter.labels('a', 'b')
+        with self.assertRaises(ValueError):
+            self.registry.counter('test_total', 'Again')
+
+    def test_instrument_stream(self):
+        reddit = FakeRedditInterface()
+        submission = reddit.add_submission('Looking for a project')
+        before = STREAM_ITEMS.labels('test').get()
+        self.assertEqual(list(instrument_stream('test', [submission, submission])), [submission, submission])
+        self.assertEqual(STREAM_ITEMS.labels('test').get(), before + 2)
+
+    def test_server(self):
+        self.registry.counter('test_served_total', 'Served').inc()
+        server = start_metrics_server(0, metrics_registry=self.registry)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('test_served_total 1', response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import threading
+from projectbot.Pipeline import IngestionPipeline
+from projectbot.FakeReddit import FakeRedditInterface
+
+class PipelineStages(unittest.TestCase):
+    def setUp(self):
+        self.reddit = FakeRedditInterface()
+        submission = self.reddit.add_submission('Looking for a project')
+        self.reddit.add_submission('Unrelated post')
+        self.reddit.add_comment(submission, '!projectbot easy')
+        self.reddit.add_comment(submission, 'Nice question')
+        answered = self.reddit.add_comment(submission, '!projectbot hard')
+        self.reddit.add_comment(submission, 'Already answered', author=self.reddit.username, parent=answered)
+
+    def classify(self, kind, thing):
+        if kind == 'submission':
+            return 'project' in thing.title, 'all'
+        return thing.body.startswith('!projectbot'), thing.body.split()[-1]
+
+    def dedup(self, kind, thing):
+        if kind == 'submission':
+            replies = thing.comments
+        else:
+            replies = thing.refresh().replies
+        return any(reply.author == self.reddit.username for reply in replies)
+
+    def reply(self, kind, thing, difficulty):
+        thing.reply(f'Idea of difficulty {difficulty}')
+        return True
+
+    def create_pipeline(self, **kwargs):
+        pipeline = IngestionPipeline(self.classify, self.dedup, self.reply, **kwargs)
+        subreddit = self.reddit.query_subreddit('SRZ2_TestEnvironment')
+        pipeline.add_source('submission', subreddit.stream.submissions())
+        pipeline.add_source('comment', subreddit.stream.comments())
+        return pipeline
+
+    def test_all_stages(self):
+        pipeline = self.create_pipeline()
+        pipeline.run()
+
+        self.assertEqual(pipeline.stats['fetched'], 6)
+        self.assertEqual(pipeline.stats['accepted'], 3)
+        self.assertEqual(pipeline.stats['duplicates'], 1)
+        self.assertEqual(pipeline.stats['replied'], 2)
+        self.assertEqual(pipeline.stats['errors'], 0)
+        bodies = sorted(body for parent, body in self.reddit.sent)
+        self.assertEqual(bodies, ['Idea of difficulty all', 'Idea of difficulty easy'])
+
+    def test_small_queues(self):
+        pipeline = self.create_pipeline(queue_size=1, dedup_workers=1, reply_workers=1)
+        pipeline.run()
+        self.assertEqual(pipeline.stats['replied'], 2)
+        self.assertGreater(pipeline.get_throughput(), 0)
+
+    def test_handler_errors_do_not_stop_pipeline(self):
+        def failing_reply(kind, thing, difficulty):
+            raise Exception('Reply failed')
+        self.reply = failing_reply
+        pipeline = self.create_pipeline()
+        pipeline.run()
+        self.assertEqual(pipeline.stats['errors'], 2)
+        self.assertEqual(pipeline.stats['fetched'], 6)
+
+    def test_stream_runtime_error_ends_the_source(self):
+        def broken_stream():
+            yield self.reddit.submissions[0]
+            raise RuntimeError('Stream broke')
+
+        pipeline = IngestionPipeline(self.classify, self.dedup, self.reply)
+        pipeline.add_source('submission', broken_stream())
+        thread = threading.Thread(target=pipeline.run, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(pipeline.stats['fetched'], 1)
@@ -0,0 +1,70 @@
+import unittest
+from projectbot.Poller import SubredditPoller, PollState
+from projectbot.FakeReddit import FakeRedditInterface
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class AdaptivePolling(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.reddit = FakeRedditInterface()
+        self.created = 0.0
+
+    def create_poller(self, subreddits, requests_per_second=10.0):
+        return SubredditPoller(self.reddit, subreddits, requests_per_second=requests_per_second,
+                            min_interval=5, max_interval=600, target_items=10,
+                            clock=self.clock, sleep=self.clock.sleep)
+
+    def add_posts(self, subreddit, count):
+        for _ in range(count):
+            self.created += 1
+            self.reddit.add_submission(f'Post {self.created}', subreddit=subreddit, created_utc=self.created)
+
+    def test_new_items_are_only_yielded_once(self):
+        poller = self.create_poller(['busy'])
+        self.add_posts('busy', 3)
+        first = poller.poll(poller.wait_for_next())
+        self.assertEqual([thing.title for _, thing in first], ['Post 1.0', 'Post 2.0', 'Post 3.0'])
+
+        self.add_posts('busy', 2)
+        second = poller.poll(poller.wait_for_next())
+        self.assertEqual([thing.title for _, thing in second], ['Post 4.0', 'Post 5.0'])
+        self.assertTrue(all(kind == 'submission' for kind, _ in first + second))
+
+    def test_interval_follows_arrival_rate(self):
+        poller = self.create_poller(['busy', 'quiet'])
+        for _ in range(20):
+            self.add_posts('busy', 10)
+            state = poller.wait_for_next()
+            poller.poll(state)
+
+        intervals = poller.get_intervals()
+        self.assertLess(intervals['busy'], intervals['quiet'] / 4)
+        self.assertEqual(intervals['busy'], 5)
+
+    def test_full_page_polls_again_soon(self):
+        state = PollState('busy', 60)
+        state.update(0, False, 0.0, 5, 600, 10, 0.3)
+        self.assertEqual(state.update(100, True, 60.0, 5, 600, 10, 0.3), 5)
+
+    def test_stays_within_request_budget(self):
+        poller = self.create_poller([f'sub{i}' for i in range(50)], requests_per_second=1.0)
+        started = self.clock.now
+        for _ in range(200):
+            poller.poll(poller.wait_for_next())
+
+        elapsed = self.clock.now - started
+        burst = poller.budget.capacity
+        self.assertEqual(poller.stats['requests'], 400)
+        self.assertLessEqual(poller.stats['requests'], burst + elapsed * 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import time
+import unittest
+import multiprocessing
+from projectbot.ReplyScheduler import ReplyScheduler, TokenBucket, SharedTokenBucket, parse_ratelimit_delay
+
+class ErrorItem:
+    def __init__(self, error_type, message):
+        self.error_type = error_type
+        self.message = message
+
+class FakeAPIException(Exception):
+    def __init__(self, error_type, message):
+        super().__init__(f'{error_type}: {message}')
+        self.items = [ErrorItem(error_type, message)]
+
+def send_for(bucket, sent, seconds):
+    ''' Send replies from a worker process sharing the bucket '''
+    def send(thing, response):
+        with sent.get_lock():
+            sent.value += 1
+
+    scheduler = ReplyScheduler(bucket=bucket)
+    scheduler.start()
+    for i in range(100):
+        scheduler.submit(send, i, 'idea')
+    time.sleep(seconds)
+    scheduler.stop(drain=False, timeout=5)
+
+class RateLimitParsing(unittest.TestCase):
+    def test_minutes(self):
+        e = FakeAPIException('RATELIMIT', "Looks like you've been doing that a lot. Take a break for 9 minutes before trying again.")
+        self.assertEqual(parse_ratelimit_delay(e), 540)
+
+    def test_seconds(self):
+        e = FakeAPIException('RATELIMIT', 'you are doing that too much. try again in 42 seconds.')
+        self.assertEqual(parse_ratelimit_delay(e), 42)
+
+    def test_milliseconds(self):
+        e = FakeAPIException('RATELIMIT', 'try again in 250 milliseconds')
+        self.assertAlmostEqual(parse_ratelimit_delay(e), 0.25)
+
+    def test_not_rate_limited(self):
+        e = FakeAPIException('THREAD_LOCKED', 'Comments are locked.')
+        self.assertIsNone(parse_ratelimit_delay(e))
+        self.assertIsNone(parse_ratelimit_delay(Exception('Something else')))
+
+class TokenBucketBudget(unittest.TestCase):
+    def test_take_and_refill(self):
+        now = [0.0]
+        bucket = TokenBucket(2, 1.0, clock=lambda: now[0])
+        self.assertTrue(bucket.take())
+        self.assertTrue(bucket.take())
+        self.assertFalse(bucket.take())
+        self.assertAlmostEqual(bucket.time_until_available(), 1.0)
+        now[0] = 1.5
+        self.assertTrue(bucket.take())
+        self.assertAlmostEqual(bucket.time_until_available(), 0.5)
+
+    def test_drain(self):
+        bucket = TokenBucket(5, 1.0)
+        bucket.drain()
+        self.assertFalse(bucket.take())
+
+    def test_try_take(self):
+        now = [0.0]
+        bucket = TokenBucket(1, 2.0, clock=lambda: now[0])
+        self.assertEqual(bucket.try_take(), 0.0)
+        self.assertAlmostEqual(bucket.try_take(), 0.5)
+        self.assertAlmostEqual(bucket.tokens, 0.0)
+        now[0] = 0.5
+        self.assertEqual(bucket.try_take(), 0.0)
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'Needs fork')
+    def test_processes_stay_within_the_budget(self):
+        context = multiprocessing.get_context('fork')
+        capacity, rate = 5, 20.0
+        bucket = SharedTokenBucket(capacity, rate, context=context)
+        sent = context.Value('i', 0)
+
+        started = time.monotonic()
+        processes = [context.Process(target=send_for, args=(bucket, sent, 0.5)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.monotonic() - started
+
+        self.assertGreater(sent.value, capacity)
+        self.assertLessEqual(sent.value, capacity + rate * elapsed)
+
+class ReplyScheduling(unittest.TestCase):
+    def test_sends_replies(self):
+        sent = []
+        scheduler = ReplyScheduler(bucket=TokenBucket(10, 100.0))
+        scheduler.start()
+        scheduler.submit(lambda thing, response: sent.append((thing, response)), 'post', 'hello', on_success=sent.append)
+        self.assertTrue(scheduler.wait_until_empty(5))
+        scheduler.stop()
+        self.assertEqual(sent, [('post', 'hello'), 'post'])
+        self.assertEqual(scheduler.stats['sent'], 1)
+
+    def test_retries_after_rate_limit(self):
+        attempts = []
+        def send(thing, response):
+            attempts.append(thing)
+            if len(attempts) == 1:
+                raise FakeAPIException('RATELIMIT', 'try again in 10 milliseconds')
+
+        scheduler = ReplyScheduler(bucket=TokenBucket(10, 100.0), rate_limit_margin=0)
+        scheduler.start()
+        scheduler.submit(send, 'comment', 'idea')
+        self.assertTrue(scheduler.wait_until_empty(5))
+        scheduler.stop()
+        self.assertEqual(attempts, ['comment', 'comment'])
+        self.assertEqual(scheduler.stats['rate_limited'], 1)
+        self.assertEqual(scheduler.stats['sent'], 1)
+
+    def test_drops_after_max_retries(self):
+        def send(thing, response):
+            raise Exception('Always failing')
+
+        scheduler = ReplyScheduler(bucket=TokenBucket(10, 100.0), max_retries=2, retry_delay=0.001)
+        scheduler.start()
+        scheduler.submit(send, 'comment', 'idea')
+        self.assertTrue(scheduler.wait_until_empty(5))
+        scheduler.stop()
+        self.assertEqual(scheduler.stats['retried'], 2)
+        self.assertEqual(scheduler.stats['dropped'], 1)
+        self.assertEqual(scheduler.stats['sent'], 0)
+
+    def test_dropped_replies_are_reported(self):
+        dropped = []
+        def send(thing, response):
+            raise PermissionError('received 403 HTTP response')
+
+        scheduler = ReplyScheduler(bucket=TokenBucket(10, 100.0), retry_exceptions=())
+        scheduler.start()
+        scheduler.submit(send, 'banned', 'idea', on_drop=dropped.append)
+        self.assertTrue(scheduler.wait_until_empty(5))
+        scheduler.stop()
+        self.assertEqual(dropped, ['banned'])
+
+    def test_unsent_replies_are_dropped_on_stop(self):
+        dropped = []
+        scheduler = ReplyScheduler(bucket=TokenBucket(1, 0.0))
+        scheduler.start()
+        scheduler.submit(lambda thing, response: None, 'first', 'idea', on_drop=dropped.append)
+        self.assertTrue(scheduler.wait_until_empty(5))
+        # The bucket is empty and never refills
+        for thing in ['second', 'third']:
+            scheduler.submit(lambda thing, response: None, thing, 'idea', on_drop=dropped.append)
+        scheduler.stop(drain=False, timeout=5)
+        self.assertEqual(dropped, ['second', 'third'])
+        self.assertEqual(scheduler.stats['sent'], 1)
+        self.assertEqual(scheduler.stats['dropped'], 2)
+        self.assertEqual(scheduler.pending(), 0)
+
+    def test_other_errors_do_not_stop_the_thread(self):
+        sent = []
+        def forbidden(thing, response):
+            raise PermissionError('received 403 HTTP response')
+
+        scheduler = ReplyScheduler(bucket=TokenBucket(10, 100.0), retry_exceptions=(FakeAPIException,))
+        scheduler.start()
+        scheduler.submit(forbidden, 'banned', 'idea')
+        scheduler.submit(lambda thing, response: sent.append(thing), 'comment', 'idea')
+        self.assertTrue(scheduler.wait_until_empty(5))
+        scheduler.stop()
+        self.assertEqual(sent, ['comment'])
+        self.assertEqual(scheduler.stats['dropped'], 1)
+        self.assertEqual(scheduler.stats['sent'], 1)
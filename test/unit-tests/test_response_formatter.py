@@ -0,0 +1,52 @@
+import unittest
+from projectbot.Utilities import ResponseFormatter, ResponseTemplate, create_default_template
+from projectbot.IdeaStore import Idea
+
+REPO_URL = 'https://github.com/srz2/BeginnerProjectBot'
+
+class ResponseFormatting(unittest.TestCase):
+    def setUp(self):
+        self.formatter = ResponseFormatter(REPO_URL, cache_size=2)
+        self.idea = Idea('Number {Guessing}', 'easy', 'Guess a number')
+
+    def test_idea_response(self):
+        response = self.formatter.format_idea_response(self.idea)
+        expected = ('Hey, I think you are trying to figure out a project to do; how about this one?\n\n'
+                    'Project: **Number {Guessing}** \n\n'
+                    'I think its a _nice_ project for you! Try it out but, dont get discouraged. If you need more guidance, here\'s a description:\n'
+                    '>Guess a number\n\n\n'
+                    + self.formatter.get_bot_reference_text())
+        self.assertEqual(response, expected)
+
+    def test_unknown_difficulty_word(self):
+        response = self.formatter.format_idea_response(Idea('Scraper', 'expert', 'Scrape'))
+        self.assertIn('_fasinating_', response)
+
+    def test_basic_response(self):
+        response = self.formatter.format_basic_response()
+        self.assertTrue(response.startswith('Hey, I think you are trying to figure out a project to do; Here are some helpful resources:\n\n- [/r/learnpython - Wiki]'))
+        self.assertTrue(response.endswith(f'^[Github]({REPO_URL})'))
+
+    def test_cache_is_bounded_and_invalidated(self):
+        first = self.formatter.format_idea_response(self.idea)
+        self.assertIs(self.formatter.format_idea_response(self.idea), first)
+        self.formatter.format_idea_response(Idea('A', 'hard', ''))
+        self.formatter.format_idea_response(Idea('B', 'hard', ''))
+        self.assertEqual(len(self.formatter.cache), 2)
+        self.formatter.invalidate()
+        self.assertEqual(len(self.formatter.cache), 0)
+
+    def test_subreddit_template(self):
+        default = create_default_template()
+        spanish = ResponseTemplate(
+            idea_text='Proyecto: **{name}** ({difficulty})\n>{description}\n\n',
+            basic_text='Recursos:\n{links}\n',
+            links=default.links,
+            difficulty_words={'easy': 'fácil'},
+            default_difficulty_word='interesante')
+        self.formatter.register_template('es', spanish, subreddits=['learnpython_es'])
+
+        response = self.formatter.format_idea_response(self.idea, 'LearnPython_ES')
+        self.assertTrue(response.startswith('Proyecto: **Number {Guessing}** (fácil)'))
+        self.assertTrue(self.formatter.format_basic_response('learnpython_es').startswith('Recursos:\n- ['))
+        self.assertIn('_nice_', self.formatter.format_idea_response(self.idea, 'learnpython'))
@@ -0,0 +1,99 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from projectbot.ResponseIndex import ResponseIndex, BloomFilter
+from projectbot.FakeReddit import FakeRedditInterface
+
+class BloomFilterMembership(unittest.TestCase):
+    def test_added_keys_are_found(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = [f't1_{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        for key in keys:
+            self.assertIn(key, bloom)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f't1_{i}')
+        false_positives = sum(1 for i in range(10000) if f't3_{i}' in bloom)
+        self.assertLess(false_positives, 500)
+
+class ResponseIndexLookup(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'responded.db')
+        self.index = ResponseIndex(self.path, lru_size=2)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def test_add_and_contains(self):
+        self.assertFalse(self.index.contains('t1_abc'))
+        self.index.add('t1_abc')
+        self.assertTrue(self.index.contains('t1_abc'))
+        self.assertFalse(self.index.contains('t3_abc'))
+
+    def test_persists_between_opens(self):
+        self.index.add_many([('t1_a', None), ('t3_b', None), ('t1_c', None)])
+        self.index.close()
+
+        reopened = ResponseIndex(self.path, lru_size=2)
+        self.assertTrue(reopened.contains('t1_a'))
+        self.assertTrue(reopened.contains('t3_b'))
+        self.assertTrue(reopened.contains('t1_c'))
+        self.assertEqual(len(reopened), 3)
+        reopened.close()
+
+    def test_seed_from_history(self):
+        reddit = FakeRedditInterface()
+        submission = reddit.add_submission('Looking for a project')
+        comment = reddit.add_comment(submission, '!projectbot')
+        submission.reply('Basic response')
+        comment.reply('Idea response')
+
+        count = self.index.seed_from_history(reddit.get_own_comments())
+        self.assertEqual(count, 2)
+        self.assertTrue(self.index.contains(submission.fullname))
+        self.assertTrue(self.index.contains(comment.fullname))
+
+        # Only newer history is read on the next seed
+        count = self.index.seed_from_history(reddit.get_own_comments())
+        self.assertEqual(count, 0)
+
+    def test_shared_between_processes(self):
+        first = ResponseIndex(self.path, shared=True)
+        second = ResponseIndex(self.path, shared=True)
+        try:
+            # A miss is not trusted, the other process may add it later
+            self.assertFalse(second.contains('t1_abc'))
+            first.add('t1_abc')
+            self.assertTrue(second.contains('t1_abc'))
+
+            self.assertTrue(first.claim('t3_xyz'))
+            self.assertFalse(second.claim('t3_xyz'))
+            self.assertFalse(first.contains('t3_xyz'))
+
+            # Released when the reply was never sent
+            first.release('t3_xyz')
+            self.assertTrue(second.claim('t3_xyz'))
+        finally:
+            first.close()
+            second.close()
+
+    def test_old_claims_removed_on_open(self):
+        self.index.claim('t3_new')
+        self.index.connection.execute("INSERT INTO claimed (parent, claimed_at) VALUES ('t3_old', ?)", (time.time() - 3600,))
+        self.index.connection.commit()
+        self.index.close()
+
+        index = ResponseIndex(self.path, shared=True, claim_max_age=60)
+        try:
+            self.assertTrue(index.claim('t3_old'))
+            self.assertFalse(index.claim('t3_new'))
+        finally:
+            index.close()
@@ -0,0 +1,54 @@
+import random
+import unittest
+from projectbot.Sampler import AliasTable, IdeaSampler, RecentIdeas
+from projectbot.IdeaStore import IdeaStore
+
+IDEAS = IdeaStore([('A', 'easy', ''), ('B', 'easy', ''), ('C', 'hard', '')])
+
+class AliasTableSampling(unittest.TestCase):
+    def test_follows_weights(self):
+        table = AliasTable([1.0, 3.0, 0.0, 4.0])
+        rng = random.Random(7).random
+        counts = [0, 0, 0, 0]
+        for _ in range(40000):
+            counts[table.sample(rng)] += 1
+        self.assertAlmostEqual(counts[0] / 40000, 0.125, delta=0.015)
+        self.assertAlmostEqual(counts[1] / 40000, 0.375, delta=0.015)
+        self.assertEqual(counts[2], 0)
+        self.assertAlmostEqual(counts[3] / 40000, 0.5, delta=0.015)
+
+    def test_zero_weights_are_uniform(self):
+        table = AliasTable([0.0, 0.0])
+        rng = random.Random(1).random
+        self.assertEqual({table.sample(rng) for _ in range(100)}, {0, 1})
+
+class IdeaSampling(unittest.TestCase):
+    def test_difficulty(self):
+        sampler = IdeaSampler(IDEAS)
+        for _ in range(20):
+            self.assertEqual(sampler.sample('easy').difficulty, 'easy')
+        self.assertIsNone(sampler.sample('medium'))
+
+    def test_weights_by_name(self):
+        sampler = IdeaSampler(IDEAS, {'A': 0.0})
+        for _ in range(20):
+            self.assertEqual(sampler.sample('easy').name, 'B')
+
+    def test_exclude(self):
+        sampler = IdeaSampler(IDEAS)
+        rng = random.Random(3).random
+        for _ in range(20):
+            self.assertEqual(sampler.sample('easy', {'A'}, rng=rng).name, 'B')
+
+class RecentIdeasWindow(unittest.TestCase):
+    def test_window_and_keys_are_bounded(self):
+        recent = RecentIdeas(max_keys=2, window=2)
+        recent.record(['t3_a', 'u/one'], 'A')
+        recent.record(['t3_a'], 'B')
+        recent.record(['t3_a'], 'C')
+        self.assertEqual(recent.get_excluded(['t3_a']), {'B', 'C'})
+        self.assertEqual(recent.get_excluded(['t3_a', 'u/one']), {'A', 'B', 'C'})
+
+        # Adding a third key pushes out the least recently used one
+        recent.record(['t3_b'], 'A')
+        self.assertEqual(len(recent.recent), 2)
@@ -0,0 +1,131 @@
+import unittest
+import multiprocessing
+from projectbot.Sharding import HashRing, ShardSupervisor
+from projectbot.ReplyScheduler import SharedTokenBucket
+
+SUBREDDITS = [f'subreddit{i}' for i in range(200)]
+
+class FakeProcess:
+    def __init__(self, target, args, name, daemon):
+        self.args = args
+        self.alive = False
+        self.pid = None
+        self.exitcode = None
+        self.ignores_terminate = False
+        self.terminated = False
+        self.killed = False
+
+    def start(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+        if not self.ignores_terminate:
+            self.alive = False
+
+    def kill(self):
+        self.killed = True
+        self.alive = False
+
+    def join(self, timeout=None):
+        pass
+
+class FakeContext:
+    def __init__(self):
+        self.started = []
+
+    def Process(self, target, args, name, daemon):
+        process = FakeProcess(target, args, name, daemon)
+        self.started.append(process)
+        return process
+
+class HashRingPartition(unittest.TestCase):
+    def test_every_key_has_one_node(self):
+        ring = HashRing(['a', 'b', 'c'])
+        assignments = ring.partition(SUBREDDITS)
+        self.assertEqual(sorted(sum(assignments.values(), [])), sorted(SUBREDDITS))
+        for keys in assignments.values():
+            self.assertGreater(len(keys), 30)
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        before = {key: ring.get_node(key) for key in SUBREDDITS}
+        ring.remove('c')
+        for key in SUBREDDITS:
+            if before[key] != 'c':
+                self.assertEqual(ring.get_node(key), before[key])
+            else:
+                self.assertNotEqual(ring.get_node(key), 'c')
+
+        ring.add('c')
+        self.assertEqual({key: ring.get_node(key) for key in SUBREDDITS}, before)
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing().get_node('learnpython'))
+
+class Supervisor(unittest.TestCase):
+    def setUp(self):
+        self.context = FakeContext()
+        self.supervisor = ShardSupervisor(SUBREDDITS, 3, target=None, args=('bucket',), context=self.context, restart_delay=10, stop_timeout=0)
+        self.supervisor.start()
+
+    def get_assigned(self):
+        return sorted(key for worker_id, process in self.supervisor.processes.items() for key in process.args[1])
+
+    def test_starts_every_worker(self):
+        self.assertEqual(len(self.supervisor.processes), 3)
+        self.assertEqual(self.get_assigned(), sorted(SUBREDDITS))
+        self.assertEqual(self.context.started[0].args[2], 'bucket')
+
+    def test_rebalances_when_a_worker_dies(self):
+        dead = self.supervisor.processes['worker-1']
+        survivor = self.supervisor.processes['worker-0']
+        dead.alive = False
+
+        self.assertTrue(self.supervisor.check(now=0))
+        self.assertNotIn('worker-1', self.supervisor.processes)
+        self.assertEqual(self.get_assigned(), sorted(SUBREDDITS))
+        self.assertIsNot(self.supervisor.processes['worker-0'], survivor)
+
+        # Joins again after the restart delay and takes its subreddits back
+        self.assertFalse(self.supervisor.check(now=5))
+        self.assertTrue(self.supervisor.check(now=10))
+        self.assertEqual(sorted(self.supervisor.processes), ['worker-0', 'worker-1', 'worker-2'])
+        self.assertEqual(self.supervisor.processes['worker-1'].args[1], dead.args[1])
+        self.assertEqual(self.get_assigned(), sorted(SUBREDDITS))
+
+    def test_workers_are_terminated_before_killed(self):
+        stopping = self.supervisor.processes['worker-0']
+        stuck = self.supervisor.processes['worker-2']
+        stuck.ignores_terminate = True
+
+        self.supervisor.stop_workers()
+        self.assertEqual(self.supervisor.processes, {})
+        self.assertTrue(stopping.terminated)
+        self.assertFalse(stopping.killed)
+        # Still running after the stop timeout
+        self.assertTrue(stuck.terminated)
+        self.assertTrue(stuck.killed)
+
+def take_from_bucket(bucket, count):
+    for _ in range(count):
+        bucket.take(1, now=0.0)
+
+class SharedBudget(unittest.TestCase):
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'Needs fork')
+    def test_processes_share_tokens(self):
+        context = multiprocessing.get_context('fork')
+        bucket = SharedTokenBucket(10, 1.0, clock=lambda: 0.0, context=context)
+        process = context.Process(target=take_from_bucket, args=(bucket, 4))
+        process.start()
+        process.join()
+
+        self.assertAlmostEqual(bucket.tokens, 6.0)
+        self.assertTrue(bucket.take(1, now=0.0))
+        self.assertAlmostEqual(bucket.time_until_available(6, now=0.0), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from projectbot.Snapshot import SnapshotError, create_snapshot, read_snapshot, write_snapshot
+
+class CorpusSnapshotFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'corpus.snapshot')
+        self.ideas = [
+            ['Number Guessing', ' "easy"', 'Guess a number'],
+            ['Web Scraper', 'hard', 'Scrape a site'],
+            ['Dice Rolling', 'easy', 'Roll some dice'],
+        ]
+        self.suggestions = ['project', 'beginner']
+        self.rejections = ['selenium']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        snapshot = create_snapshot(self.ideas, self.suggestions, self.rejections)
+        write_snapshot(self.path, snapshot)
+
+        loaded = read_snapshot(self.path, verify=True)
+        self.assertEqual(loaded.ideas[0], ('Number Guessing', 'easy', 'Guess a number'))
+        self.assertEqual(loaded.difficulty_index, {'easy': [0, 2], 'hard': [1]})
+        self.assertEqual(loaded.suggestions, self.suggestions)
+        self.assertEqual(loaded.rejections, self.rejections)
+        self.assertEqual(loaded.content_hash, snapshot.content_hash)
+
+    def test_hash_follows_content(self):
+        first = create_snapshot(self.ideas, self.suggestions, self.rejections)
+        same = create_snapshot(self.ideas, self.suggestions, self.rejections)
+        changed = create_snapshot(self.ideas, self.suggestions + ['ideas'], self.rejections)
+        self.assertEqual(first.content_hash, same.content_hash)
+        self.assertNotEqual(first.content_hash, changed.content_hash)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'Idea, difficulty, description\n' * 4)
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.path)
+
+    def test_rejects_truncated_file(self):
+        write_snapshot(self.path, create_snapshot(self.ideas, self.suggestions, self.rejections))
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        with open(self.path, 'wb') as file:
+            file.write(data[:-10])
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.path)
@@ -0,0 +1,54 @@
+import os
+import sys
+import shutil
+import configparser
+import tempfile
+import unittest
+import subprocess
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+# Seconds importing bot may take, several times what it takes without the action modules
+IMPORT_BUDGET = 0.3
+
+class LazyStartup(unittest.TestCase):
+    def get_loaded_modules(self, statement):
+        code = f'import sys\n{statement}\nprint(" ".join(sys.modules))'
+        result = subprocess.run([sys.executable, '-c', code], cwd=SOURCE_DIR, capture_output=True, text=True, check=True)
+        return set(result.stdout.split())
+
+    def test_import_does_not_load_clients(self):
+        modules = self.get_loaded_modules('import bot')
+        for name in ('praw', 'pymongo', 'asyncio', 'http.server', 'multiprocessing', 'sqlite3', 'projectbot.Internals'):
+            self.assertNotIn(name, modules)
+
+    def test_import_within_budget(self):
+        code = 'import time\nstarted = time.perf_counter()\nimport bot\nprint(time.perf_counter() - started)'
+        timings = []
+        for _ in range(3):
+            result = subprocess.run([sys.executable, '-c', code], cwd=SOURCE_DIR, capture_output=True, text=True, check=True)
+            timings.append(float(result.stdout.split()[-1]))
+        self.assertLess(min(timings), IMPORT_BUDGET)
+
+    def test_ver_only_reads_the_config(self):
+        directory = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join(SOURCE_DIR, 'praw.ini.example'), os.path.join(directory, 'praw.ini'))
+            bot = os.path.abspath(os.path.join(SOURCE_DIR, 'bot.py'))
+            code = f'import sys, runpy\nsys.argv = [{bot!r}, "ver"]\nsys.path.insert(0, {os.path.dirname(bot)!r})\nrunpy.run_path({bot!r}, run_name="__main__")\nprint(" ".join(sys.modules))'
+            result = subprocess.run([sys.executable, '-c', code], cwd=directory, capture_output=True, text=True, check=True)
+        finally:
+            shutil.rmtree(directory)
+        config = configparser.ConfigParser()
+        config.read(os.path.join(SOURCE_DIR, 'praw.ini.example'))
+        lines = result.stdout.strip().splitlines()
+        self.assertEqual(lines[0], config['DEFAULT']['version'])
+        for name in ('praw', 'pymongo', 'projectbot.Internals'):
+            self.assertNotIn(name, lines[-1].split())
+
+    def test_help_runs_without_config(self):
+        result = subprocess.run([sys.executable, 'bot.py', 'help'], cwd=SOURCE_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertNotEqual(result.stdout.strip(), '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from projectbot.TriggerScanner import TriggerScanner
+
+def scan_with_find(content, phrases):
+    ''' The original scan of bot.process_comment, on a normalized copy of the body '''
+    content = content.lower().replace('*', '').replace('_', ' ')
+    for phrase in phrases:
+        if phrase in content:
+            difficulty = 'all'
+            index = content.index(phrase) + len(phrase)
+            if index < len(content) and content[index:].split():
+                difficulty = content[index:].split()[0]
+            if difficulty not in ['easy', 'medium', 'hard', 'all']:
+                difficulty = 'all'
+            return True, difficulty
+    return False, ''
+
+class TriggerScanning(unittest.TestCase):
+    def setUp(self):
+        self.scanner = TriggerScanner(['u/BeginnerProjectBot', '!projectbot', '!ideabot'])
+
+    def test_no_trigger(self):
+        self.assertEqual(self.scanner.scan('Just a normal comment'), (False, ''))
+
+    def test_trigger_without_difficulty(self):
+        self.assertEqual(self.scanner.scan('!projectbot'), (True, 'all'))
+        self.assertEqual(self.scanner.scan('!projectbot   '), (True, 'all'))
+
+    def test_trigger_with_difficulty(self):
+        self.assertEqual(self.scanner.scan('Hey !projectbot easy please'), (True, 'easy'))
+        self.assertEqual(self.scanner.scan('!projectbot medium\nthanks'), (True, 'medium'))
+
+    def test_username_trigger(self):
+        self.assertEqual(self.scanner.scan('Ask u/BeginnerProjectBot HARD'), (True, 'hard'))
+
+    def test_alias_trigger(self):
+        self.assertEqual(self.scanner.scan('!ideabot hard'), (True, 'hard'))
+
+    def test_markdown_is_ignored(self):
+        self.assertEqual(self.scanner.scan('**!ProjectBot** _easy_'), (True, 'easy'))
+
+    def test_unknown_difficulty(self):
+        self.assertEqual(self.scanner.scan('!projectbot easyish'), (True, 'all'))
+        self.assertEqual(self.scanner.scan('!projectbot, easy'), (True, 'all'))
+        self.assertEqual(self.scanner.scan('!projectbot something'), (True, 'all'))
+
+    def test_longest_trigger_wins(self):
+        scanner = TriggerScanner(['!project', '!projectbot'])
+        self.assertEqual(scanner.scan('!projectbot hard'), (True, 'hard'))
+
+    def test_trigger_is_escaped(self):
+        scanner = TriggerScanner(['!idea.bot'])
+        self.assertEqual(scanner.scan('!ideaxbot easy'), (False, ''))
+        self.assertEqual(scanner.scan('!idea.bot easy'), (True, 'easy'))
+
+    def test_same_as_the_original_scan(self):
+        comments = [
+            'Hey **!ProjectBot** _easy_', '!PROJECTBOT Hard', '!projectbot\tmedium', '!project_bot easy',
+            '!proj*ectbot easy', '!projectbot**easy**', '!projectbot ** medium', '!projectbot_hard',
+            '!projectbot easy.', 'u/BeginnerProjectBot all', 'U/beginner_projectbot', 'nothing here',
+            'text before !ideabot  \n  hard', '!projectboteasy', '!projectbot e*a*s*y',
+        ]
+        phrases = ['u/beginnerprojectbot', '!projectbot', '!ideabot']
+        for comment in comments:
+            self.assertEqual(self.scanner.scan(comment), scan_with_find(comment, phrases), comment)
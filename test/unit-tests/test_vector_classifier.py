@@ -0,0 +1,56 @@
+import random
+import unittest
+from projectbot.Classifier import TitleClassifier
+from projectbot.VectorClassifier import VectorizedClassifier, is_available
+
+SUGGESTIONS = ['project', 'projects', 'beginner', 'idea', 'ideas', 'python', 'build', 'suggestions']
+REJECTIONS = ['selenium', 'homework', 'error']
+OTHER_WORDS = ['need', 'a', 'for', 'my', 'first', 'what', 'should', 'i', 'help', 'with', 'code']
+
+def create_titles(count, seed=7):
+    generator = random.Random(seed)
+    words = SUGGESTIONS + REJECTIONS + OTHER_WORDS
+    punctuation = ['', '?', '!', '.', ',', ':', '/']
+    titles = []
+    for _ in range(count):
+        length = generator.randint(0, 12)
+        title = ' '.join(generator.choice(words) + generator.choice(punctuation) for _ in range(length))
+        titles.append(title.upper() if generator.random() < 0.1 else title)
+    return titles
+
+@unittest.skipUnless(is_available(), 'Needs numpy')
+class VectorizedParity(unittest.TestCase):
+    def setUp(self):
+        self.classifier = TitleClassifier(SUGGESTIONS, REJECTIONS)
+        self.vectorized = VectorizedClassifier.from_classifier(self.classifier, batch_size=100)
+
+    def test_same_decisions_as_scalar(self):
+        titles = create_titles(1000) + ['', '   ', 'Beginner Project Ideas?', '[Python] project/idea for beginner']
+        self.assertEqual(self.vectorized.classify_many(titles), self.classifier.classify_many(titles))
+
+    def test_same_stats_as_explain(self):
+        titles = create_titles(500, seed=11)
+        for title, stats in zip(titles, self.vectorized.explain_many(titles)):
+            self.assertEqual(stats, self.classifier.explain(title), title)
+
+    def test_repeated_words_count_once(self):
+        scores = self.vectorized.score_many(['project project idea for me', 'homework homework project idea now'])
+        self.assertEqual(scores.totals.tolist(), [4, 4])
+        self.assertEqual(scores.counts.tolist(), [2, 2])
+        self.assertEqual(scores.rejected.tolist(), [False, True])
+
+    def test_rejection_names_the_words(self):
+        title = 'Homework: selenium project ideas for my homework'
+        self.assertEqual(self.vectorized.explain_many([title]), [self.classifier.explain(title)])
+        self.assertIn('Rejecting (homework): homework selenium project ideas for my homework', self.vectorized.explain_many([title])[0][3])
+
+    def test_words_outside_the_lists(self):
+        titles = ['zebra yak xylophone project', 'zebra zebra idea']
+        self.assertEqual(self.vectorized.score_many(titles).totals.tolist(), [4, 2])
+        self.assertEqual(self.vectorized.classify_many(titles), self.classifier.classify_many(titles))
+
+    def test_empty_batch(self):
+        self.assertEqual(self.vectorized.classify_many([]), [])
+
+if __name__ == '__main__':
+    unittest.main()